@@ -12,15 +12,241 @@
 # GABaserw.inp
 # GACHARMrun.sh (linux shell script)
 # ALL Files listed above are REQUIRED for use of this script
+# Optional Files:
+# CHARMRunner.py
+# ParallelCHARM.py (parallel evaluation mode)
+# EvalCache.py (persistent evaluation cache)
+# Surrogate.py (surrogate pre-screening)
+# CHARMScheduler.py (CHARM job scheduler)
+# Timing.py (per evaluation timing and profiling)
+# Checkpoint.py (checkpoint and resume)
+# MultiFidelity.py (multi-fidelity evaluation)
+# WarmStart.py (warm start from the nearest solved design)
+# LogMonitor.py (early abort of hopeless CHARM runs)
+# Pareto.py (Pareto archive and front indicators)
+# Artifacts.py (compressed store of raw CHARM files)
+# WorkQueue.py (multi-host evaluation)
+# DOE.py (space-filling initial population)
+# BladeShape.py (smooth twist and chord parameterization)
+# Preflight.py (candidate checks before CHARM)
+# WorkerPool.py (pre-warmed worker processes)
+# SteadyState.py (steady-state Genetic Algorithm)
+# Recorder.py (batched SQLite recorder and bulk reader)
+# MultiPoint.py (multi-operating-point evaluation)
 
+import time
+import contextlib
+import numpy as np
 import openmdao.api as om
 from datetime import datetime
-import subprocess
-from GeneticAl import staging, data_filter, log_file_parse
-from SingleFileMakerCHARM import FileMaker
+from GeneticAl import staging
+from CHARMRunner import DESIGN_VARS, OBSERVERS, CONSTRAINTS, RUN_SCRIPT, LOG_FILE, evaluate_design
+from CHARMScheduler import CHARMScheduler
+from ParallelCHARM import CandidatePool, ParallelGADriver
+from EvalCache import EvalCache
+from Surrogate import SurrogateScreen
+from MultiFidelity import FidelityLadder, LOW_FIDELITY
+from WarmStart import RestartStore, RESTART_FILES, WARM_SETTINGS
+from LogMonitor import LogMonitor
+from Pareto import ParetoArchive
+from Artifacts import ArtifactStore
+from WorkQueue import WorkQueue, QueueServer, QueuePool
+from WorkerPool import WorkerPool
+from SteadyState import SteadyStateGADriver
+from Recorder import BatchSqliteRecorder
+from MultiPoint import OperatingPoints
+from DOE import DOESeed
+from BladeShape import BladeShape
+from Preflight import Preflight, PREFLIGHT_RULES
+from Timing import StageTimer, TimingReport, ProfileHook, timing_columns
+from Checkpoint import GACheckpoint, CheckpointGADriver, results_history, history_key
+
+# Blade parameterization
+# None optimizes the ten segment twists (Twist1 to Twist10) independently, chord stays at the deck default
+# 'bspline' or 'bezier' sets twist and chord over the blade span by TWIST_POINTS and CHORD_POINTS control points
+# (TwistCP and ChordCP design variables), the segment twists and chords CHARM reads are sampled from the curves,
+# TwistCP sets the twist rate (degrees per blade radius, 0 to 80), each segment twist is that rate times its SL,
+# so the GA searches a much shorter chromosome and every blade is smooth
+# Root twist, anhedral, and ZDistance stay design variables either way
+# Start a new CSV file when changing the parameterization, its columns follow the design variables
+BLADE_SHAPE = None
+TWIST_POINTS = 4
+CHORD_POINTS = 3
+shape = BladeShape(BLADE_SHAPE, TWIST_POINTS, CHORD_POINTS) if BLADE_SHAPE else None
+# Design variables of the Optimizer component
+VARIABLES = ['Twist', 'Anhedral', 'ZDistance'] + shape.variables if shape is not None else DESIGN_VARS
+
+# Operating points every candidate is evaluated at, None runs the single point of the decks (OMEGA 500, hover)
+# Each point sets the rw and name file parameters it changes, 'omega' (OMEGA) and 'velocity' (U V W, ft/s),
+# plus an optional objective 'weight' (default 1) and 'name' (CSV column prefix, default P1, P2, ...), e.g.
+#   [{'name': 'Hover', 'omega': 500, 'weight': 2},
+#    {'name': 'Climb', 'omega': 500, 'velocity': [0.0, 0.0, 20.0]},
+#    {'name': 'LowRPM', 'omega': 420}]
+# The geometry deck of a candidate is written once and all of its points run at the same time (GAPoints directories)
+# Objectives are the weighted mean over the points, constraints must hold at every point (worst case)
+# Thrust, power, efficiency, and constrained OASPL of each point are logged as {name}_{output} columns
+# Start a new CSV file when changing the points, its columns follow them
+OPERATING_POINTS = None
+points = OperatingPoints(OPERATING_POINTS) if OPERATING_POINTS else None
 
 # Define filename
-db = staging('GA_FileName')
+# Each evaluation is written as one appended row once complete
+# Raise flush_every to batch rows per write, set fsync=True to force every write to disk
+columns = shape.layout(staging.COLUMNS) if shape is not None else staging.COLUMNS
+db = staging('GA_FileName', flush_every=1, fsync=False,
+             columns=points.layout(columns) if points is not None else columns)
+# An existing file keeps its layout, columns added since it was started are not logged
+missing = [name for name in staging.COLUMNS if name not in db.columns]
+if missing:
+    print(f'{db.file} was started without the columns {missing}, their values are not logged...')
+if shape is not None and any(name not in db.columns for name in shape.columns):
+    print(f'{db.file} was started without the {BLADE_SHAPE} parameterization, its control points are not logged...')
+if points is not None and not set(points.layout(staging.COLUMNS)) <= set(db.columns):
+    print(f'{db.file} was started without these operating points, their columns are not logged...')
+
+# Number of concurrent CHARM processes
+# 0 runs each individual one at a time in the NOISE directory
+# Above 0 runs every individual of a generation in its own sandbox under GAScratch
+# Cores are split between concurrent runs and CHARM threads per run (OMP_NUM_THREADS)
+PARALLEL_WORKERS = 0
+
+# Run the sandboxes in long-lived worker processes instead of threads of this process
+# Each worker keeps its sandbox in RAM (/dev/shm, GAScratch without it) with the static inputs copied in once,
+# and sends back parsed results, so decks, CHARM outputs, and parsing stay off the disk and out of this process
+PREWARMED_WORKERS = False
+
+# Steady-state Genetic Algorithm instead of generations
+# Whenever a CHARM run returns, its individual joins the population (replacing the worst member when better)
+# and a child of the current population is dispatched to the free slot, so no slot waits for the slowest run
+# Same driver options, penalties, and number of evaluations (pop_size*(max_gen + 1)) as the generational driver,
+# every pop_size evaluations count as a generation for checkpoints and the Pareto archive
+# Needs PARALLEL_WORKERS above 0 or a work queue, surrogate pre-screening and multi-fidelity need whole generations
+STEADY_STATE = False
+
+# Multi-host evaluation, set QUEUE_PORT to make this process the coordinator of a work queue
+# Every generation is put on the queue, and workers started on any host with CHARM (from its NOISE directory) run it:
+#   python3 WorkQueue.py --coordinator <this host>:<QUEUE_PORT> --token <QUEUE_TOKEN> --slots <CHARM runs on that host>
+# QUEUE_TOKEN None generates a random token, printed with the worker command when the queue starts
+# QUEUE_HOST is the interface the queue listens on: '127.0.0.1' for workers on this host only,
+# the address of the cluster network interface (or '0.0.0.0' for all interfaces) for workers on other hosts
+# A worker silent for QUEUE_LEASE seconds is presumed lost and its candidates are given to other workers
+# A candidate held by one worker for QUEUE_JOB_TIMEOUT seconds (well past CHARM_TIMEOUT and its retries) is given
+# to another worker too, in case a worker slot hangs while its heartbeats go on, None waits for it as long as it is alive
+# PARALLEL_WORKERS is not used in this mode, except with STEADY_STATE: candidates kept on the queue (all worker slots)
+# Warm start and the artifact store only apply to local runs
+QUEUE_PORT = None
+QUEUE_HOST = '127.0.0.1'
+QUEUE_TOKEN = None
+QUEUE_LEASE = 60
+QUEUE_JOB_TIMEOUT = 3*3600
+
+# CHARM run limits
+# A run longer than CHARM_TIMEOUT seconds is killed and receives the penalty outputs (None for no limit)
+# A run that fails before writing its log is retried CHARM_RETRIES times
+# CHARM_CORES is the number of cores shared between runs, None uses every core available to this process
+# CHARM_SERIAL_FRACTION is the part of a run that does not speed up with threads, it decides the core split
+CHARM_TIMEOUT = 3600
+CHARM_RETRIES = 1
+CHARM_CORES = None
+CHARM_SERIAL_FRACTION = 0.05
+
+# Persistent cache of CHARM results, shared across runs and restarts
+# Elitism and the discrete (bits) design space make repeated candidates common
+# Set CACHE_FILE to None to always run CHARM
+# Delete the file after changing CHARM itself, deck and setting changes are detected automatically
+CACHE_FILE = 'GACache.db'
+CACHE_MAX_ENTRIES = 100000
+CACHE_MAX_AGE_DAYS = 30
+
+# Surrogate pre-screening of each generation
+# Gaussian process models of every output are trained from the real CHARM results
+# Only promising or uncertain candidates are run, the rest get predicted outputs (Surrogate = 1 in the CSV)
+# Needs the generation at once, so it runs with at least one sandbox worker
+USE_SURROGATE = False
+
+# Multi-fidelity evaluation of each generation
+# Every candidate is run with the coarse LOW_FIDELITY CHARM settings first (NPSI, NREV, NPTFW, NSPAN)
+# The best ranked PROMOTE_FRACTION of each generation is run again with the full settings,
+# the rest get their coarse outputs corrected by a map learned from the candidates run at both (LowFidelity = 1 in the CSV)
+# Candidates predicted to beat the best full run are always promoted, so the optimum found is a full run
+# Needs the generation at once, so it runs with at least one sandbox worker
+USE_MULTI_FIDELITY = False
+PROMOTE_FRACTION = 0.25
+
+# Warm start of CHARM runs from the restart data of the nearest solved design (IRST 1)
+# Restart files of completed runs are kept in WARM_START_DIR, a run restarts from the closest design
+# within WARM_START_DISTANCE (RMS of the design differences, as a fraction of each design range)
+# Runs keep the production solver settings, only the restart differs from a cold run (see WARM_SETTINGS in WarmStart.py)
+# Warm start turns itself off when a completed run did not write RESTART_FILES (see WarmStart.py)
+# Revolutions (CHARM iterations) and WarmStart (distance restarted from, -1 for cold) are logged in the CSV
+USE_WARM_START = False
+WARM_START_DIR = 'GARestart'
+WARM_START_DISTANCE = 0.25
+
+# Streaming check of every CHARM log while the run is going, read every MONITOR_INTERVAL seconds
+# A run is stopped early and receives the penalty outputs (reason logged in the Abort column of the CSV)
+# when its log shows an error banner, NaN or overflowing values, or diverging loads,
+# or when its converged loads (Thrust_Total, Coef_Power, Rotor_Eff) are already beyond a constraint
+# bound by more than MONITOR_MARGIN times the bound
+USE_LOG_MONITOR = False
+MONITOR_MARGIN = 0.5
+MONITOR_INTERVAL = 2.0
+
+# Pre-flight check of every candidate before its decks are written and CHARM is launched
+# A candidate breaking one of PREFLIGHT_RULES (twist gradient, total twist, chord, anhedral plus sweep, see Preflight.py,
+# every rule is off until a limit is set there from failed designs),
+# or whose nearest evaluated designs mostly failed (PREFLIGHT_CLASSIFIER), receives the penalty outputs right away
+# The reason is logged in the Preflight column of the CSV file, the classifier starts from the failures already logged
+USE_PREFLIGHT = False
+PREFLIGHT_CLASSIFIER = True
+
+# Pareto archive of every CHARM result over all objectives, updated as each evaluation lands
+# After every generation the front is exported to PARETO_FILE, and its hypervolume and IGD
+# (distance from the front to the generation) are appended to PARETO_HISTORY_FILE
+# The archive starts from the front of the results already in the CSV file, set PARETO_FILE to None to disable
+PARETO_FILE = 'GAPareto.csv'
+PARETO_HISTORY_FILE = 'GAParetoHistory.csv'
+
+# Compressed store of the decks, log, and noise file of every CHARM run, so any CSV row can be re-parsed later
+# Identical file contents are stored once, runs are found by Iteration or by design (see Artifacts.py)
+# Least recently used runs are removed past ARTIFACT_MAX_GB, set ARTIFACT_DIR to None to disable
+ARTIFACT_DIR = 'GAArtifacts'
+ARTIFACT_MAX_GB = 2.0
+
+# Space-filling design of experiments before the first generation
+# DOE_SAMPLES designs spread over the design variable bounds ('lhs', 'sobol', or 'halton') are evaluated,
+# together with the start values below, in parallel when a pool is used, and logged like any other evaluation
+# The best feasible ones (by the driver fitness) become the initial population instead of a random one,
+# DOE_SAMPLES below pop_size is raised to pop_size
+USE_DOE = False
+DOE_SAMPLES = 40
+DOE_METHOD = 'lhs'
+
+# Profiling of the whole run, None (off), 'cprofile', or 'sample'
+# 'cprofile' traces every Python call of the main thread, written to GAProfile.prof and GAProfile.txt
+# 'sample' records the stack of every thread (including pool threads) every 10 ms, written to GAProfile.txt
+# Stage timings (T_ columns of the CSV and the end of run summary) are always recorded
+PROFILE = None
+
+# Checkpoint of the Genetic Algorithm state (population, fitness, random state, elite or pareto set)
+# Written every CHECKPOINT_EVERY generations, at the start of the generation, set CHECKPOINT_FILE to None to disable
+# Set RESUME = True to continue an interrupted run: the interrupted generation is restarted,
+# and its individuals already logged in the CSV file are restored instead of run again
+# Keep the CSV file, driver options, and design variables of the interrupted run when resuming
+CHECKPOINT_FILE = 'GACheckpoint.pkl'
+CHECKPOINT_EVERY = 1
+RESUME = False
+
+# SQLite recorder of the driver cases (design variables, objectives, constraints), set RECORD_FILE to None to disable
+# Cases are committed RECORD_BATCH at a time, or after RECORD_INTERVAL seconds, in WAL mode,
+# so recording stays out of the way of the evaluations and the CSV file
+# RECORD_VARIABLES lists the promoted names recorded (wildcards allowed, e.g. ['Twist*', 'Observer*']), None records all
+# OpenMDAO writes the file to its outputs directory, AlgoRun_out/optimization_results.db
+# Read the whole history into NumPy arrays with Recorder.read_cases, or: python3 Recorder.py AlgoRun_out/optimization_results.db
+RECORD_FILE = 'optimization_results.db'
+RECORD_BATCH = 50
+RECORD_INTERVAL = 30.0
+RECORD_VARIABLES = None
 
 
 class Optimizer(om.ExplicitComponent):
@@ -34,24 +260,50 @@ class Optimizer(om.ExplicitComponent):
     sim_worked : bool
         Check if CHARM Simulation worked as expected
     """
+    def initialize(self):
+        """
+        Declare component options
+        """
+        # Pool holding the results of the generation evaluated in parallel, None for serial runs
+        self.options.declare('pool', default=None, allow_none=True, recordable=False)
+        # Persistent cache of CHARM results, None to always run CHARM
+        self.options.declare('cache', default=None, allow_none=True, recordable=False)
+        # Scheduler that launches CHARM runs with timeouts and retries
+        self.options.declare('scheduler', default=None, allow_none=True, recordable=False)
+        # Run totals of the stage timings, None to skip the summary
+        self.options.declare('timing', default=None, allow_none=True, recordable=False)
+        # Results logged before a resume, restored instead of run again
+        self.options.declare('history', default=None, allow_none=True, recordable=False)
+        # Restart data of solved designs, None to start every CHARM run cold
+        self.options.declare('warm', default=None, allow_none=True, recordable=False)
+        # Pareto archive of the CHARM results, None to skip it
+        self.options.declare('archive', default=None, allow_none=True, recordable=False)
+        # Store of the raw CHARM files, None to keep only the CSV values
+        self.options.declare('artifacts', default=None, allow_none=True, recordable=False)
+        # Checks rejecting hopeless candidates before CHARM, None to run every candidate
+        self.options.declare('preflight', default=None, allow_none=True, recordable=False)
+        # Operating points every candidate is run at, None for the single deck operating point
+        self.options.declare('points', default=None, allow_none=True, recordable=False)
+
     def setup(self):
         """
         Initialize Algorithm inputs, outputs, and constraints
         """
         self.sim_worked = False
+        # End of the previous evaluation and pool busy time at that moment, to time the driver in between
+        self._last, self._pool_busy = None, 0.0
         # Intialize inputs
-        for variable in ['Twist', 'Anhedral', 'Twist1', 'Twist2', 'Twist3', 'Twist4',
-                         'Twist5', 'Twist6', 'Twist7', 'Twist8', 'Twist9', 'Twist10', 'ZDistance']:
+        for variable in VARIABLES:
             self.add_input(variable, val=1)
         
         # Initialize outputs
-        for observer in [21, 22, 23, 24, 25, 2]:
+        for observer in OBSERVERS:
             self.add_output(f'Observer{observer}', val=1.0)
         for output in ['Thrust_Total', 'Yaw_Total', 'Coef_Power', 'Rotor_Eff']:
             self.add_output(output, val=1.0)
         
         # Initialize Constraints
-        for constraint in ['Obs2_Constraint', 'Obs25_Constraint', 'Thrust_Constraint', 'RotorEff_Constraint']:
+        for constraint in CONSTRAINTS:
             self.add_output(constraint, val=1.0)
 
     def compute(self, inputs, outputs):
@@ -66,92 +318,146 @@ class Optimizer(om.ExplicitComponent):
         outputs : tuple
             list of outputs
         """
-        # Store new inputs to local variables
-        Twist = inputs['Twist']
-        Anhedral = inputs['Anhedral']
-        ZDistance = inputs['ZDistance']
-        Twist1 = inputs['Twist1']
-        Twist2 = inputs['Twist2']
-        Twist3 = inputs['Twist3']
-        Twist4 = inputs['Twist4']
-        Twist5 = inputs['Twist5']
-        Twist6 = inputs['Twist6']
-        Twist7 = inputs['Twist7']
-        Twist8 = inputs['Twist8']
-        Twist9 = inputs['Twist9']
-        Twist10 = inputs['Twist10']
+        # Time since the previous evaluation is driver and recorder work, minus generation runs in the pool
+        timer = StageTimer()
+        pool_busy = self.options['pool'].busy if self.options['pool'] is not None else 0.0
+        if self._last is not None:
+            timer.times['Driver'] = max(time.perf_counter() - self._last - (pool_busy - self._pool_busy), 0.0)
+
+        # Store new inputs as plain floats
+        design = {name: float(inputs[name][0]) for name in VARIABLES}
+        # Segment twists and chords of the blade parameterization
+        if shape is not None:
+            design = shape.expand(design)
         
         # Get iteration count from openMDAO
         integer = next(prob.iter_count_iter(True, True, True), 0)[2]
 
-        # # Create CHARM input files
-        FileMaker(1, 2, Twist[0], Anhedral[0], ZDistance[0], Twist1[0], Twist2[0], Twist3[0], Twist4[0],
-                  Twist5[0], Twist6[0], Twist7[0], Twist8[0], Twist9[0], Twist10[0])
-        
-        try:
-            # Calcualte outputs
-            subprocess.run(["./GACHARMrun.sh"])
-            outputs['Observer2'] = data_filter('GAlgoRunsname_oaspldBA.dat', 2, 'Total').temp
-            outputs['Observer21'] = data_filter('GAlgoRunsname_oaspldBA.dat', 21, 'Total').temp
-            outputs['Observer22'] = data_filter('GAlgoRunsname_oaspldBA.dat', 22, 'Total').temp
-            outputs['Observer23'] = data_filter('GAlgoRunsname_oaspldBA.dat', 23, 'Total').temp
-            outputs['Observer24'] = data_filter('GAlgoRunsname_oaspldBA.dat', 24, 'Total').temp
-            outputs['Observer25'] = data_filter('GAlgoRunsname_oaspldBA.dat', 25, 'Total').temp
-            outputs['Thrust_Total'] = log_file_parse('GAlgoRunsname.log').dict.get('TotalThrust')
-            outputs['Yaw_Total'] = log_file_parse('GAlgoRunsname.log').dict.get('TotalYaw')
-            outputs['Coef_Power'] = log_file_parse('GAlgoRunsname.log').dict.get('PowerCoef')
-            outputs['Rotor_Eff'] = log_file_parse('GAlgoRunsname.log').dict.get('RotorEff')
-            self.sim_worked = True
-        
-        except:
-            # If CHARM files return error, that iteration does not conform to physics
-            # Results in extreme punishment
-
-            # Dictionary with output names and their corresponding values
-            output_values = {
-                'Observer2': 1000, 'Observer21': 1000, 'Observer22': 1000, 'Observer23': 1000,
-                'Observer24': 1000, 'Observer25': 1000, 'Thrust_Total': -1000, 'Yaw_Total': -1000,
-                'Coef_Power': -1000, 'Rotor_Eff': -10
-            }
-            for key, value in output_values.items():
-                outputs[key] = value
-
-            self.sim_worked = False
-            
-
-        # Assign Constraints
-        outputs['Obs2_Constraint'] = outputs['Observer2']
-        outputs['Obs25_Constraint'] = outputs['Observer25']
-        outputs['Thrust_Constraint'] = outputs['Thrust_Total']
-        outputs['RotorEff_Constraint'] = outputs['Rotor_Eff']
+        # Parallel mode has already run this individual with the rest of its generation
+        result = None
+        if self.options['pool'] is not None:
+            result = self.options['pool'].fetch(design)
+        elif self.options['history']:
+            result = self.options['history'].get(history_key(design))
+        if result is None:
+            # Create CHARM input files, run CHARM, and calculate outputs
+            result = evaluate_design(design, cache=self.options['cache'], scheduler=self.options['scheduler'],
+                                     warm=self.options['warm'], artifacts=self.options['artifacts'],
+                                     preflight=self.options['preflight'], points=self.options['points'])
+
+        # Pool results are shared by repeated individuals, their timings are counted once
+        timer.times.update(result.pop('timing', {}))
+        charm_timing = result.pop('charm_timing', None)
+
+        for key, value in result['outputs'].items():
+            outputs[key] = value
+        self.sim_worked = result['sim_worked']
+
+        # Assign Constraints, from the worst operating point when there are several
+        worst = self.options['points'].worst(result) if self.options['points'] is not None else None
+        for constraint, output in CONSTRAINTS.items():
+            outputs[constraint] = worst[output] if worst is not None else outputs[output]
+
+        # Real CHARM results join the Pareto archive, surrogate predictions and corrected coarse runs do not
+        if self.options['archive'] is not None and self.sim_worked and not (result.get('surrogate')
+                                                                            or result.get('low_fidelity')):
+            self.options['archive'].add(result['outputs'], design, integer)
+
+        # Row of an individual restored after a resume is already in the CSV file
+        if result.get('restored') and integer in db.index:
+            self._last, self._pool_busy = time.perf_counter(), pool_busy
+            return
         
-        # Append all inputs and integer
-        staging.append_iterations(db, integer)
-        for input in ['Twist', 'Anhedral', 'Twist1', 'Twist2', 'Twist3', 'Twist4',
-                        'Twist5', 'Twist6', 'Twist7', 'Twist8', 'Twist9', 'Twist10', 'ZDistance']:
-            staging.append_vals(db, integer, locals()[input], input)
-
-        # Append all outputs
-        if self.sim_worked == True:
-            staging.append_vals(db, integer, log_file_parse('GAlgoRunsname.log').dict)
-        for i in [21, 22, 23, 24, 25, 2]:
-            staging.append_vals(db, integer, outputs[f'Observer{i}'], f'Observer{i}')
-        # Append time
-        staging.append_vals(db, integer, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'Time')
+        with timer.stage('Log'):
+            # Append all inputs (and segment values of the blade parameterization) and integer
+            staging.append_iterations(db, integer)
+            staging.append_vals(db, integer, {name: round(val, 3) for name, val in design.items()})
+
+            # Append all outputs
+            if self.sim_worked == True:
+                staging.append_vals(db, integer, result['log'])
+            for i in OBSERVERS:
+                staging.append_vals(db, integer, outputs[f'Observer{i}'], f'Observer{i}')
+            # Outputs of each operating point
+            if self.options['points'] is not None:
+                staging.append_vals(db, integer, self.options['points'].columns(result))
+            # Flag outputs predicted by the surrogate instead of CHARM
+            staging.append_vals(db, integer, {'Surrogate': int(result.get('surrogate', False))})
+            # Flag corrected coarse outputs
+            staging.append_vals(db, integer, {'LowFidelity': int(result.get('low_fidelity', False))})
+            # Flag outputs taken from the cache instead of a CHARM run
+            staging.append_vals(db, integer, {'Cached': int(result.get('cached', False))})
+            # Revolutions CHARM ran, and how far the design it restarted from was
+            # Left empty for rows without a CHARM run of their own (cache hits, predictions, failures)
+            ran = not result.get('cached', False)
+            revolutions = result.get('revolutions') if ran else None
+            staging.append_vals(db, integer, {'Revolutions': '' if revolutions is None else revolutions})
+            warm_start = result['warm_start'] if ran and 'warm_start' in result else ''
+            if warm_start != '':
+                warm_start = -1 if warm_start is None else round(warm_start, 4)
+            staging.append_vals(db, integer, {'WarmStart': warm_start})
+            # Why the log monitor stopped the run
+            if 'abort' in result:
+                staging.append_vals(db, integer, {'Abort': result['abort']})
+            # Why the pre-flight check rejected the candidate
+            if 'rejected' in result:
+                staging.append_vals(db, integer, {'Preflight': result['rejected']})
+            # Append time
+            staging.append_vals(db, integer, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'Time')
+            # Stored CHARM files of this row are found by its Iteration
+            if self.options['artifacts'] is not None and result.get('artifact') is not None:
+                self.options['artifacts'].tag(result['artifact'], integer)
+        # Append stage timings (the row write below only counts in the summary) and CHARM reported timings
+        staging.append_vals(db, integer, timing_columns(timer.times, charm_timing))
+        with timer.stage('Log'):
+            # Row is complete, append it to the CSV file
+            staging.commit_row(db, integer)
+
+        if self.options['timing'] is not None:
+            self.options['timing'].add(timer.times, charm_timing)
+        self._last, self._pool_busy = time.perf_counter(), pool_busy
         
 
 # Problem initialization
 # In this script, SGA driver initialization are done outside of the main loop for readability
+cache = EvalCache(CACHE_FILE, CACHE_MAX_ENTRIES, CACHE_MAX_AGE_DAYS) if CACHE_FILE else None
+monitor = LogMonitor(LOG_FILE, margin=MONITOR_MARGIN, interval=MONITOR_INTERVAL) if USE_LOG_MONITOR else None
+# Every candidate takes a CHARM run per operating point, serial runs still run its points at once
+runs = len(points) if points is not None else 1
+scheduler = CHARMScheduler(RUN_SCRIPT, outputs=[LOG_FILE], timeout=CHARM_TIMEOUT, retries=CHARM_RETRIES,
+                           cores=CHARM_CORES, max_jobs=max(PARALLEL_WORKERS, 1)*runs,
+                           serial_fraction=CHARM_SERIAL_FRACTION, monitor=monitor)
+scheduler.plan(runs)
+surrogate = SurrogateScreen() if USE_SURROGATE else None
+ladder = FidelityLadder(LOW_FIDELITY, PROMOTE_FRACTION) if USE_MULTI_FIDELITY else None
+# Predicted and corrected coarse rows need their flag column, unflagged they pass for CHARM results on resume and reseeding
+for feature, column in ((surrogate, 'Surrogate'), (ladder, 'LowFidelity')):
+    if feature is not None and column not in db.columns:
+        raise ValueError(f'{db.file} has no {column} column, start a new file name to use USE_SURROGATE or USE_MULTI_FIDELITY...')
+warm = RestartStore(WARM_START_DIR, RESTART_FILES, WARM_SETTINGS, WARM_START_DISTANCE) if USE_WARM_START else None
+checkpoint = GACheckpoint(CHECKPOINT_FILE, CHECKPOINT_EVERY) if CHECKPOINT_FILE else None
+archive = ParetoArchive(file=PARETO_FILE, history_file=PARETO_HISTORY_FILE) if PARETO_FILE else None
+artifacts = ArtifactStore(ARTIFACT_DIR, max_gb=ARTIFACT_MAX_GB) if ARTIFACT_DIR else None
+doe = DOESeed(DOE_SAMPLES, DOE_METHOD) if USE_DOE else None
+preflight = Preflight(PREFLIGHT_RULES, classifier=PREFLIGHT_CLASSIFIER) if USE_PREFLIGHT else None
+history = results_history(db, VARIABLES + (shape.derived if shape is not None else []), points) if RESUME else None
+queue = WorkQueue(QUEUE_LEASE, job_timeout=QUEUE_JOB_TIMEOUT) if QUEUE_PORT else None
+if queue is not None:
+    server = QueueServer(queue, host=QUEUE_HOST, port=QUEUE_PORT, token=QUEUE_TOKEN)
+    pool = QueuePool(queue, history=history, slots=max(PARALLEL_WORKERS, 1), points=points)
+elif PARALLEL_WORKERS > 0 or surrogate is not None or ladder is not None:
+    pool = (WorkerPool if PREWARMED_WORKERS else CandidatePool)(max(PARALLEL_WORKERS, 1), cache=cache,
+                                                                scheduler=scheduler, history=history, warm=warm,
+                                                                artifacts=artifacts, preflight=preflight,
+                                                                points=points)
+else:
+    pool = None
+timing = TimingReport()
 prob = om.Problem()
-prob.model.add_subsystem('GeneticAlgorithm', Optimizer(), promotes=['*'])
-
-# Implement OpenMDAO sqlite Recorder
-# Records run data to database filetype (sqlite)
-# View database contents using sqlite_reader.py file
-# or external SQLite database browser
-recordersq = om.SqliteRecorder('optimization_results.db')
-prob.driver.add_recorder(recordersq)
-
+prob.model.add_subsystem('GeneticAlgorithm', Optimizer(pool=pool, cache=cache, scheduler=scheduler, timing=timing,
+                                                       history=history, warm=warm, archive=archive,
+                                                       artifacts=artifacts, preflight=preflight, points=points),
+                         promotes=['*'])
 
 # Add design variable constraints
 prob.model.add_design_var('Twist', lower=-10, upper=45)
@@ -159,12 +465,16 @@ prob.model.add_design_var('Anhedral', lower=-1, upper=15)
 # When simulating 1 rotor, set ZDistance to zero at all times
 # This will result in non fatal RunTimeWarning error, ignore it
 prob.model.add_design_var('ZDistance', lower=0, upper=0)
-for i in range(1, 11):
-    prob.model.add_design_var(f'Twist{i}', lower=0, upper=8)
+if shape is None:
+    for i in range(1, 11):
+        prob.model.add_design_var(f'Twist{i}', lower=0, upper=8)
+else:
+    for name, (lower, upper) in shape.bounds.items():
+        prob.model.add_design_var(name, lower=lower, upper=upper)
 
 # Add algorithm objectives
 # -1 is maximize, 1 is minimize 
-for i in [21, 22, 23, 24, 25, 2]:
+for i in OBSERVERS:
     prob.model.add_objective(f'Observer{i}', scaler=1)
 prob.model.add_objective('Thrust_Total', scaler=-1)
 prob.model.add_objective('Yaw_Total', scaler=-1)
@@ -181,7 +491,30 @@ prob.model.add_constraint('RotorEff_Constraint', lower=0.0, upper=1.0)
 
 # Set up problem by adjusting driver (declaring options)
 # Configure the optimization features
-prob.driver = om.SimpleGADriver()
+# Parallel driver evaluates each generation in the pool before the usual serial pass
+# Steady-state driver keeps every slot of the pool busy with one child at a time
+# All drivers save checkpoints and resume from them
+if STEADY_STATE and pool is None:
+    print('STEADY_STATE needs PARALLEL_WORKERS above 0, using the generational driver...')
+elif STEADY_STATE and (surrogate is not None or ladder is not None):
+    print('Surrogate pre-screening and multi-fidelity evaluate whole generations, using the generational driver...')
+if STEADY_STATE and pool is not None and surrogate is None and ladder is None:
+    prob.driver = SteadyStateGADriver(pool, shape=shape, checkpoint=checkpoint, resume=RESUME, archive=archive,
+                                      doe=doe)
+elif pool is not None:
+    prob.driver = ParallelGADriver(pool, surrogate=surrogate, ladder=ladder, shape=shape, checkpoint=checkpoint,
+                                   resume=RESUME, archive=archive, doe=doe)
+else:
+    prob.driver = CheckpointGADriver(checkpoint=checkpoint, resume=RESUME, archive=archive, doe=doe)
+
+# Implement OpenMDAO sqlite Recorder, on the driver chosen above
+# Records run data to database filetype (sqlite)
+# View database contents using Recorder.read_cases, om.CaseReader,
+# or external SQLite database browser
+recordersq = BatchSqliteRecorder(RECORD_FILE, batch=RECORD_BATCH, interval=RECORD_INTERVAL,
+                                 variables=RECORD_VARIABLES) if RECORD_FILE else None
+if recordersq is not None:
+    prob.driver.add_recorder(recordersq)
 prob.driver.options['max_gen'] = 2
 # Population Heuristic Theory
 prob.driver.options['pop_size'] = 10
@@ -198,6 +531,9 @@ prob.driver.options['bits'] = {'Anhedral': 5, 'Twist1': 8, 'Twist2': 8,
                                'Twist3': 8, 'Twist4': 8, 'Twist5': 8, 'Twist6': 8,
                                 'Twist7': 8, 'Twist8': 8, 'Twist9': 8, 'Twist10': 8, 
                                 'ZDistance': 8}
+# Control points of the blade parameterization
+if shape is not None:
+    prob.driver.options['bits'] = dict(prob.driver.options['bits'], **{name: 8 for name in shape.variables})
 # Enables Gray Binary encoding, allows for smoother mutations by lowering the gap between numbers in binary
 # Done by using bitwise XOR gates, then shifting to the right
 prob.driver.options['gray'] = True
@@ -228,25 +564,62 @@ prob.driver.options['compute_pareto'] = True
 
 
 prob.setup()
+# Warm start distances are measured relative to the design variable ranges
+if warm is not None:
+    warm.configure({name: (float(meta['lower']), float(meta['upper']))
+                    for name, meta in prob.model.get_design_vars().items()})
+# Pre-flight classifier distances are measured like warm start distances, starting from the logged evaluations
+if preflight is not None:
+    preflight.configure({name: (float(meta['lower']), float(meta['upper']))
+                         for name, meta in prob.model.get_design_vars().items()})
+    preflight.seed_from_log(db)
+# Log monitor limits are the constraint bounds of the outputs it reads from the log
+if monitor is not None:
+    prob.final_setup()
+    monitor.configure({CONSTRAINTS[name]: (meta['lower'], meta['upper'])
+                       for name, meta in prob.model.get_constraints().items() if name in CONSTRAINTS})
+# Worst operating point of each constrained output is the one closest to (or furthest beyond) its bounds
+if points is not None:
+    prob.final_setup()
+    points.configure({CONSTRAINTS[name]: (meta['lower'], meta['upper'])
+                      for name, meta in prob.model.get_constraints().items() if name in CONSTRAINTS})
+# Pareto archive follows the objectives and their direction (scaler sign), starting from the logged results
+if archive is not None:
+    prob.final_setup()
+    archive.configure({name: np.sign(np.ravel(meta['scaler'])[0]) if meta['scaler'] is not None else 1
+                       for name, meta in prob.model.get_objectives().items()})
+    archive.seed_from_log(db)
+# Train the surrogate from the real results already logged in this CSV file
+if surrogate is not None:
+    prob.final_setup()
+    surrogate.seed_from_log(db)
 
 # Assign start values to all variables
 prob.set_val('Twist', 0.0)
 prob.set_val('Anhedral', 0.0)
 prob.set_val('ZDistance', 0.0)
-prob.set_val('Twist1', 2.75)
-prob.set_val('Twist2', 0.5)
-prob.set_val('Twist3', 0.75)
-prob.set_val('Twist4', 0.75)
-prob.set_val('Twist5', 1.0)
-prob.set_val('Twist6', 1.0)
-prob.set_val('Twist7', 0.5)
-prob.set_val('Twist8', 0.0)
-prob.set_val('Twist9', 0.0)
-prob.set_val('Twist10', 0.0)
+if shape is None:
+    prob.set_val('Twist1', 2.75)
+    prob.set_val('Twist2', 0.5)
+    prob.set_val('Twist3', 0.75)
+    prob.set_val('Twist4', 0.75)
+    prob.set_val('Twist5', 1.0)
+    prob.set_val('Twist6', 1.0)
+    prob.set_val('Twist7', 0.5)
+    prob.set_val('Twist8', 0.0)
+    prob.set_val('Twist9', 0.0)
+    prob.set_val('Twist10', 0.0)
+else:
+    # Control points closest to the same start twist and the default chord
+    for name, val in shape.fit([2.75, 0.5, 0.75, 0.75, 1.0, 1.0, 0.5, 0.0, 0.0, 0.0]).items():
+        prob.set_val(name, val)
 
 # Main Loop
 try:
-    prob.run_driver()
+    # Summary covers the optimization itself, not the problem setup
+    timing.start = time.perf_counter()
+    with ProfileHook(PROFILE) if PROFILE else contextlib.nullcontext():
+        prob.run_driver()
 
     # Print these to view output data
     desvar_nd = prob.driver.get_design_var_values()
@@ -255,15 +628,44 @@ try:
     print('Algorithm has completed successfully!')
     print(desvar_nd)
     print(nd_obj)
+    print(f'CHARM runs: {scheduler.stats}')
+    if queue is not None:
+        print(f'Work queue: {queue.stats}')
+    if ladder is not None:
+        print(f'Multi-fidelity: {ladder.stats}')
+    if preflight is not None:
+        print(f'Pre-flight: {preflight.stats}')
+    if warm is not None:
+        print(warm.summary())
+    if artifacts is not None:
+        stored, raw = artifacts.size()
+        print(f'Artifacts: {raw/1024**2:.1f} MB of distinct CHARM files stored in {stored/1024**2:.1f} MB')
+    print(timing.summary())
+    # write any rows still buffered
+    staging.save_to_csv(db)
+    # commit recorder cases still in the open batch
+    if recordersq is not None:
+        recordersq.flush()
 
 except (KeyboardInterrupt, GeneratorExit) as e:
     print(f"Program interrupted. Error {e}. Saving data...")
+    if checkpoint is not None:
+        print(f'Set RESUME = True to continue from {CHECKPOINT_FILE}')
+    # CHARM runs in its own process group, so it does not see the interrupt itself
+    scheduler.cancel()
     # save any data in progress before exiting
     staging.save_to_csv(db)
+    if recordersq is not None:
+        recordersq.flush()
 
 except Exception as e:
     print(f"Caught an unexpected error of type {type(e).__name__}: {e}")
+    if checkpoint is not None:
+        print(f'Set RESUME = True to continue from {CHECKPOINT_FILE}')
+    scheduler.cancel()
     staging.save_to_csv(db)
+    if recordersq is not None:
+        recordersq.flush()
 
 
 # New changes:
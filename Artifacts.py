@@ -0,0 +1,296 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the artifact store of raw CHARM inputs and outputs
+# Every CHARM run's decks, log, and noise file are kept compressed, each distinct file content is stored once,
+# and runs are indexed by design and by results log iteration, so any CSV row can be re-parsed later
+# without running CHARM again
+# Read comments in and above each method before using/editing
+
+
+import os
+import time
+import json
+import zlib
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from CHARMRunner import LOG_FILE, DAT_FILE
+from CHARMScheduler import OUTPUT_FILE
+
+
+# Files kept of every run: generated decks, CHARM log, noise file, and console output
+ARTIFACT_FILES = ['GAlgoRunsbg.inp', 'GAlgoRunsrw.inp', 'GAlgoRunsname.inp', LOG_FILE, DAT_FILE, OUTPUT_FILE]
+
+
+def design_hash(design, decimals=6):
+    """
+    Hash of a design vector, the index key of its runs
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+    decimals : int
+        Rounding applied to the values
+
+    Returns:
+    --------
+    str
+        SHA-256 hex digest
+    """
+    canonical = {name: round(float(val), decimals) + 0.0 for name, val in design.items()}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class ArtifactStore():
+    """
+    Content addressed store of CHARM run files
+    File contents are zlib compressed into objects/<hash[:2]>/<hash>, named by the SHA-256 of the raw content,
+    and a SQLite index maps runs to their files, design hash, and results log iterations
+    Safe to share between pool threads
+
+    Runs over the size budget are evicted least recently used first (saving, tagging, or reading uses a run),
+    objects no run refers to any more are deleted with them
+
+    Attributes:
+    -----------
+    directory : str
+        Store directory
+    files : list
+        File names saved from each run directory
+    max_bytes : int or None
+        Budget of compressed object bytes, None for unlimited
+    level : int
+        zlib compression level
+    """
+    def __init__(self, directory='GAArtifacts', files=ARTIFACT_FILES, max_gb=2.0, level=6):
+        self.directory = directory
+        self.files = list(files)
+        self.max_bytes = None if max_gb is None else int(max_gb*1024**3)
+        self.level = level
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        with self._connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER, stored INTEGER)')
+            con.execute('CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, design_hash TEXT, design TEXT, '
+                        'settings TEXT, status TEXT, created REAL, accessed REAL)')
+            con.execute('CREATE TABLE IF NOT EXISTS files (run INTEGER, name TEXT, hash TEXT, PRIMARY KEY (run, name))')
+            con.execute('CREATE TABLE IF NOT EXISTS iterations (iteration INTEGER PRIMARY KEY, run INTEGER)')
+            con.execute('CREATE INDEX IF NOT EXISTS runs_design ON runs (design_hash)')
+            con.execute('CREATE INDEX IF NOT EXISTS runs_accessed ON runs (accessed)')
+            con.execute('CREATE INDEX IF NOT EXISTS files_hash ON files (hash)')
+
+    @contextmanager
+    def _connect(self):
+        # New connection per call keeps the store usable from pool threads
+        con = sqlite3.connect(os.path.join(self.directory, 'index.db'), timeout=60)
+        try:
+            con.execute('PRAGMA journal_mode=WAL')
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _object(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def save(self, workdir, design, settings=None, status=None):
+        """
+        Store the files of a completed run, files missing from workdir are skipped
+
+        Parameters:
+        -----------
+        workdir : str
+            Run directory
+        design : dict
+            Design variable name to float value
+        settings : dict or None
+            Deck parameters the run used (e.g. coarse multi-fidelity settings)
+        status : str or None
+            CHARMScheduler run status
+
+        Returns:
+        --------
+        int or None
+            Run id, None if workdir holds none of the files
+        """
+        contents = {}
+        for name in self.files:
+            path = os.path.join(workdir, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    contents[name] = f.read()
+        if not contents:
+            return None
+        digests = {name: hashlib.sha256(data).hexdigest() for name, data in contents.items()}
+        now = time.time()
+        with self._lock:
+            with self._connect() as con:
+                known = {row[0] for row in con.execute(
+                    f'SELECT hash FROM objects WHERE hash IN ({",".join("?"*len(digests))})', list(digests.values()))}
+                for name, digest in digests.items():
+                    if digest in known:
+                        continue
+                    # Objects are written aside and renamed into place, readers never see a partial object
+                    packed = zlib.compress(contents[name], self.level)
+                    os.makedirs(os.path.dirname(self._object(digest)), exist_ok=True)
+                    fd, temp = tempfile.mkstemp(dir=os.path.dirname(self._object(digest)), prefix='.object')
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(packed)
+                    os.replace(temp, self._object(digest))
+                    con.execute('INSERT OR IGNORE INTO objects VALUES (?, ?, ?)', (digest, len(contents[name]), len(packed)))
+                    known.add(digest)
+                run = con.execute('INSERT INTO runs (design_hash, design, settings, status, created, accessed) '
+                                  'VALUES (?, ?, ?, ?, ?, ?)',
+                                  (design_hash(design), json.dumps(design), json.dumps(settings or {}, sort_keys=True),
+                                   status, now, now)).lastrowid
+                con.executemany('INSERT INTO files VALUES (?, ?, ?)',
+                                [(run, name, digest) for name, digest in digests.items()])
+            self._evict()
+        return run
+
+    def tag(self, run, iteration):
+        """
+        Attach a results log iteration to a run, an iteration belongs to one run at a time
+
+        Parameters:
+        -----------
+        run : int
+            Run id from save
+        iteration : int
+            Results log row
+        """
+        with self._connect() as con:
+            # Cached results can point to runs evicted since
+            if con.execute('UPDATE runs SET accessed = ? WHERE id = ?', (time.time(), run)).rowcount:
+                con.execute('INSERT OR REPLACE INTO iterations VALUES (?, ?)', (int(iteration), run))
+
+    def find(self, iteration=None, design=None):
+        """
+        Runs by results log iteration or by design, newest first
+
+        Parameters:
+        -----------
+        iteration : int or None
+            Results log row
+        design : dict or None
+            Design variable name to float value
+
+        Returns:
+        --------
+        list
+            Dict per run: id, design, settings, status, created, files (name to content hash)
+        """
+        with self._connect() as con:
+            if iteration is not None:
+                rows = con.execute('SELECT runs.* FROM runs JOIN iterations ON iterations.run = runs.id '
+                                   'WHERE iterations.iteration = ?', (int(iteration),)).fetchall()
+            elif design is not None:
+                rows = con.execute('SELECT * FROM runs WHERE design_hash = ? ORDER BY created DESC',
+                                   (design_hash(design),)).fetchall()
+            else:
+                rows = con.execute('SELECT * FROM runs ORDER BY created DESC').fetchall()
+            runs = []
+            for run, _, design_json, settings, status, created, _ in rows:
+                files = dict(con.execute('SELECT name, hash FROM files WHERE run = ?', (run,)).fetchall())
+                runs.append({'id': run, 'design': json.loads(design_json), 'settings': json.loads(settings),
+                             'status': status, 'created': created, 'files': files})
+        return runs
+
+    def read(self, run, name):
+        """
+        Raw content of one file of a run
+
+        Parameters:
+        -----------
+        run : int
+            Run id
+        name : str
+            File name, e.g. GAlgoRunsname.log
+
+        Returns:
+        --------
+        bytes or None
+            File content, None if the run or file is not stored
+        """
+        with self._connect() as con:
+            row = con.execute('SELECT hash FROM files WHERE run = ? AND name = ?', (run, name)).fetchone()
+            if row is None:
+                return None
+            con.execute('UPDATE runs SET accessed = ? WHERE id = ?', (time.time(), run))
+        try:
+            with open(self._object(row[0]), 'rb') as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            # Evicted in the meantime
+            return None
+
+    def extract(self, run, directory):
+        """
+        Write the files of a run into a directory, e.g. to re-parse them with charm_log and oaspl_table
+
+        Parameters:
+        -----------
+        run : int
+            Run id
+        directory : str
+            Target directory, created if it does not exist
+
+        Returns:
+        --------
+        list
+            Paths of the files written
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name in self.files:
+            data = self.read(run, name)
+            if data is None:
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        return paths
+
+    def size(self):
+        """
+        Stored object bytes
+
+        Returns:
+        --------
+        int
+            Compressed bytes
+        int
+            Raw bytes of the distinct contents
+        """
+        with self._connect() as con:
+            stored, raw = con.execute('SELECT COALESCE(SUM(stored), 0), COALESCE(SUM(size), 0) FROM objects').fetchone()
+        return stored, raw
+
+    def _evict(self):
+        # Called with the lock held, removes least recently used runs until the objects fit the budget
+        if self.max_bytes is None:
+            return
+        with self._connect() as con:
+            total = con.execute('SELECT COALESCE(SUM(stored), 0) FROM objects').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for (run,) in con.execute('SELECT id FROM runs ORDER BY accessed').fetchall():
+                con.execute('DELETE FROM files WHERE run = ?', (run,))
+                con.execute('DELETE FROM iterations WHERE run = ?', (run,))
+                con.execute('DELETE FROM runs WHERE id = ?', (run,))
+                orphans = con.execute('SELECT hash, stored FROM objects WHERE hash NOT IN '
+                                      '(SELECT hash FROM files)').fetchall()
+                for digest, stored in orphans:
+                    con.execute('DELETE FROM objects WHERE hash = ?', (digest,))
+                    if os.path.exists(self._object(digest)):
+                        os.remove(self._object(digest))
+                    total -= stored
+                if total <= self.max_bytes:
+                    break
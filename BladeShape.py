@@ -0,0 +1,176 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the low-dimensional blade parameterizations of the Genetic Algorithm
+# Twist rate and chord are smooth Bezier or B-spline curves over the blade span, set by a few control points,
+# and the per segment CHARM arrays (TWSTGD, CHORD) are sampled from them,
+# so the GA searches a handful of variables instead of every segment and blades stay physically smooth
+# Read comments in and above each method before using/editing
+
+
+from math import comb
+import numpy as np
+from scipy.interpolate import BSpline
+from SingleFileMakerCHARM import DEFAULT_PARAMS
+
+
+# Curves available
+SHAPES = ['bezier', 'bspline']
+
+
+def blade_stations(cutout=DEFAULT_PARAMS['cutout'], sl=DEFAULT_PARAMS['sl']):
+    """
+    Span positions of the segment edges and centers, 0 at the root cutout and 1 at the tip
+
+    Parameters:
+    -----------
+    cutout : float
+        Root cutout (CUTOUT)
+    sl : list
+        Segment lengths (SL(ISEG))
+
+    Returns:
+    --------
+    ndarray
+        Edge positions, NSEG + 1 values
+    ndarray
+        Center positions, NSEG values
+    """
+    edges = cutout + np.concatenate([[0.0], np.cumsum(sl)])
+    edges = (edges - edges[0])/(edges[-1] - edges[0])
+    return edges, (edges[:-1] + edges[1:])/2
+
+
+def curve_basis(kind, count, t, degree=3):
+    """
+    Basis matrix of a curve, values at t are basis @ control points
+
+    Parameters:
+    -----------
+    kind : str
+        'bezier' (one polynomial of degree count - 1) or 'bspline' (clamped uniform B-spline)
+    count : int
+        Number of control points
+    t : ndarray
+        Span positions between 0 and 1
+    degree : int
+        B-spline degree, lowered to count - 1 for few control points
+
+    Returns:
+    --------
+    ndarray
+        len(t) by count matrix
+    """
+    t = np.clip(np.asarray(t, dtype=float), 0.0, 1.0)
+    if kind == 'bezier':
+        n = count - 1
+        return np.column_stack([comb(n, i)*t**i*(1 - t)**(n - i) for i in range(count)])
+    degree = min(degree, count - 1)
+    knots = np.concatenate([np.zeros(degree), np.linspace(0.0, 1.0, count - degree + 1), np.ones(degree)])
+    return BSpline.design_matrix(t, knots, degree).toarray()
+
+
+class BladeShape():
+    """
+    Twist rate and chord distributions described by control points
+    With 4 or fewer control points the B-spline and the Bezier curve are the same polynomial
+
+    Control points are design variables TwistCP1..n and ChordCP1..m, end points sit at the root and the tip
+    The twist curve is the twist rate in degrees per blade radius, TWSTGD is the twist change over a segment
+    expand adds the per segment values CHARM reads: Twist1..Twist10 (TWSTGD, the rate at the segment center times SL)
+    and Chord1..Chord11 (CHORD, at segment edges)
+
+    Attributes:
+    -----------
+    kind : str
+        'bezier' or 'bspline'
+    variables : list
+        Control point design variable names
+    bounds : dict
+        Control point name to (lower, upper)
+    derived : list
+        Per segment names expand adds to a design
+    columns : list
+        Results log columns of a design, control points and chords
+    """
+    def __init__(self, kind='bspline', twist_points=4, chord_points=3, twist_bounds=(0.0, 80.0),
+                 chord_bounds=(0.02, 0.20), degree=3, cutout=DEFAULT_PARAMS['cutout'], sl=DEFAULT_PARAMS['sl']):
+        if kind not in SHAPES:
+            raise ValueError(f'Blade shape must be one of {SHAPES}, not {kind}')
+        if twist_points < 2 or chord_points < 2:
+            raise ValueError('Blade shape needs at least 2 control points per curve...')
+        self.kind = kind
+        edges, centers = blade_stations(cutout, sl)
+        self._twist_names = [f'TwistCP{i}' for i in range(1, twist_points + 1)]
+        self._chord_names = [f'ChordCP{i}' for i in range(1, chord_points + 1)]
+        # Segment twist is the rate at the segment center times its length, folded into the basis
+        self._twist_basis = curve_basis(kind, twist_points, centers, degree)*np.asarray(sl, dtype=float)[:, None]
+        self._chord_basis = curve_basis(kind, chord_points, edges, degree)
+        self.variables = self._twist_names + self._chord_names
+        self.bounds = dict({name: twist_bounds for name in self._twist_names},
+                           **{name: chord_bounds for name in self._chord_names})
+        self.derived = ([f'Twist{i}' for i in range(1, len(centers) + 1)]
+                        + [f'Chord{i}' for i in range(1, len(edges) + 1)])
+        self.columns = self.variables + [name for name in self.derived if name.startswith('Chord')]
+
+    def expand(self, design):
+        """
+        Add the per segment twist and chord of a design
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value, must hold every control point
+
+        Returns:
+        --------
+        dict
+            Copy of design with the derived names added
+        """
+        twist = self._twist_basis @ np.array([design[name] for name in self._twist_names], dtype=float)
+        chord = self._chord_basis @ np.array([design[name] for name in self._chord_names], dtype=float)
+        expanded = dict(design)
+        expanded.update(zip(self.derived, [float(val) for val in np.concatenate([twist, chord])]))
+        return expanded
+
+    def fit(self, twist, chord=DEFAULT_PARAMS['chord']):
+        """
+        Control points closest (least squares) to a per segment blade, e.g. for start values
+
+        Parameters:
+        -----------
+        twist : list
+            Twist change over each segment (TWSTGD)
+        chord : list
+            Chord of each segment edge
+
+        Returns:
+        --------
+        dict
+            Control point name to value, within bounds
+        """
+        points = {}
+        for names, basis, values in ((self._twist_names, self._twist_basis, twist),
+                                     (self._chord_names, self._chord_basis, chord)):
+            control = np.linalg.lstsq(basis, np.asarray(values, dtype=float), rcond=None)[0]
+            points.update({name: float(np.clip(val, *self.bounds[name])) for name, val in zip(names, control)})
+        return points
+
+    def layout(self, columns):
+        """
+        Results log layout with the control point and chord columns placed after the design variables
+
+        Parameters:
+        -----------
+        columns : list
+            Base layout, e.g. staging.COLUMNS
+
+        Returns:
+        --------
+        list
+            Layout including columns
+        """
+        at = columns.index('Observer2')
+        return columns[:at] + [name for name in self.columns if name not in columns] + columns[at:]
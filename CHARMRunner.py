@@ -0,0 +1,378 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the single candidate CHARM pipeline:
+# write input files, run CHARM, and parse the outputs
+# Used by both the serial Optimizer component and the parallel candidate pool
+# Read comments in and above each method before using/editing
+
+
+import os
+import shutil
+from GeneticAl import oaspl_table, charm_log
+from SingleFileMakerCHARM import FileMaker
+from CHARMScheduler import CHARMScheduler, OUTPUT_FILE
+from Timing import StageTimer
+
+
+# Design variables in the order the Optimizer component declares them
+DESIGN_VARS = ['Twist', 'Anhedral', 'Twist1', 'Twist2', 'Twist3', 'Twist4',
+               'Twist5', 'Twist6', 'Twist7', 'Twist8', 'Twist9', 'Twist10', 'ZDistance']
+OBSERVERS = [21, 22, 23, 24, 25, 2]
+
+# Chord of each segment edge, set by a blade parameterization (BladeShape.expand), the deck default otherwise
+CHORD_VARS = [f'Chord{i}' for i in range(1, 12)]
+
+# Optimizer constraint outputs and the output each one copies
+CONSTRAINTS = {'Obs2_Constraint': 'Observer2', 'Obs25_Constraint': 'Observer25',
+               'Thrust_Constraint': 'Thrust_Total', 'RotorEff_Constraint': 'Rotor_Eff'}
+
+# CHARM output files, named after the generated name file (GAlgoRunsname.inp)
+LOG_FILE = 'GAlgoRunsname.log'
+DAT_FILE = 'GAlgoRunsname_oaspldBA.dat'
+
+# Optimizer outputs read from the CHARM log, and their log value names
+LOG_OUTPUTS = {'Thrust_Total': 'TotalThrust', 'Yaw_Total': 'TotalYaw', 'Coef_Power': 'PowerCoef', 'Rotor_Eff': 'RotorEff'}
+
+# Input files that never change between candidates
+# These are linked into every sandbox rather than copied
+STATIC_FILES = ['GABasebd.inp', 'GABaserw.inp', '0012air.inp']
+
+# Absolute path so the script can be launched from inside a sandbox
+RUN_SCRIPT = os.path.abspath('GACHARMrun.sh')
+
+# If CHARM files return error, that iteration does not conform to physics
+# Results in extreme punishment
+PENALTY_OUTPUTS = {
+    'Observer2': 1000, 'Observer21': 1000, 'Observer22': 1000, 'Observer23': 1000,
+    'Observer24': 1000, 'Observer25': 1000, 'Thrust_Total': -1000, 'Yaw_Total': -1000,
+    'Coef_Power': -1000, 'Rotor_Eff': -10
+}
+
+# Scheduler used when none is given: no timeout, all cores to a single run
+SCHEDULER = CHARMScheduler(RUN_SCRIPT, outputs=[LOG_FILE])
+
+
+def make_workdir(path, static_dir='.'):
+    """
+    Create a sandbox directory for one candidate and link the static CHARM inputs into it
+
+    Parameters:
+    -----------
+    path : str
+        Sandbox directory, created if it does not exist
+    static_dir : str
+        Directory holding the static input files (CHARM NOISE directory)
+
+    Returns:
+    --------
+    str
+        Sandbox directory
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in STATIC_FILES:
+        source = os.path.abspath(os.path.join(static_dir, name))
+        target = os.path.join(path, name)
+        # Missing static files are left for CHARM to report, same as a serial run
+        if not os.path.exists(source) or os.path.lexists(target):
+            continue
+        try:
+            os.symlink(source, target)
+        except OSError:
+            # Some filesystems (e.g. mounted Windows drives) do not allow symlinks
+            shutil.copy(source, target)
+    return path
+
+
+def write_deck(design, workdir='.', kinds=None, **params):
+    """
+    Create the CHARM input files of a design
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+    workdir : str
+        Directory to write the files into
+    kinds : list or None
+        Files to write ('bg', 'rw', 'name'), None for all of them
+    params : dict
+        Deck parameters replacing the SingleFileMakerCHARM defaults
+    """
+    if CHORD_VARS[0] in design:
+        params = dict(params, chord=[design[name] for name in CHORD_VARS])
+    FileMaker(1, 2, design['Twist'], design['Anhedral'], design['ZDistance'], design['Twist1'],
+              design['Twist2'], design['Twist3'], design['Twist4'], design['Twist5'],
+              design['Twist6'], design['Twist7'], design['Twist8'], design['Twist9'],
+              design['Twist10'], path=workdir, kinds=kinds, **params)
+
+
+def evaluate_design(design, workdir='.', cache=None, scheduler=None, settings=None, warm=None, artifacts=None,
+                    preflight=None, points=None):
+    """
+    Create CHARM run files, run CHARM, and parse its outputs for a single candidate
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value, must contain every name in DESIGN_VARS
+    workdir : str
+        Directory to run CHARM in, defaults to the current (NOISE) directory
+    cache : EvalCache or None
+        Persistent cache checked before running CHARM and updated after
+    scheduler : CHARMScheduler or None
+        Scheduler that launches CHARM, defaults to SCHEDULER
+    settings : dict or None
+        Deck parameters replacing the SingleFileMakerCHARM defaults (e.g. coarse solver settings)
+    warm : RestartStore or None
+        Restart data of solved designs, the run starts from the nearest one
+    artifacts : ArtifactStore or None
+        Store the decks and outputs of the run are kept in (cache hits keep the artifact of the original run)
+    preflight : Preflight or None
+        Checks run before the decks are written, a rejected design gets the penalty outputs without a CHARM run
+    points : OperatingPoints or None
+        Operating points the design is run at (see MultiPoint.py), None for the single deck operating point
+
+    Returns:
+    --------
+    dict
+        outputs : dict of Optimizer output name to value (penalty values on failure)
+        log : dict of parsed CHARM log data (empty on failure)
+        sim_worked : bool, True if CHARM ran and its outputs could be parsed
+        status : str, CHARMScheduler run status (only present when CHARM was run)
+        abort : str, why the scheduler log monitor stopped the run (only present when aborted)
+        rejected : str, why the pre-flight check rejected the design (only present when rejected, status 'rejected')
+        timing : dict, seconds spent per stage (Deck, Cache, CHARM, Parse)
+        charm_timing : dict, timings CHARM reported in its log (only present when it was parsed)
+        revolutions : int, revolutions CHARM reported results after (only present when it was parsed)
+        cached : bool, True when the result came from the cache, status, revolutions, and warm_start are those of
+            the original run (only present on a cache hit)
+        warm_start : float or None, distance to the design the run restarted from (only present with warm)
+        artifact : int, ArtifactStore run id of the stored files (only present with artifacts)
+        points : list, outputs of each operating point (only present with points)
+    """
+    timer = StageTimer()
+    # Warm start settings (empty unless set in WarmStart.py) apply to every run, cold or warm
+    params = dict(warm.settings if warm is not None else {}, **(settings or {}))
+    rejected = preflight_check(design, params, preflight, timer)
+    if rejected is not None:
+        return rejected
+    if points is not None:
+        result = points.evaluate(design, workdir, cache, scheduler, timer, warm, artifacts, params)
+    else:
+        result = cached_run(design, workdir, cache, scheduler, timer, warm, artifacts, params)
+    # Coarse runs fail for their own reasons, only full runs teach the pre-flight classifier
+    if preflight is not None and not settings:
+        preflight.record(design, result)
+    result['timing'] = timer.times
+    return result
+
+
+def cached_run(design, workdir, cache, scheduler, timer, warm, artifacts, params, kinds=None):
+    """
+    Write the decks of a design, then take its result from the cache or run CHARM
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+    workdir : str
+        Directory to run CHARM in
+    cache : EvalCache or None
+        Persistent cache checked before running CHARM and updated after
+    scheduler : CHARMScheduler or None
+        Scheduler that launches CHARM
+    timer : StageTimer
+        Receives the Deck, Cache, CHARM, and Parse stage times
+    warm : RestartStore or None
+        Restart data of solved designs
+    artifacts : ArtifactStore or None
+        Store of the CHARM run files
+    params : dict
+        Deck parameters replacing the SingleFileMakerCHARM defaults
+    kinds : list or None
+        Decks to write ('bg', 'rw', 'name'), None for all of them, the others must already be in workdir
+
+    Returns:
+    --------
+    dict
+        Result of run_design, plus warm_start and artifact as in evaluate_design
+    """
+    with timer.stage('Deck'):
+        # Remove outputs of the previous run so a failed run cannot be parsed as a success
+        for name in (LOG_FILE, DAT_FILE):
+            if os.path.exists(os.path.join(workdir, name)):
+                os.remove(os.path.join(workdir, name))
+        if warm is not None:
+            warm.clear(workdir)
+
+        # Create CHARM input files, cold start decks so warm and cold runs share cache entries
+        write_deck(design, workdir, kinds, **params)
+
+    # Key includes the generated files, so it is only known once they are written
+    if cache is not None:
+        with timer.stage('Cache'):
+            key = cache.key(design, [os.path.join(workdir, f'GAlgoRuns{ext}.inp')
+                                     for ext in ('bg', 'rw', 'name')])
+            result = cache.get(key)
+        if result is None:
+            result = warm_run(design, workdir, scheduler, timer, warm, params)
+            store_artifacts(result, design, workdir, timer, artifacts, params)
+            # Runs that did not finish are left out by the cache
+            with timer.stage('Cache'):
+                cache.put(key, design, result)
+    else:
+        result = warm_run(design, workdir, scheduler, timer, warm, params)
+        store_artifacts(result, design, workdir, timer, artifacts, params)
+    return result
+
+
+def preflight_check(design, params, preflight, timer):
+    """
+    Run the pre-flight check of a design, timed in the Deck stage
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+    params : dict
+        Deck parameters the input files would be written with
+    preflight : Preflight or None
+        Checks run before the decks are written
+    timer : StageTimer
+        Receives the check time
+
+    Returns:
+    --------
+    dict or None
+        Penalty result of a rejected design (status 'rejected'), None to run it
+    """
+    if preflight is None:
+        return None
+    with timer.stage('Deck'):
+        reason = preflight.check(design, params)
+    if reason is None:
+        return None
+    return {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': 'rejected',
+            'rejected': reason, 'timing': timer.times}
+
+
+def store_artifacts(result, design, workdir, timer, artifacts, params):
+    """
+    Keep the decks and outputs of a finished CHARM run, its artifact id is added to result
+    Cancelled runs are not kept
+
+    Parameters:
+    -----------
+    result : dict
+        Result of run_design
+    design : dict
+        Design variable name to float value
+    workdir : str
+        Run directory
+    timer : StageTimer
+        Receives the store time as part of the Cache stage
+    artifacts : ArtifactStore or None
+        Store of the CHARM run files
+    params : dict
+        Deck parameters the input files were written with
+    """
+    if artifacts is None or result['status'] == 'cancelled':
+        return
+    with timer.stage('Cache'):
+        run = artifacts.save(workdir, design, params, result['status'])
+    if run is not None:
+        result['artifact'] = run
+
+
+def warm_run(design, workdir, scheduler, timer, warm, params):
+    """
+    Run CHARM on the decks in workdir, restarted from the nearest solved design when warm is given
+    Restart data of a successful run is added to warm
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+    workdir : str
+        Directory holding the CHARM input files
+    scheduler : CHARMScheduler or None
+        Scheduler that launches CHARM
+    timer : StageTimer
+        Receives the Deck, CHARM, and Parse stage times
+    warm : RestartStore or None
+        Restart data of solved designs
+    params : dict
+        Deck parameters the input files were written with
+
+    Returns:
+    --------
+    dict
+        Result of run_design, plus warm_start when warm is given
+    """
+    if warm is None:
+        return run_design(workdir, scheduler, timer)
+    with timer.stage('Deck'):
+        distance = warm.restore(design, workdir, params)
+        # Restart flag is in the name file, the geometry deck may be shared by other runs
+        if distance is not None:
+            write_deck(design, workdir, ('name',), **dict(params, irst=1))
+    result = run_design(workdir, scheduler, timer)
+    result['warm_start'] = distance
+    if result['sim_worked']:
+        warm.save(design, workdir, params)
+        warm.record(distance is not None, result.get('revolutions'))
+    return result
+
+
+def run_design(workdir='.', scheduler=None, timer=None):
+    """
+    Run CHARM on the input files already in workdir and parse its outputs
+
+    Parameters:
+    -----------
+    workdir : str
+        Directory holding the CHARM input files
+    scheduler : CHARMScheduler or None
+        Scheduler that launches CHARM, defaults to SCHEDULER
+    timer : StageTimer or None
+        Receives the CHARM and Parse stage times
+
+    Returns:
+    --------
+    dict
+        Same format as evaluate_design, without timing
+    """
+    timer = timer or StageTimer()
+    log_path = os.path.join(workdir, LOG_FILE)
+    dat_path = os.path.join(workdir, DAT_FILE)
+    # Calculate outputs
+    with timer.stage('CHARM'):
+        run = (scheduler or SCHEDULER).run(workdir)
+    # A stopped run may have left partial outputs, they are not parsed
+    if run['status'] == 'aborted':
+        print(f'CHARM run in {workdir} aborted after {run["elapsed"]:.0f} s ({run["reason"]})...')
+        return {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': run['status'],
+                'abort': run['reason']}
+    if run['status'] in ('timeout', 'cancelled'):
+        print(f'CHARM run in {workdir} {run["status"]} after {run["elapsed"]:.0f} s...')
+        return {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': run['status']}
+    try:
+        with timer.stage('Parse'):
+            # Noise file is read once for all observers
+            totals = oaspl_table(dat_path).column('Total', OBSERVERS)
+            outputs = {f'Observer{observer}': float(total) for observer, total in zip(OBSERVERS, totals)}
+            # Log is read once, from its tail
+            record = charm_log.read(log_path)
+            log = record.as_dict()
+            outputs.update({name: log.get(key) for name, key in LOG_OUTPUTS.items()})
+        return {'outputs': outputs, 'log': log, 'sim_worked': True, 'status': run['status'],
+                'charm_timing': record.timing, 'revolutions': record.revolutions}
+
+    except Exception as error:
+        # CHARM console output of the run is in OUTPUT_FILE
+        print(f'CHARM outputs in {workdir} could not be parsed ({type(error).__name__}: {error}), '
+              f'see {os.path.join(workdir, OUTPUT_FILE)}...')
+        return {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': run['status']}
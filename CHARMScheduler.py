@@ -0,0 +1,340 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the CHARM job scheduler
+# Every CHARM run is launched from one asyncio event loop with a wall clock timeout,
+# bounded concurrency, and retry of runs that fail before CHARM starts
+# A thread budget splits the machine cores between concurrent runs and CHARM threads per run
+# An optional log monitor stops runs whose log already shows they cannot give a usable result
+# Read comments in and above each method before using/editing
+
+
+import os
+import time
+import signal
+import asyncio
+import threading
+
+
+# File in the run directory receiving the stdout and stderr of the run script and CHARM
+OUTPUT_FILE = 'GACHARMrun.out'
+
+
+def available_cores():
+    """
+    Number of cores this process may use (respects taskset/cgroup affinity where available)
+
+    Returns:
+    --------
+    int
+        Core count
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_budget(pending, cores=None, serial_fraction=0.05, max_jobs=None):
+    """
+    Split the cores between concurrent CHARM runs and threads per run
+    A generation finishes when its last run finishes, so the split with the shortest batch time is picked
+    Run time with t threads is modelled as serial_fraction + (1 - serial_fraction)/t (Amdahl)
+
+    Parameters:
+    -----------
+    pending : int
+        Number of runs in the batch
+    cores : int or None
+        Cores to share, defaults to available_cores()
+    serial_fraction : float
+        Fraction of a CHARM run that does not speed up with threads
+    max_jobs : int or None
+        Most concurrent runs allowed (e.g. memory limit)
+
+    Returns:
+    --------
+    int
+        Concurrent runs
+    int
+        CHARM threads per run
+    """
+    cores = cores or available_cores()
+    limit = max(1, min(pending, cores, max_jobs or cores))
+    best = None
+    for jobs in range(1, limit + 1):
+        threads = cores // jobs
+        waves = -(-max(pending, 1) // jobs)
+        batch_time = waves*(serial_fraction + (1 - serial_fraction)/threads)
+        # Ties go to more jobs, which leaves fewer cores idle when runs take unequal time
+        if best is None or batch_time <= best[0]:
+            best = (batch_time, jobs, threads)
+    return best[1], best[2]
+
+
+class CHARMScheduler():
+    """
+    Runs the CHARM script in candidate directories from a background asyncio event loop
+    Blocking run calls are safe from any number of threads (serial component, pool threads)
+
+    Each run is started in its own process group, so on timeout or cancel
+    the script, CHARM, and anything CHARM started are killed together
+    A run is retried when the script exits with an error before writing any output file,
+    i.e. CHARM never started (license, fork, or file system hiccup)
+    CHARM threads are passed to the script through OMP_NUM_THREADS
+    Script and CHARM console output goes to the output file in the run directory, retries append to it
+    With a monitor, the log of every run is checked while it runs, a run it stops is 'aborted' and not retried
+
+    Attributes:
+    -----------
+    script : str
+        Absolute path of the run script (GACHARMrun.sh)
+    outputs : list
+        Output file names, a failed run that wrote none of them counts as transient
+    timeout : float or None
+        Wall clock limit per run in seconds, None for unlimited
+    retries : int
+        Extra attempts of a run after a transient failure
+    monitor : LogMonitor or None
+        Streaming log check of every run, None lets runs finish
+    output : str or None
+        File name in the run directory receiving the console output, None discards it
+    jobs : int
+        Current limit of concurrent runs
+    threads : int
+        Current CHARM threads per run
+    stats : dict
+        Counts of run statuses: ok, failed, timeout, aborted, cancelled, and retries
+    """
+    def __init__(self, script, outputs=(), timeout=None, retries=1, retry_delay=5.0, grace=10.0,
+                 cores=None, max_jobs=None, serial_fraction=0.05, monitor=None, output=OUTPUT_FILE):
+        """
+        Initialize scheduler, the event loop is started on the first run
+
+        Parameters:
+        -----------
+        script : str
+            Run script path
+        outputs : list
+            Output file names used to recognize transient failures
+        timeout : float or None
+            Wall clock limit per run in seconds
+        retries : int
+            Extra attempts after a transient failure
+        retry_delay : float
+            Seconds to wait before a retry, doubled on each further attempt
+        grace : float
+            Seconds between SIGTERM and SIGKILL when a run is stopped
+        cores : int or None
+            Cores to share between runs, defaults to available_cores()
+        max_jobs : int or None
+            Most concurrent runs allowed
+        serial_fraction : float
+            Non threaded fraction of a CHARM run, see thread_budget
+        monitor : LogMonitor or None
+            Streaming log check, see LogMonitor.py
+        output : str or None
+            Console output file name in the run directory, None discards the output
+        """
+        self.script = os.path.abspath(script)
+        self.outputs = list(outputs)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.grace = grace
+        self.cores = cores or available_cores()
+        self.max_jobs = max_jobs
+        self.serial_fraction = serial_fraction
+        self.monitor = monitor
+        self.output = output
+        self.stats = {'ok': 0, 'failed': 0, 'timeout': 0, 'aborted': 0, 'cancelled': 0, 'retries': 0}
+        self._loop = None
+        self._lock = threading.Lock()
+        self._active = set()
+        self._running = 0
+        self._cancelled = False
+        self.plan(1)
+
+    def plan(self, pending):
+        """
+        Set concurrency and CHARM threads for a batch of runs, see thread_budget
+        Runs already started keep their threads
+
+        Parameters:
+        -----------
+        pending : int
+            Number of runs in the batch
+        """
+        self.jobs, self.threads = thread_budget(pending, self.cores, self.serial_fraction, self.max_jobs)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _start(self):
+        # Event loop lives in a daemon thread, so blocking callers keep their own threads
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._slot = asyncio.Condition()
+                threading.Thread(target=self._loop.run_forever, name='CHARMScheduler', daemon=True).start()
+        return self._loop
+
+    def _wake(self):
+        # Concurrency limit changed, let waiting runs check again
+        async def notify():
+            async with self._slot:
+                self._slot.notify_all()
+        self._loop.create_task(notify())
+
+    def run(self, workdir):
+        """
+        Run the CHARM script in workdir and wait for it
+
+        Parameters:
+        -----------
+        workdir : str
+            Directory holding the CHARM input files
+
+        Returns:
+        --------
+        dict
+            status : 'ok', 'failed', 'timeout', 'aborted', or 'cancelled'
+            reason : str, why the monitor stopped the run (aborted only)
+            returncode : int or None, exit code of the last attempt
+            attempts : int, number of launches
+            threads : int, CHARM threads of the last attempt
+            elapsed : float, seconds from first launch to finish
+        """
+        loop = self._start()
+        return asyncio.run_coroutine_threadsafe(self._run(os.path.abspath(workdir)), loop).result()
+
+    async def _run(self, workdir):
+        async with self._slot:
+            await self._slot.wait_for(lambda: self._cancelled or self._running < self.jobs)
+            self._running += 1
+        try:
+            result = await self._attempts(workdir)
+        finally:
+            async with self._slot:
+                self._running -= 1
+                self._slot.notify_all()
+        self.stats[result['status']] += 1
+        return result
+
+    async def _attempts(self, workdir):
+        start = time.time()
+        result = {'status': 'cancelled', 'returncode': None, 'attempts': 0, 'threads': self.threads, 'elapsed': 0.0}
+        for attempt in range(self.retries + 1):
+            if self._cancelled:
+                break
+            if attempt > 0:
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.retry_delay*2**(attempt - 1))
+            result['attempts'] += 1
+            result['threads'] = self.threads
+            result['status'], result['returncode'], reason = await self._launch(workdir, self.threads, attempt > 0)
+            if reason is not None:
+                result['reason'] = reason
+            if result['status'] != 'failed' or not self._transient(workdir):
+                break
+        result['elapsed'] = time.time() - start
+        return result
+
+    async def _launch(self, workdir, threads, retry=False):
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+        try:
+            # Solver diagnostics stay with the run, the child keeps its own copy of the descriptor
+            if self.output is not None:
+                with open(os.path.join(workdir, self.output), 'ab' if retry else 'wb') as out:
+                    proc = await asyncio.create_subprocess_exec(self.script, cwd=workdir, env=env, stdout=out,
+                                                                stderr=asyncio.subprocess.STDOUT,
+                                                                start_new_session=True)
+            else:
+                proc = await asyncio.create_subprocess_exec(self.script, cwd=workdir, env=env,
+                                                            stdout=asyncio.subprocess.DEVNULL,
+                                                            stderr=asyncio.subprocess.DEVNULL,
+                                                            start_new_session=True)
+        except OSError:
+            return 'failed', None, None
+        self._active.add(proc)
+        try:
+            reason = await asyncio.wait_for(self._wait(proc, workdir), self.timeout)
+            if reason is not None:
+                await self._kill(proc)
+        except asyncio.TimeoutError:
+            await self._kill(proc)
+            return 'timeout', proc.returncode, None
+        finally:
+            self._active.discard(proc)
+        if self._cancelled:
+            return 'cancelled', proc.returncode, None
+        if reason is not None:
+            return 'aborted', proc.returncode, reason
+        return ('ok' if proc.returncode == 0 else 'failed'), proc.returncode, None
+
+    async def _wait(self, proc, workdir):
+        # Wait for the script, checking the log between waits when a monitor is set
+        if self.monitor is None:
+            await proc.wait()
+            return None
+        watch = self.monitor.watch(workdir)
+        waiter = asyncio.ensure_future(proc.wait())
+        try:
+            while True:
+                done, _ = await asyncio.wait({waiter}, timeout=watch.interval)
+                if done:
+                    return None
+                reason = watch.poll()
+                if reason is not None:
+                    return reason
+        finally:
+            waiter.cancel()
+
+    async def _kill(self, proc):
+        # Script runs in its own session, its pid is the process group id
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(proc.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                await asyncio.wait_for(proc.wait(), self.grace)
+                break
+            except asyncio.TimeoutError:
+                continue
+        # Reap the script if SIGKILL was needed
+        await proc.wait()
+
+    def _transient(self, workdir):
+        return not any(os.path.exists(os.path.join(workdir, name)) for name in self.outputs)
+
+    def cancel(self):
+        """
+        Kill every running CHARM process and return 'cancelled' for queued runs
+        Call reset before using the scheduler again
+        """
+        if self._loop is None:
+            return
+        self._cancelled = True
+
+        async def stop():
+            await asyncio.gather(*(self._kill(proc) for proc in list(self._active)))
+            async with self._slot:
+                self._slot.notify_all()
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result()
+
+    def reset(self):
+        # Accept runs again after cancel
+        self._cancelled = False
+
+    def close(self):
+        """
+        Cancel outstanding runs and stop the event loop
+        """
+        if self._loop is None:
+            return
+        self.cancel()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+        self._cancelled = False
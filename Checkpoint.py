@@ -0,0 +1,396 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses checkpoint and resume of the Genetic Algorithm
+# The full GA state (population, fitness, generation, random state, elite/pareto set) is saved
+# at the start of every generation, an interrupted run continues from its last checkpoint,
+# and evaluations already in the results CSV file are restored instead of run again
+# Read comments in and above each method before using/editing
+
+
+import os
+import copy
+import pickle
+import tempfile
+import numpy as np
+import openmdao.api as om
+from openmdao.drivers.genetic_algorithm_driver import GeneticAlgorithm
+from CHARMRunner import OBSERVERS, LOG_OUTPUTS, PENALTY_OUTPUTS
+
+
+# Results log columns of the parsed CHARM log values
+LOG_COLUMNS = ['Thrust1', 'Thrust2', 'TotalThrust', 'YawMoment1', 'YawMoment2', 'TotalYaw', 'PowerCoef', 'RotorEff']
+
+
+class GACheckpoint():
+    """
+    Genetic Algorithm state saved to a pickle file
+    Every save replaces the file atomically, so an interrupt never leaves a partial checkpoint
+
+    Attributes:
+    -----------
+    file : str
+        Checkpoint file path
+    every : int
+        Generations between checkpoints
+    """
+    def __init__(self, file='GACheckpoint.pkl', every=1):
+        self.file = file
+        self.every = max(int(every), 1)
+
+    def save(self, state):
+        """
+        Write a GA state
+
+        Parameters:
+        -----------
+        state : dict
+            State from CheckpointGeneticAlgorithm
+        """
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.file)), prefix='.checkpoint')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(temp, self.file)
+
+    def load(self):
+        """
+        Read the last saved GA state
+
+        Returns:
+        --------
+        dict or None
+            State, None if there is no checkpoint
+        """
+        if not os.path.exists(self.file):
+            return None
+        with open(self.file, 'rb') as f:
+            return pickle.load(f)
+
+
+def history_key(design, decimals=3):
+    """
+    Key of a design in the results history
+    The results log rounds design values to 3 decimals, finer than any GA bit resolution used here
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+    decimals : int
+        Rounding applied to the values
+
+    Returns:
+    --------
+    tuple
+        Sorted (name, rounded value) pairs
+    """
+    return tuple((name, round(float(val), decimals) + 0.0) for name, val in sorted(design.items()))
+
+
+def results_history(db, design_vars, points=None):
+    """
+    Results already logged in a results CSV file, in the evaluate_design format
+
+    Parameters:
+    -----------
+    db : staging
+        Results logger of the run being resumed
+    design_vars : list
+        Design variable names
+    points : OperatingPoints or None
+        Operating points of the run, their logged outputs are restored for the worst case constraints
+
+    Returns:
+    --------
+    dict
+        history_key to result (flagged restored), surrogate predictions and corrected coarse runs are left out
+    """
+    history = {}
+    for row in db.index.values():
+        if row.get('Surrogate', 0) or row.get('LowFidelity', 0):
+            continue
+        design = {name: float(row[name]) for name in design_vars}
+        # Failed runs are logged without log values and with penalty observers
+        thrust = row.get('TotalThrust')
+        if not thrust or np.isnan(thrust):
+            result = {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False}
+        else:
+            outputs = {f'Observer{observer}': float(row[f'Observer{observer}']) for observer in OBSERVERS}
+            outputs.update({name: float(row[column]) for name, column in LOG_OUTPUTS.items()})
+            log = {column: float(row[column]) for column in LOG_COLUMNS if column in row}
+            result = {'outputs': outputs, 'log': log, 'sim_worked': True}
+        if points is not None:
+            points.restore(row, result)
+        result['restored'] = True
+        history[history_key(design)] = result
+    return history
+
+
+class CheckpointGeneticAlgorithm(GeneticAlgorithm):
+    """
+    OpenMDAO GeneticAlgorithm that saves its state at the start of every generation and can resume from it
+    The generation loop is the OpenMDAO serial loop, the state it keeps in local variables is checkpointed
+    Under MPI (run_parallel) the OpenMDAO loop is used unchanged, without checkpoints or generation callbacks
+
+    Attributes:
+    -----------
+    checkpoint : GACheckpoint or None
+        Where states are saved, None disables checkpointing
+    resume_state : dict or None
+        State to continue from on the next execute_ga call
+    extra_state : function
+        Returns driver state stored with each checkpoint (e.g. iteration count)
+    on_generation : function or None
+        Called with the generation number once its population is evaluated
+    seed_population : function or None
+        Returns an evaluated initial population (population, design points, fitness, successful evaluations),
+        None for the OpenMDAO random population
+    loop : str
+        Kind of GA loop, a checkpoint only resumes the loop that saved it
+    """
+    loop = 'generational'
+
+    def __init__(self, objfun, comm=None, model_mpi=None, checkpoint=None):
+        super().__init__(objfun, comm=comm, model_mpi=model_mpi)
+        self.checkpoint = checkpoint
+        self.resume_state = None
+        self.extra_state = dict
+        self.on_generation = None
+        self.seed_population = None
+
+    def execute_ga(self, x0, vlb, vub, vob, bits, pop_size, max_gen, random_state, Pm=None, Pc=0.5):
+        if self.comm is not None or (self.checkpoint is None and self.on_generation is None
+                                     and self.seed_population is None):
+            return super().execute_ga(x0, vlb, vub, vob, bits, pop_size, max_gen, random_state, Pm, Pc)
+
+        nobj = self.nobj
+        self.lchrom = int(np.sum(bits))
+        # Population size rules of the OpenMDAO loop (tournament selection)
+        if nobj > 1 and np.mod(pop_size, nobj) > 0:
+            pop_size += nobj - np.mod(pop_size, nobj)
+        elif nobj == 1 and np.mod(pop_size, 2) == 1:
+            pop_size += 1
+        self.npop = int(pop_size)
+        if Pm is None:
+            Pm = (self.lchrom + 1.0) / (2.0 * pop_size * np.sum(bits))
+        layout = {'vlb': vlb, 'vub': vub, 'bits': bits, 'npop': self.npop, 'nobj': nobj}
+
+        state = self._matching(self.resume_state, layout)
+
+        # Design points of a seeded initial population, evaluated already
+        seeded = None
+        if state is None and self.seed_population is not None:
+            new_gen, seeded, fitness, nfit = self.seed_population(self, x0, vlb, vub, vob, bits)
+            start, elite_point = 0, None
+            xopt, fopt = ([], []) if nobj > 1 else (copy.deepcopy(vlb), np.inf)
+        elif state is None:
+            new_gen = np.round(self._lhs(self.lchrom, self.npop, criterion='center', random_state=random_state))
+            new_gen[0] = self.encode(x0, vlb, vub, bits)
+            start, nfit, fitness, elite_point = 0, 0, np.zeros((self.npop, nobj)), None
+            xopt, fopt = ([], []) if nobj > 1 else (copy.deepcopy(vlb), np.inf)
+        else:
+            new_gen, start, nfit, fitness = state['population'], state['generation'], state['nfit'], state['fitness']
+            xopt, fopt, elite_point = state['xopt'], state['fopt'], state['elite']
+            np.random.set_state(state['rng'])
+            print(f'Resuming Genetic Algorithm at generation {start} of {max_gen}...')
+
+        for generation in range(start, max_gen + 1):
+            if self.checkpoint is not None and generation % self.checkpoint.every == 0:
+                self._save(layout, generation, new_gen, fitness, nfit, xopt, fopt, elite_point)
+            old_gen = copy.deepcopy(new_gen)
+            if seeded is not None:
+                x_pop, seeded = seeded, None
+            else:
+                x_pop = self.decode(old_gen, vlb, vub, bits)
+
+                # Evaluate fitness of points in this generation
+                for ii in range(self.npop):
+                    x = x_pop[ii]
+                    if np.any(x - vob > 0):
+                        # Exceeded bounds for integer variables that are over-allocated
+                        success = False
+                    else:
+                        fitness[ii, :], success, _ = self.objfun(x, 0)
+                    if success:
+                        nfit += 1
+                    else:
+                        fitness[ii, :] = np.inf
+
+            if nobj > 1:
+                xopt, fopt = self.eval_pareto(x_pop, fitness, xopt, fopt)
+            else:
+                # Elitism replaces the worst point with the best of the previous generation
+                if self.elite and elite_point is not None:
+                    max_index = np.argmax(fitness[:, 0])
+                    old_gen[max_index], x_pop[max_index], fitness[max_index, 0] = elite_point
+                min_index = np.argmin(fitness[:, 0])
+                elite_point = (old_gen[min_index].copy(), x_pop[min_index].copy(), fitness[min_index, 0])
+                if fitness[min_index, 0] < fopt:
+                    fopt, xopt = fitness[min_index, 0], x_pop[min_index]
+            if self.on_generation is not None:
+                self.on_generation(generation)
+
+            # Evolve new generation
+            if nobj > 1:
+                new_gen, _ = self.tournament_multi_obj(old_gen, fitness)
+            else:
+                new_gen = self.tournament(old_gen, fitness[:, 0])
+            new_gen = self.crossover(new_gen, Pc)
+            new_gen = self.mutate(new_gen, Pm)
+
+        # Final state, resuming a completed run returns its result without new evaluations
+        if self.checkpoint is not None:
+            self._save(layout, max_gen + 1, new_gen, fitness, nfit, xopt, fopt, elite_point)
+        return xopt, fopt, nfit
+
+    def _matching(self, state, layout):
+        # State to resume from, None when it was saved by another loop, design space, or population size
+        if state is None:
+            return None
+        if (state.get('loop', 'generational') != self.loop
+                or not all(key in state and np.array_equal(state[key], val) for key, val in layout.items())):
+            print('Checkpoint does not match the design variables or driver options, starting a new run...')
+            return None
+        return state
+
+    def _save(self, layout, generation, population, fitness, nfit, xopt, fopt, elite_point):
+        self.checkpoint.save(dict(layout, generation=generation, population=population, fitness=fitness,
+                                  nfit=nfit, xopt=xopt, fopt=fopt, elite=elite_point, loop=self.loop,
+                                  rng=np.random.get_state(), extra=self.extra_state()))
+
+
+class CheckpointGADriver(om.SimpleGADriver):
+    """
+    SimpleGADriver with checkpoints of the GA state and a resume mode
+    Driver options, penalties, recording, and pareto calculation are unchanged
+
+    Attributes:
+    -----------
+    checkpoint : GACheckpoint or None
+        Where states are saved, None behaves like SimpleGADriver
+    resume : bool
+        Continue from the last checkpoint instead of starting a new population
+    archive : ParetoArchive or None
+        Pareto archive shared with the Optimizer component, closed out after every generation
+    doe : DOESeed or None
+        Space-filling samples evaluated before the first generation, the best become the initial population
+    """
+    def __init__(self, checkpoint=None, resume=False, archive=None, doe=None, **kwargs):
+        super().__init__(**kwargs)
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.archive = archive
+        self.doe = doe
+
+    def _setup_driver(self, problem):
+        super()._setup_driver(problem)
+        self._ga = self._make_ga(self._ga.comm, self._ga.model_mpi)
+
+    def _make_ga(self, comm, model_mpi):
+        # Drivers with their own GeneticAlgorithm subclass override this
+        return CheckpointGeneticAlgorithm(self.objective_callback, comm=comm, model_mpi=model_mpi,
+                                          checkpoint=self.checkpoint)
+
+    def run(self):
+        state = self.checkpoint.load() if self.checkpoint is not None and self.resume else None
+        if state is not None:
+            # Iterations continue where they stopped, so results log rows are not overwritten
+            self.iter_count = state['extra'].get('iter_count', 0)
+        self._ga.resume_state = state
+        self._ga.extra_state = lambda: {'iter_count': self.iter_count}
+        self._ga.on_generation = self.archive.end_generation if self.archive is not None else None
+        self._ga.seed_population = self._doe_population if self.doe is not None else None
+        return super().run()
+
+    def _doe_population(self, ga, x0, vlb, vub, vob, bits):
+        """
+        Evaluate the DOE samples and pick the initial population among them
+        Samples are evaluated through the objective callback, so each is logged and recorded like a GA evaluation
+
+        Parameters:
+        -----------
+        ga : CheckpointGeneticAlgorithm
+            Genetic Algorithm being started, its population size is final
+        x0 : ndarray
+            Start values of the design variables, evaluated with the samples
+        vlb, vub, vob : ndarray
+            Lower, upper, and outer (bit range) bounds
+        bits : ndarray
+            Bits of each variable
+
+        Returns:
+        --------
+        ndarray
+            Encoded initial population
+        ndarray
+            Its design points
+        ndarray
+            Its fitness
+        int
+            Successful evaluations
+        """
+        population = self._doe_chromosomes(ga, x0, vlb, vub, vob, bits)
+        # Decoding snaps the samples to the bit grid, parallel drivers evaluate them all here
+        # OpenMDAO decodes npop rows, so it is the sample count meanwhile
+        npop, ga.npop = ga.npop, len(population)
+        try:
+            x_pop = ga.decode(population, vlb, vub, bits)
+        finally:
+            ga.npop = npop
+        print(f'Evaluating {len(x_pop)} DOE samples ({self.doe.method}) for the initial population...')
+
+        fitness = np.full((len(x_pop), ga.nobj), np.inf)
+        violation = np.full(len(x_pop), np.inf)
+        nfit, first = 0, self.iter_count + 1
+        for ii, x in enumerate(x_pop):
+            if np.any(x - vob > 0):
+                continue
+            value, success, _ = self.objective_callback(x, 0)
+            if success:
+                nfit += 1
+                fitness[ii, :], violation[ii] = value, self._violation()
+
+        index = self.doe.select(fitness, violation, ga.npop)
+        print(f'DOE iterations {first} to {self.iter_count}: {self.doe.stats["feasible"]} of '
+              f'{self.doe.stats["samples"]} samples feasible, {self.doe.stats["seeds"]} seeded into the population')
+        return population[index], x_pop[index], fitness[index], nfit
+
+    def _doe_chromosomes(self, ga, x0, vlb, vub, vob, bits):
+        """
+        Encoded DOE samples, the start values first
+
+        Parameters:
+        -----------
+        ga : CheckpointGeneticAlgorithm
+            Genetic Algorithm being started, its population size is final
+        x0 : ndarray
+            Start values of the design variables
+        vlb, vub, vob : ndarray
+            Lower, upper, and outer (bit range) bounds
+        bits : ndarray
+            Bits of each variable
+
+        Returns:
+        --------
+        ndarray
+            One chromosome per sample
+        """
+        x = np.vstack([x0, self.doe.sample(vlb, np.minimum(vub, vob), max(self.doe.samples, ga.npop) - 1)])
+        return np.array([ga.encode(row, vlb, vub, bits) for row in x])
+
+    def _violation(self):
+        # Summed constraint violation of the last evaluation, bounds compared as the driver penalty does
+        total = 0.0
+        for name, val in self.get_constraint_values().items():
+            meta = self._cons[name]
+            gap = np.zeros_like(val)
+            if meta['lower'] is not None and np.all(np.isfinite(meta['lower'])):
+                gap = np.maximum(gap, meta['lower'] - val)
+            if meta['upper'] is not None and np.all(np.isfinite(meta['upper'])):
+                gap = np.maximum(gap, val - meta['upper'])
+            if meta['equals'] is not None and np.all(np.isfinite(meta['equals'])):
+                gap = np.abs(val - meta['equals'])
+            total += float(np.sum(gap))
+        return total
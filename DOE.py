@@ -0,0 +1,117 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the space-filling design of experiments (DOE) that seeds the Genetic Algorithm
+# Before the first generation, a batch of samples spread over the design variable bounds is evaluated
+# (all at once in parallel mode) and logged like any other evaluation,
+# and the best feasible samples become the initial population, with their fitness already known
+# Read comments in and above each method before using/editing
+
+
+import numpy as np
+from pyDOE3 import lhs
+from scipy.stats import qmc
+from Pareto import pareto_mask
+
+
+# Space-filling designs available
+DOE_METHODS = ['lhs', 'sobol', 'halton']
+
+
+class DOESeed():
+    """
+    Space-filling samples of the design space and the choice of the initial population among them
+
+    Samples are drawn in the unit cube and scaled to the design variable bounds,
+    the driver snaps them to the GA bit grid before they are evaluated, so each seed is exactly the design that was run
+    Feasible samples (no constraint violation) are ranked first, by Pareto layers of their driver fitness
+    and by normalized fitness within a layer, infeasible samples follow by least violation
+
+    Attributes:
+    -----------
+    samples : int
+        Samples evaluated, at least the population size
+    method : str
+        'lhs' (maximin Latin hypercube, pyDOE3), 'sobol', or 'halton' (scrambled, scipy)
+    seed : int
+        Random seed of the samples, the same seed gives the same samples (e.g. when resuming)
+    stats : dict
+        Samples evaluated, feasible samples, and seeds picked of the last DOE
+    """
+    def __init__(self, samples=40, method='lhs', seed=0):
+        if method not in DOE_METHODS:
+            raise ValueError(f'DOE method must be one of {DOE_METHODS}, not {method}')
+        self.samples = int(samples)
+        self.method = method
+        self.seed = seed
+        self.stats = {'samples': 0, 'feasible': 0, 'seeds': 0}
+
+    def sample(self, vlb, vub, count=None):
+        """
+        Space-filling samples within the bounds
+
+        Parameters:
+        -----------
+        vlb, vub : ndarray
+            Lower and upper bound of each design variable, equal bounds give a fixed value
+        count : int or None
+            Samples drawn, None for samples
+
+        Returns:
+        --------
+        ndarray
+            One row per sample
+        """
+        count = self.samples if count is None else int(count)
+        nvar = len(vlb)
+        if self.method == 'lhs':
+            unit = lhs(nvar, samples=count, criterion='maximin', iterations=20, seed=self.seed)
+        elif self.method == 'sobol':
+            # Sobol balance needs a power of 2 samples, the extra samples are dropped
+            sampler = qmc.Sobol(nvar, scramble=True, seed=self.seed)
+            unit = sampler.random_base2(int(np.ceil(np.log2(max(count, 2)))))[:count]
+        else:
+            unit = qmc.Halton(nvar, scramble=True, seed=self.seed).random(count)
+        return vlb + unit*(vub - vlb)
+
+    def select(self, fitness, violation, count):
+        """
+        Indices of the samples that make up the initial population, best first
+
+        Parameters:
+        -----------
+        fitness : ndarray
+            Driver fitness of each sample, one column per objective (inf for failed runs)
+        violation : ndarray
+            Summed constraint violation of each sample (inf for failed runs)
+        count : int
+            Population size
+
+        Returns:
+        --------
+        ndarray
+            Sample indices
+        """
+        fitness = np.asarray(fitness, dtype=float).reshape(len(violation), -1)
+        violation = np.asarray(violation, dtype=float)
+        feasible = np.flatnonzero((violation <= 0) & np.all(np.isfinite(fitness), axis=1))
+
+        order = []
+        if len(feasible):
+            F = fitness[feasible]
+            # Sum of fitness normalized over the feasible samples breaks ties within a Pareto layer
+            span = F.max(axis=0) - F.min(axis=0)
+            score = ((F - F.min(axis=0))/np.where(span > 0, span, 1.0)).sum(axis=1)
+            remaining = np.arange(len(feasible))
+            while len(remaining) and len(order) < count:
+                layer = remaining[pareto_mask(F[remaining])]
+                order.extend(feasible[layer[np.argsort(score[layer], kind='stable')]])
+                remaining = np.setdiff1d(remaining, layer)
+        # Least violated samples fill the rest of the population
+        infeasible = np.setdiff1d(np.arange(len(violation)), feasible)
+        order.extend(infeasible[np.argsort(violation[infeasible], kind='stable')])
+
+        self.stats = {'samples': len(violation), 'feasible': len(feasible), 'seeds': min(len(feasible), count)}
+        return np.array(order[:count], dtype=int)
@@ -0,0 +1,226 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the persistent evaluation cache placed in front of the CHARM call
+# Genetic Algorithm designs are discrete (bits option), so the same candidates return often
+# A hit returns the stored outputs instantly instead of running CHARM again
+# Read comments in and above each method before using/editing
+
+
+import os
+import time
+import json
+import shlex
+import shutil
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+
+
+# Solver GACHARMrun.sh runs when CHARM_SOLVER is not set
+DEFAULT_SOLVER = 'runv7'
+
+
+def solver_command():
+    """
+    Solver command GACHARMrun.sh runs, with its program resolved on PATH
+
+    Returns:
+    --------
+    str
+        CHARM_SOLVER (DEFAULT_SOLVER when unset) and the full path of its program
+    """
+    command = os.environ.get('CHARM_SOLVER') or DEFAULT_SOLVER
+    words = shlex.split(command)
+    program = shutil.which(words[0]) if words else None
+    return f'{command}\n{program or ""}'
+
+
+class EvalCache():
+    """
+    On-disk memoization of CHARM results stored in a SQLite database
+    Safe to share between concurrent sandboxes, separate runs, and restarts
+
+    Entries are keyed on the canonicalized design vector plus a hash of the generated
+    input files and the solver settings (solver command, run script, and static input files),
+    so changing any deck template, CHARM setting, or solver (e.g. MockCHARM.py) never returns stale results
+
+    Attributes:
+    -----------
+    file : str
+        Database file path
+    max_entries : int or None
+        Most entries kept, least recently used are evicted first
+    max_age : float or None
+        Entries older than this many seconds are evicted
+    cache_failures : bool
+        Also store runs that ended but whose outputs could not be parsed, so a design known to break CHARM is not run again
+    decimals : int
+        Design values are rounded to this many decimals before hashing
+    hits : int
+        Number of lookups answered from the cache
+    misses : int
+        Number of lookups that required a CHARM run
+    """
+    def __init__(self, file='GACache.db', max_entries=100000, max_age_days=30, cache_failures=True,
+                 decimals=6, settings_files=('GACHARMrun.sh', 'GABasebd.inp', 'GABaserw.inp', '0012air.inp')):
+        """
+        Initialize cache and create the database if it does not exist
+
+        Parameters:
+        -----------
+        file : str
+            Database file path
+        max_entries : int or None
+            Size limit, None for unlimited
+        max_age_days : float or None
+            Age limit in days, None for unlimited
+        cache_failures : bool
+            Store runs that ended without parseable outputs as well as successful ones
+        decimals : int
+            Rounding applied to design values
+        settings_files : tuple
+            Solver setting files whose content is part of every key
+        """
+        self.file = file
+        self.max_entries = max_entries
+        self.max_age = None if max_age_days is None else max_age_days * 86400
+        self.cache_failures = cache_failures
+        self.decimals = decimals
+        self.hits, self.misses = 0, 0
+
+        # Solver settings do not change during a run, hash them once
+        settings = hashlib.sha256()
+        settings.update(solver_command().encode())
+        for name in settings_files:
+            settings.update(name.encode())
+            if os.path.exists(name):
+                with open(name, 'rb') as f:
+                    settings.update(f.read())
+        self.settings_hash = settings.hexdigest()
+
+        with self._connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, design TEXT, '
+                        'result TEXT, created REAL, accessed REAL)')
+            con.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self.evict()
+
+    @contextmanager
+    def _connect(self):
+        # New connection per call keeps the cache usable from pool threads and other processes
+        con = sqlite3.connect(self.file, timeout=60)
+        try:
+            con.execute('PRAGMA journal_mode=WAL')
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def key(self, design, deck_files):
+        """
+        Build the cache key of a design
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        deck_files : list
+            Paths of the generated CHARM input files for this design
+
+        Returns:
+        --------
+        str
+            SHA-256 hex digest
+        """
+        digest = hashlib.sha256(self.settings_hash.encode())
+        canonical = {name: round(float(val), self.decimals) + 0.0 for name, val in design.items()}
+        digest.update(json.dumps(canonical, sort_keys=True).encode())
+        for path in deck_files:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a stored result
+
+        Parameters:
+        -----------
+        key : str
+            Key from the key method
+
+        Returns:
+        --------
+        dict or None
+            Result in the evaluate_design format with cached True, None on a miss
+        """
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute('SELECT result, created FROM cache WHERE key = ?', (key,)).fetchone()
+            result = json.loads(row[0]) if row is not None else None
+            # Failures stored without their status may be timeouts or aborts, they are run again
+            if (result is None or (self.max_age is not None and now - row[1] > self.max_age)
+                    or (not result['sim_worked'] and 'status' not in result)):
+                self.misses += 1
+                return None
+            con.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        result['cached'] = True
+        return result
+
+    def put(self, key, design, result):
+        """
+        Store a result and apply the size limit
+        Only runs CHARM finished are stored: timeouts, aborts, and failed launches depend on the run limits
+        and machine load, while a finished run whose outputs could not be parsed fails the same way every time
+
+        Parameters:
+        -----------
+        key : str
+            Key from the key method
+        design : dict
+            Design variable name to float value, stored for inspection only
+        result : dict
+            Result in the evaluate_design format
+        """
+        if result.get('status') != 'ok' or (not result['sim_worked'] and not self.cache_failures):
+            return
+        stored = {
+            'outputs': {name: float(val) for name, val in result['outputs'].items()},
+            'log': {name: float(val) for name, val in result['log'].items()},
+            'sim_worked': bool(result['sim_worked']),
+            'status': result['status']
+        }
+        # Run details of the original run, a hit is still told apart from a fresh run by its cached flag
+        if result.get('revolutions') is not None:
+            stored['revolutions'] = int(result['revolutions'])
+        if 'warm_start' in result:
+            stored['warm_start'] = None if result['warm_start'] is None else float(result['warm_start'])
+        # Hits point to the stored files of the original run (Artifacts.py)
+        if result.get('artifact') is not None:
+            stored['artifact'] = int(result['artifact'])
+        now = time.time()
+        with self._connect() as con:
+            con.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                        (key, json.dumps({n: float(v) for n, v in design.items()}),
+                         json.dumps(stored), now, now))
+            if self.max_entries is not None:
+                con.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                            'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def evict(self):
+        """
+        Remove entries past the age limit and beyond the size limit
+        """
+        with self._connect() as con:
+            if self.max_age is not None:
+                con.execute('DELETE FROM cache WHERE created < ?', (time.time() - self.max_age,))
+            if self.max_entries is not None:
+                con.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                            'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
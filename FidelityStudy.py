@@ -0,0 +1,311 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# Offline convergence study of the CHARM solver settings, run once before an optimization campaign
+# Sweeps NPSI, NREV, NPTFW (free wake points), and NSPAN over a few reference blade geometries,
+# measures the CHARM run time and the deviation of thrust, power coefficient, efficiency, and observer OASPL
+# from the finest settings of the sweep, and recommends the cheapest settings within the tolerance
+# Usage (from the NOISE directory):
+#   python3 FidelityStudy.py [--designs N] [--log GA_FileName --iterations 12,40] [--npsi 12,24,36] [--nrev 2,3,4]
+#                            [--nptfw 0.5,1] [--nspan=-36,-72] [--tolerance 2] [--db-tolerance 0.5] [--workers N]
+# --nptfw scales the default NPTFW list, negative --nspan levels need the = form
+# --tolerance is in percent, --db-tolerance in dB
+# Set CHARM_SOLVER (or use --mock) to try the study on MockCHARM.py
+# Read comments in and above each method before using/editing
+
+
+import os
+import csv
+import time
+import argparse
+import itertools
+import numpy as np
+from GeneticAl import staging
+from CHARMRunner import DESIGN_VARS, OBSERVERS, RUN_SCRIPT, LOG_FILE
+from CHARMScheduler import CHARMScheduler
+from ParallelCHARM import CandidatePool
+from SingleFileMakerCHARM import DEFAULT_PARAMS
+from HarnessBenchmark import random_designs, mock_script
+
+
+# Levels swept by default, every combination is run (NPTFW as a factor on the DEFAULT_PARAMS list)
+# NZONE and NVORT are not swept, the core radius and cutoff lists of the rw file are sized to them
+SWEEP = {'npsi': [12, 24, 36], 'nrev': [2, 3, 4], 'nptfw': [0.5, 1.0], 'nspan': [-36, -72]}
+
+# Start design of AlgoRun.py, always the first reference geometry
+START_DESIGN = dict({'Twist': 0.0, 'Anhedral': 0.0, 'ZDistance': 0.0},
+                    **{f'Twist{i}': val for i, val in
+                       enumerate([2.75, 0.5, 0.75, 0.75, 1.0, 1.0, 0.5, 0.0, 0.0, 0.0], 1)})
+
+# Outputs compared against the finest settings: relative deviation in percent
+RELATIVE_OUTPUTS = {'thrust': 'Thrust_Total', 'power': 'Coef_Power', 'efficiency': 'Rotor_Eff'}
+# Observer OASPL is compared in dB, worst observer
+OASPL_OUTPUTS = [f'Observer{observer}' for observer in OBSERVERS]
+
+# Scratch directory of the study runs
+SCRATCH = 'GAFidelity'
+
+
+def reference_designs(count, log=None, iterations=None, seed=0):
+    """
+    Blade geometries the settings are compared on
+
+    Parameters:
+    -----------
+    count : int
+        Number of designs: the AlgoRun.py start design plus random designs,
+        or the highest thrust full CHARM runs of the results log
+    log : str or None
+        Results log (without .csv) to take the designs from
+    iterations : list or None
+        Iterations of the results log to take, replaces count
+    seed : int
+        Random seed of the random designs
+
+    Returns:
+    --------
+    list
+        Design dicts
+    """
+    if log is None:
+        return [dict(START_DESIGN)] + random_designs(max(count - 1, 0), seed)
+
+    db = staging(log)
+    if iterations:
+        missing = [iteration for iteration in iterations if iteration not in db.index]
+        if missing:
+            raise ValueError(f'Iterations {missing} are not in {db.file}...')
+        rows = [db.index[iteration] for iteration in iterations]
+    else:
+        # Screening results are no CHARM runs at these settings, failed runs have no thrust
+        rows = [row for row in db.index.values() if not row.get('Surrogate', 0) and not row.get('LowFidelity', 0)
+                and row.get('TotalThrust') and not np.isnan(row['TotalThrust'])]
+        rows = sorted(rows, key=lambda row: row['TotalThrust'], reverse=True)[:count]
+    if not rows:
+        raise ValueError(f'No full CHARM runs in {db.file} to take reference designs from...')
+    return [{name: float(row[name]) for name in DESIGN_VARS} for row in rows]
+
+
+def sweep_settings(levels):
+    """
+    Every combination of the swept levels as deck parameters
+
+    Parameters:
+    -----------
+    levels : dict
+        'npsi', 'nrev', 'nspan' to a list of values, 'nptfw' to a list of factors on the default NPTFW list
+
+    Returns:
+    --------
+    list
+        DEFAULT_PARAMS entries of each combination, the finest (reference) settings first
+    """
+    settings = []
+    for npsi, nrev, factor, nspan in itertools.product(levels['npsi'], levels['nrev'], levels['nptfw'],
+                                                       levels['nspan']):
+        nptfw = [max(int(round(points*factor)), 2) for points in DEFAULT_PARAMS['nptfw']]
+        settings.append({'npsi': int(npsi), 'nrev': int(nrev), 'nptfw': nptfw, 'nspan': int(nspan)})
+    # Finest: most azimuth steps, revolutions, wake points, and span stations (NSPAN sign is the spacing)
+    settings.sort(key=lambda params: (params['npsi'], params['nrev'], sum(params['nptfw']), abs(params['nspan'])),
+                  reverse=True)
+    return settings
+
+
+def deviations(result, reference):
+    """
+    Deviation of a result from the reference settings result of the same design
+
+    Parameters:
+    -----------
+    result, reference : dict
+        Results in the evaluate_design format, both CHARM runs that worked
+
+    Returns:
+    --------
+    dict
+        'thrust', 'power', 'efficiency' relative deviation in percent, 'oaspl' worst observer deviation in dB
+    """
+    deviation = {}
+    for metric, name in RELATIVE_OUTPUTS.items():
+        value, target = result['outputs'][name], reference['outputs'][name]
+        deviation[metric] = 100*abs(value - target)/max(abs(target), 1e-12)
+    deviation['oaspl'] = max(abs(result['outputs'][name] - reference['outputs'][name]) for name in OASPL_OUTPUTS)
+    return deviation
+
+
+def run_study(designs, settings, pool):
+    """
+    Run every design at every settings, the designs of one settings run concurrently
+
+    Parameters:
+    -----------
+    designs : list
+        Reference design dicts
+    settings : list
+        Deck parameters of each setting, the first one is the reference
+    pool : CandidatePool
+        Pool the runs are made on, without cache or warm starts so every run is timed cold
+
+    Returns:
+    --------
+    list
+        Results of each setting, one evaluate_design result per design
+    """
+    results = []
+    for number, params in enumerate(settings, 1):
+        start = time.perf_counter()
+        pool.evaluate(designs, settings=params)
+        batch = [pool.fetch(design) for design in designs]
+        results.append(batch)
+        print(f'Settings {number}/{len(settings)} {describe(params)}: '
+              f'{sum(result["sim_worked"] for result in batch)}/{len(batch)} runs worked, '
+              f'{time.perf_counter() - start:.1f} s')
+    return results
+
+
+def summarize(settings, results, tolerance, db_tolerance):
+    """
+    Run time and worst deviation of each setting over the reference designs
+
+    Parameters:
+    -----------
+    settings : list
+        Deck parameters of each setting, the first one is the reference
+    results : list
+        Results of each setting from run_study
+    tolerance : float
+        Largest relative deviation of thrust, power coefficient, and efficiency in percent
+    db_tolerance : float
+        Largest observer OASPL deviation in dB
+
+    Returns:
+    --------
+    list
+        One row per setting: the deck parameters, 'runtime' (mean CHARM seconds per run), 'speedup' over the
+        reference, the worst deviation of each metric, 'failed' runs, and 'within' the tolerance
+    """
+    reference = results[0]
+    # Designs the reference settings failed on have nothing to compare against
+    usable = [index for index, result in enumerate(reference) if result['sim_worked']]
+    if not usable:
+        raise RuntimeError('Every reference settings run failed, check the CHARM setup...')
+    if len(usable) < len(reference):
+        print(f'Reference settings failed on {len(reference) - len(usable)} designs, they are left out...')
+
+    rows = []
+    for params, batch in zip(settings, results):
+        runtime = float(np.mean([batch[index]['timing'].get('CHARM', 0.0) for index in usable]))
+        failed = sum(not batch[index]['sim_worked'] for index in usable)
+        row = dict(params, runtime=runtime, failed=failed)
+        worked = [deviations(batch[index], reference[index]) for index in usable if batch[index]['sim_worked']]
+        for metric in list(RELATIVE_OUTPUTS) + ['oaspl']:
+            row[metric] = max(deviation[metric] for deviation in worked) if worked else np.nan
+        row['within'] = (not failed and all(row[metric] <= tolerance for metric in RELATIVE_OUTPUTS)
+                         and row['oaspl'] <= db_tolerance)
+        rows.append(row)
+    for row in rows:
+        row['speedup'] = rows[0]['runtime']/row['runtime'] if row['runtime'] > 0 else np.nan
+    return rows
+
+
+def recommend(rows):
+    """
+    Cheapest settings within the tolerance
+
+    Parameters:
+    -----------
+    rows : list
+        Rows from summarize
+
+    Returns:
+    --------
+    dict
+        Row of the recommended settings, the reference row when no coarser settings are within the tolerance
+    """
+    return min([row for row in rows if row['within']] or rows[:1], key=lambda row: row['runtime'])
+
+
+def describe(params):
+    # Settings as they read in the rw file
+    return (f'NPSI {params["npsi"]} NREV {params["nrev"]} '
+            f'NPTFW {" ".join(str(points) for points in params["nptfw"])} NSPAN {params["nspan"]}')
+
+
+def write_csv(path, rows):
+    # One line per setting, NPTFW as its space separated rw file entry
+    columns = ['npsi', 'nrev', 'nptfw', 'nspan', 'runtime', 'speedup', 'thrust', 'power', 'efficiency', 'oaspl',
+               'failed', 'within']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([' '.join(str(points) for points in row[col]) if col == 'nptfw' else row[col]
+                             for col in columns])
+
+
+def _levels(text, kind):
+    # Comma separated sweep levels
+    return [kind(val) for val in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convergence study of the CHARM solver settings')
+    parser.add_argument('--designs', type=int, default=4, help='reference geometries')
+    parser.add_argument('--log', default=None, help='results log (without .csv) to take the geometries from')
+    parser.add_argument('--iterations', default=None, help='comma separated iterations of the results log')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--npsi', default=','.join(str(val) for val in SWEEP['npsi']))
+    parser.add_argument('--nrev', default=','.join(str(val) for val in SWEEP['nrev']))
+    parser.add_argument('--nptfw', default=','.join(str(val) for val in SWEEP['nptfw']))
+    parser.add_argument('--nspan', default=','.join(str(val) for val in SWEEP['nspan']))
+    parser.add_argument('--tolerance', type=float, default=2.0, help='thrust, power, efficiency deviation in %%')
+    parser.add_argument('--db-tolerance', type=float, default=0.5, help='observer OASPL deviation in dB')
+    parser.add_argument('--workers', type=int, default=None, help='concurrent runs, defaults to one per design')
+    parser.add_argument('--cores', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds before a CHARM run is stopped')
+    parser.add_argument('--scratch', default=SCRATCH)
+    parser.add_argument('--csv', default='FidelityStudy.csv', help='table of every setting')
+    parser.add_argument('--mock', action='store_true', help='run MockCHARM.py instead of CHARM')
+    args = parser.parse_args()
+
+    iterations = _levels(args.iterations, int) if args.iterations else None
+    designs = reference_designs(args.designs, args.log, iterations, args.seed)
+    settings = sweep_settings({'npsi': _levels(args.npsi, int), 'nrev': _levels(args.nrev, int),
+                               'nptfw': _levels(args.nptfw, float), 'nspan': _levels(args.nspan, int)})
+    workers = args.workers or len(designs)
+    print(f'{len(settings)} settings x {len(designs)} designs, {workers} concurrent runs, '
+          f'reference {describe(settings[0])}')
+
+    os.makedirs(args.scratch, exist_ok=True)
+    script = mock_script(args.scratch) if args.mock else RUN_SCRIPT
+    scheduler = CHARMScheduler(script, outputs=[LOG_FILE], timeout=args.timeout, cores=args.cores, max_jobs=workers)
+    pool = CandidatePool(workers, scratch=args.scratch, scheduler=scheduler)
+    try:
+        results = run_study(designs, settings, pool)
+    finally:
+        scheduler.close()
+
+    rows = summarize(settings, results, args.tolerance, args.db_tolerance)
+    best = recommend(rows)
+    print(f'{"Settings":40s} {"CHARM s":>8s} {"speedup":>7s} {"thrust%":>8s} {"power%":>7s} {"eff%":>6s} '
+          f'{"OASPL dB":>8s}')
+    for row in sorted(rows, key=lambda row: row['runtime']):
+        mark = '*' if row is best else ('+' if row['within'] else ' ')
+        failed = f'  {row["failed"]} failed' if row['failed'] else ''
+        print(f'{mark}{describe(row):39s} {row["runtime"]:8.2f} {row["speedup"]:6.2f}x {row["thrust"]:8.3f} '
+              f'{row["power"]:7.3f} {row["efficiency"]:6.3f} {row["oaspl"]:8.3f}{failed}')
+    print(f'+ within {args.tolerance}% and {args.db_tolerance} dB of the reference, * recommended')
+    if args.csv:
+        write_csv(args.csv, rows)
+        print(f'Table written to {args.csv}')
+
+    if best is rows[0]:
+        print('No coarser settings are within the tolerance, keep the reference settings')
+    print(f'Recommended settings ({best["speedup"]:.2f}x faster than the reference): '
+          f'{ {key: best[key] for key in ("npsi", "nrev", "nptfw", "nspan")} }')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
 #!/bin/bash
 # This is a static shell script to run CHARM Files for Genetic Algorithm
 # cd NOISE
+# CHARM threads come from OMP_NUM_THREADS, set per run by CHARMScheduler.py
+# Set CHARM_SOLVER to run another solver, from the NOISE directory: export CHARM_SOLVER="python3 $PWD/MockCHARM.py"
 echo "CHARM is now running (Do NOT close this tab!)"
-runv7 . GAlgoRunsname
+${CHARM_SOLVER:-runv7} . GAlgoRunsname
+status=$?
 echo "CHARM has completed"
+# Exit status of CHARM is passed on, the scheduler retries runs that fail before writing a log
+exit $status
 # replace temp with whatever the input name file
@@ -10,73 +10,129 @@
 # Direct any questions to Nathan Rong (nrong@cpp.edu)
 
 
+import os
+import re
+import csv
+from dataclasses import dataclass, field
 import pandas as pd
 import numpy as np
 
 
 class staging():
     """
-    This class supports data logging from individual inputs to a structured CSV dataframe
+    This class supports data logging from individual inputs to a structured CSV file
+    Each evaluation is assembled as one row in memory and appended to the file in a single write,
+    the CSV file is never rewritten
 
     Attributes:
     -----------
     file : string
         File path
-    df : dataframe
-        Dataframe to log data into
+    columns : list
+        CSV column layout, taken from the file header if the file already exists
+    index : dict
+        Every logged row (dict of column to value), indexed by iteration
+    flush_every : int
+        Number of completed rows buffered before they are appended to the file
+    fsync : bool
+        Force each append to disk, survives power loss at the cost of a slower write
     """
-    def __init__(self, filename):
+    # Default column layout, reflect new inputs and outputs here
+    COLUMNS = ['Iteration', 
+            'Time', 'Twist', 'Anhedral', 'ZDistance', 'Twist1', 'Twist2', 
+            'Twist3', 'Twist4', 'Twist5', 'Twist6', 'Twist7', 'Twist8', 
+            'Twist9', 'Twist10','Observer2', 'Observer21', 'Observer22', 
+            'Observer23', 'Observer24', 'Observer25', 'Thrust1', 'Thrust2', 
+            'TotalThrust', 'YawMoment1', 'YawMoment2', 'TotalYaw', 'PowerCoef', 'RotorEff',
+            'Surrogate', 'LowFidelity', 'Cached', 'Revolutions', 'WarmStart', 'Abort', 'Preflight',
+            'T_Deck', 'T_Cache', 'T_CHARM', 'T_Parse', 'T_Log', 'T_Driver',
+            'CHARM_Elapsed', 'CHARM_User', 'WOPWOP_Time', 'CHARM_Threads']
+
+    def __init__(self, filename, flush_every=1, fsync=False, columns=None):
         """
-        Initialize dataframe
+        Initialize logger
 
         Parameters:
         ----------
         filename : string
             File name for output CSV file
+        flush_every : int
+            Completed rows to buffer before appending them to the file
+            1 writes every evaluation as soon as it is complete
+        fsync : bool
+            Force every append to disk
+        columns : list or None
+            Column layout of a new file, None for COLUMNS
         """
         self.file = filename + '.csv'
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.index = {}
+        self._open = []
+        self._buffer = []
+        # Dict keys already reported as missing from the layout
+        self._unlogged = set()
         try:
-            # if file is found, open it and edit it
-            self.df = pd.read_csv(self.file)
+            # if file is found, keep its layout and index its rows
+            with open(self.file, 'r', newline='') as f:
+                self.columns = next(csv.reader(f))
+            for row in pd.read_csv(self.file).to_dict('records'):
+                self.index[row['Iteration']] = row
+            self._header_written = True
 
-        # if file is not found, make a new one
-        except FileNotFoundError:
-            self.df = pd.DataFrame(columns = ['Iteration', 
-            'Time', 'Twist', 'Anhedral', 'ZDistance', 'Twist1', 'Twist2', 
-            'Twist3', 'Twist4', 'Twist5', 'Twist6', 'Twist7', 'Twist8', 
-            'Twist9', 'Twist10','Observer2', 'Observer21', 'Observer22', 
-            'Observer23', 'Observer24', 'Observer25', 'Thrust1', 'Thrust2', 
-            'TotalThrust', 'YawMoment1', 'YawMoment2', 'TotalYaw', 'PowerCoef', 'RotorEff'])
+        # if file is not found (or empty), make a new one on the first write
+        except (FileNotFoundError, StopIteration):
+            self.columns = list(columns or self.COLUMNS)
+            self._header_written = False
 
+    @property
+    def df(self):
+        # Dataframe of every logged row, built on request only
+        return pd.DataFrame(list(self.index.values()), columns=self.columns)
 
     def save_to_csv(self):
-        # save Dataframe as CSV file
-        self.df.to_csv(self.file, index=False)
+        # complete any open row and append everything buffered to the CSV file
+        for iteration in list(self._open):
+            self.commit_row(iteration, flush=False)
+        self.flush()
+
+    def flush(self):
+        """
+        Append buffered rows to the CSV file in a single write
+        """
+        if not self._buffer:
+            return
+        with open(self.file, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if not self._header_written:
+                writer.writerow(self.columns)
+                self._header_written = True
+            writer.writerows([[row[col] for col in self.columns] for row in self._buffer])
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._buffer = []
 
  
     def append_iterations(self, iteration):
         """
-        Append rows to structured Dataframe
+        Start a new row in memory
 
         Parameters:
         ----------
         iteration : int
             Row number to create row
         """
-        # maybe make some way so that this is automated
-        self.df.loc[len(self.df)] = [iteration, '', float(0), float(0), float(0), 
-                                     float(0), float(0), float(0), float(0),
-                                     float(0), float(0), float(0), float(0),
-                                     float(0), float(0), float(0), float(0),
-                                     float(0), float(0), float(0), float(0),
-                                     float(0), float(0), float(0), float(0),
-                                     float(0), float(0), float(0), float(0)] 
-        self.save_to_csv()
+        row = {col: float(0) for col in self.columns}
+        row['Iteration'] = iteration
+        row['Time'] = ''
+        self.index[iteration] = row
+        self._open.append(iteration)
 
     
     def append_vals(self, iteration, input_data, header_name = None):
         """
-        Append values into rows in structured Dataframe
+        Append values into a row in memory
 
         Parameters:
         ----------
@@ -87,32 +143,170 @@ class staging():
         header_name : str
             Column name to append value into
         """
+        row = self.index[iteration]
         # Check if input is a single value
         if type(input_data) is str:
             if header_name is None:
                 raise ValueError('header_name must be provided when input_data is a string')
-            self.df.loc[self.df['Iteration'] == iteration, header_name] = input_data
+            self._check_column(header_name)
+            row[header_name] = input_data
             
         # Check if input is a dictionary
+        # Keys without a column in the layout are not logged, each is reported once
         elif type(input_data) is dict:
             for key, val in input_data.items():
-                self.df.loc[self.df['Iteration'] == iteration, key] = val
+                if key in row:
+                    row[key] = val
+                elif key not in self._unlogged:
+                    self._unlogged.add(key)
+                    print(f'Column {key} is not in the CSV layout of {self.file}, its values are not logged...')
         
         # Check if input is a list
         elif isinstance(input_data, np.ndarray):
             if header_name is None:
                 raise ValueError('header_name must be provided when input_data is a np.ndarray')
-            self.df.loc[self.df['Iteration'] == iteration, header_name] = round(input_data[0], 3)
+            self._check_column(header_name)
+            row[header_name] = round(input_data[0], 3)
        
         else:
             raise ValueError('Recieved unexpected input data type while logging to CSV...')
-        self.save_to_csv()
+
+
+    def commit_row(self, iteration, flush=True):
+        """
+        Mark a row as complete and append it to the CSV file per the flush policy
+
+        Parameters:
+        ----------
+        iteration : int
+            Row to complete
+        flush : bool
+            Allow a flush once flush_every rows are buffered
+        """
+        self._open.remove(iteration)
+        self._buffer.append(self.index[iteration])
+        if flush and len(self._buffer) >= self.flush_every:
+            self.flush()
+
+
+    def _check_column(self, header_name):
+        if header_name not in self.columns:
+            raise ValueError(f'Column {header_name} is not in the CSV layout of {self.file}...')
+
+
+class oaspl_table():
+    """
+    This class reads a CHARM OASPL .DAT file (e.g. GAlgoRunsname_oaspldBA.dat) in a single pass
+    All observers are held in one NumPy array, so any observer subset is a cheap slice
+
+    Attributes:
+    -----------
+    observers : ndarray
+        Observer numbers, in file order
+    columns : list
+        Column names of data: x, y, z, Thickness, Loading, Total
+    data : ndarray
+        Observer by column array of values
+
+    Parameters:
+    ----------
+    file_name : str
+        File name for .DAT file
+    """
+    def __init__(self, file_name):
+        with open(file_name, 'r') as f:
+            header = f.readline().split()
+            values = np.array(f.read().split(), dtype=float)
+        table = values.reshape(-1, len(header))
+        self.observers = table[:, 0].astype(int)
+        self.columns = header[1:]
+        self.data = table[:, 1:]
+
+    def rows(self, observers=None):
+        """
+        Row indices of the requested observers
+
+        Parameters:
+        ----------
+        observers : list or None
+            Observer numbers, None for all observers
+
+        Returns:
+        --------
+        ndarray
+            Row indices into data
+        """
+        if observers is None:
+            return np.arange(len(self.observers))
+        order = np.argsort(self.observers)
+        rows = order[np.searchsorted(self.observers, observers, sorter=order)]
+        if not np.array_equal(self.observers[rows], np.asarray(observers)):
+            raise ValueError(f'Observers {observers} not all found in OASPL table...')
+        return rows
+
+    def column(self, header_name='Total', observers=None):
+        """
+        Values of one column for the requested observers
+
+        Parameters:
+        ----------
+        header_name : str
+            Column header, e.g. Total, Loading, Thickness
+        observers : list or None
+            Observer numbers, None for all observers
+
+        Returns:
+        --------
+        ndarray
+            One value per requested observer, in the requested order
+        """
+        return self.data[self.rows(observers), self.columns.index(header_name)]
+
+    def max(self, observers=None, header_name='Total'):
+        # Loudest observer level in dB
+        return self.column(header_name, observers).max()
+
+    def mean(self, observers=None, header_name='Total'):
+        # Arithmetic mean of the levels in dB
+        return self.column(header_name, observers).mean()
+
+    def energy_mean(self, observers=None, header_name='Total'):
+        # Energy averaged level in dB, 10*log10(mean(10^(L/10)))
+        levels = self.column(header_name, observers)
+        return 10*np.log10(np.mean(np.power(10.0, levels/10)))
+
+    def directivity(self, observers=None, header_name='Total'):
+        """
+        Noise directivity over the observer positions
+
+        Parameters:
+        ----------
+        observers : list or None
+            Observer numbers, None for all observers
+        header_name : str
+            Column header of the level
+
+        Returns:
+        --------
+        ndarray
+            Elevation angle from the rotor plane in degrees (90 is on the rotor axis)
+        ndarray
+            Azimuth angle in the rotor plane in degrees
+        ndarray
+            Level at each observer
+        """
+        rows = self.rows(observers)
+        x, y, z = self.data[rows, 0], self.data[rows, 1], self.data[rows, 2]
+        elevation = np.degrees(np.arctan2(z, np.hypot(x, y)))
+        azimuth = np.degrees(np.arctan2(y, x))
+        return elevation, azimuth, self.data[rows, self.columns.index(header_name)]
 
 
 class data_filter():
     """
     This class transforms information from tabulated .DAT file format
     Specifically for OASPL CHARM Simulation predictions
+    Reads the whole file for one value, use oaspl_table to read several observers
 
     Parameters:
     ----------
@@ -124,17 +318,241 @@ class data_filter():
         Column header for data in original table
     """
     def __init__(self, file_name, observer, header_name):
-        self.temp = pd.read_csv(file_name, sep=r'\s+').at[observer-1, header_name]
+        self.temp = oaspl_table(file_name).column(header_name, [observer])[0]
+
+
+@dataclass
+class rotor_loads():
+    """
+    Loads from the "Aircraft 1 loads (inertial frame)" block of a CHARM run log
+    Used for each rotor and for the total aircraft loads
+
+    Attributes:
+    -----------
+    forward, sideward, downward : float
+        Forces along +x, +y, +z in lb
+    roll, pitch, yaw : float
+        Moments about +x, +y, +z in ft-lb
+    power_coef : float or None
+        Power coefficient of the final revolution (rotors only)
+    rotor_eff : float or None
+        Rotor efficiency of the final revolution (rotors only)
+    """
+    forward: float
+    sideward: float
+    downward: float
+    roll: float
+    pitch: float
+    yaw: float
+    power_coef: float = None
+    rotor_eff: float = None
+
+    @property
+    def thrust(self):
+        # thrust is positive up, CHARM reports a downward force
+        return -1*self.downward
+
+
+@dataclass
+class charm_log():
+    """
+    Structured contents of a CHARM run log, parsed in a single read
+
+    Attributes:
+    -----------
+    rotors : dict
+        Rotor number to rotor_loads, for every rotor in the log
+    total : rotor_loads
+        Total aircraft loads
+    power_coef : float
+        Power coefficient of the last WIND AXES block
+    rotor_eff : float
+        Rotor efficiency of the last WIND AXES block
+    revolutions : int or None
+        Revolution the final results were reported after
+    timing : dict
+        Run timing info, any of: date, time, threads_requested, threads_received,
+        threads_available, wopwop_time, user_time, system_time, elapsed_time (seconds)
+    """
+    rotors: dict
+    total: rotor_loads
+    power_coef: float
+    rotor_eff: float
+    revolutions: int = None
+    timing: dict = field(default_factory=dict)
+
+    # Markers of the blocks read from the tail of the log
+    LOADS = 'Aircraft 1 loads (inertial frame):'
+    WIND = 'WIND AXES:'
+    WIND_END = 'Drag to lift'
+    REVOLUTION = 'RESULTS AFTER REVOLUTION'
+
+    @classmethod
+    def read(cls, log_file_name, block_size=65536):
+        """
+        Parse a CHARM run log
+        Results live at the end of the log, so only the tail is read,
+        growing the window until every rotor's final blocks are inside it
+
+        Parameters:
+        -----------
+        log_file_name : str
+            File name of CHARM run log
+        block_size : int
+            Initial tail window in bytes
+
+        Returns:
+        --------
+        charm_log
+            Parsed log
+        """
+        with open(log_file_name, 'rb') as f:
+            head = f.read(4096).decode(errors='replace')
+            size = f.seek(0, os.SEEK_END)
+            window = block_size
+            while True:
+                start = max(size - window, 0)
+                f.seek(start)
+                tail = f.read().decode(errors='replace')
+                if start == 0 or cls._tail_complete(tail):
+                    break
+                window *= 4
+        return cls.parse(tail, head)
+
+    @classmethod
+    def _tail_complete(cls, tail):
+        # Window must hold the loads block plus the last revolution header and performance block of every rotor
+        loads = tail.rfind(cls.LOADS)
+        revolution = tail.rfind(cls.REVOLUTION)
+        if loads < 0 or revolution < 0:
+            return False
+        for rotor in _ROTOR_RE.findall(tail[loads:]):
+            if tail.rfind(f'THIS REVOLUTION - ROTOR {rotor}:', 0, loads) < revolution:
+                return False
+        return True
+
+    @classmethod
+    def parse(cls, content, head=None):
+        """
+        Parse the text of a CHARM run log
+
+        Parameters:
+        -----------
+        content : str
+            Log text, whole log or a tail holding the final results
+        head : str or None
+            Start of the log holding the run header, defaults to content
+
+        Returns:
+        --------
+        charm_log
+            Parsed log
+        """
+        head = content[:4096] if head is None else head
+
+        # Aircraft Aerodynamics data parse
+        loads_at = content.rfind(cls.LOADS)
+        if loads_at < 0:
+            raise ValueError('CHARM log has no aircraft loads block...')
+        loads = content[loads_at:].split('!!!!')[0]
+        blocks = _ROTOR_RE.split(loads.split('Total aircraft loads:')[0])
+        rotors = {int(num): _loads(block) for num, block in zip(blocks[1::2], blocks[2::2])}
+        total = _loads(loads.split('Total aircraft loads:')[1])
+
+        # Wind Axis data parse, per rotor from its last performance block
+        for num, rotor in rotors.items():
+            at = content.rfind(f'THIS REVOLUTION - ROTOR {num}:', 0, loads_at)
+            if at >= 0:
+                rotor.power_coef, rotor.rotor_eff = _performance(content[at:loads_at])
+        wind_at = content.rfind(cls.WIND, 0, loads_at)
+        if wind_at < 0:
+            raise ValueError('CHARM log has no WIND AXES block...')
+        power_coef, rotor_eff = _performance(content[wind_at:loads_at])
+
+        revolutions = _REVOLUTION_RE.findall(content)
+        return cls(rotors, total, power_coef, rotor_eff,
+                   int(revolutions[-1]) if revolutions else None, _timing(head, content[loads_at:]))
+
+    def as_dict(self):
+        """
+        Flat dictionary in the log_file_parse layout, extended to every rotor
+
+        Returns:
+        --------
+        dict
+            Thrust{n}, YawMoment{n} per rotor, TotalThrust, TotalYaw, PowerCoef, RotorEff
+        """
+        data = {}
+        for num, rotor in self.rotors.items():
+            data[f'Thrust{num}'] = rotor.thrust
+            data[f'YawMoment{num}'] = rotor.yaw
+        data['TotalThrust'] = self.total.thrust
+        data['TotalYaw'] = self.total.yaw
+        data['PowerCoef'] = self.power_coef
+        data['RotorEff'] = self.rotor_eff
+        return data
+
+
+_ROTOR_RE = re.compile(r'Rotor\s+(\d+) loads:')
+_REVOLUTION_RE = re.compile(r'RESULTS AFTER REVOLUTION\s+(\d+)')
+_LOAD_RE = re.compile(r'(Forward force|Sideward force|Downward force|Roll moment|Pitch moment|Yaw moment)'
+                      r'\s*\([^)]*\)\s+(\S+)')
+_TIME_RE = re.compile(r'([\d.]+)user\s+([\d.]+)system\s+([\d:.]+)elapsed')
+_LOAD_FIELDS = {'Forward force': 'forward', 'Sideward force': 'sideward', 'Downward force': 'downward',
+                'Roll moment': 'roll', 'Pitch moment': 'pitch', 'Yaw moment': 'yaw'}
+
+
+def _loads(block):
+    # Six force and moment lines of one loads block
+    values = {_LOAD_FIELDS[name]: float(val) for name, val in _LOAD_RE.findall(block)}
+    return rotor_loads(**values)
+
+
+def _performance(block):
+    # Power coefficient and rotor efficiency of the first WIND AXES block in block
+    wind = block[block.find(charm_log.WIND):].split(charm_log.WIND_END)[0]
+    power_coef = float(wind.split('balance)')[1].split('\n')[0].split()[-1])
+    rotor_eff = float(wind.split('Rotor efficiency')[1].split('\n')[0].split()[-1])
+    return power_coef, rotor_eff
+
+
+def _timing(head, tail):
+    # Run header and end of run timings, missing entries are left out
+    timing = {}
+    match = re.search(r'Date:\s*(\d+)\s+Time:\s*([\d:]+)', head)
+    if match:
+        timing['date'], timing['time'] = match.groups()
+    for key, label in (('threads_requested', 'User requested'), ('threads_received', 'User received'),
+                       ('threads_available', 'Available are')):
+        match = re.search(label + r'\s+(\d+)\s+threads', head)
+        if match:
+            timing[key] = int(match.group(1))
+    at = tail.rfind('Total Execution Time =')
+    if at >= 0:
+        timing['wopwop_time'] = float(tail[at:].split('=')[1].split()[0])
+    # Appended when CHARM is launched through /usr/bin/time
+    at = tail.rfind('elapsed')
+    match = _TIME_RE.search(tail[tail.rfind('\n', 0, at) + 1:at + 7]) if at >= 0 else None
+    if match:
+        timing['user_time'], timing['system_time'] = float(match.group(1)), float(match.group(2))
+        seconds = 0.0
+        for part in match.group(3).split(':'):
+            seconds = seconds*60 + float(part)
+        timing['elapsed_time'] = seconds
+    return timing
 
 
 class log_file_parse():
     """
     This class is specifically for parsing CHARM run log files for aerodynamic data
+    Kept for existing scripts, charm_log.read returns the full structured record
 
     Attributes:
     -----------
     dict : dict
         Dictionary of parsed data
+    record : charm_log
+        Structured log contents
 
     Parameters:
     -----------
@@ -147,35 +565,14 @@ class log_file_parse():
         # Check for correct inputs
         if rotor_num not in (1,2):
             raise TypeError('log_file_parse recieved incorrect argument... \n rotor_num must be a 1 or 2')
-        with open(log_file_name, 'r') as f:
-            # Initial file read
-            content = f.read()
-        # Create dictionary to store data
-        self.dict = {}
-        # Aircraft Aerodynamics data parse
-        rotor1 = content.split('Aircraft 1 loads (inertial frame): ')[1].split('Rotor  1 loads:')[1].split('Rotor  2 loads:')[0]
-        totals = content.split('Aircraft 1 loads (inertial frame): ')[1].split('Total aircraft loads:')[1].split('!!!!')[0]
-        self.dict['Thrust1'] = -1*float(rotor1.split('+z-dir)')[1].split('Roll')[0].split('lb')[0].strip())
-        self.dict['TotalThrust'] = -1*float(totals.split('z-dir)')[1].split('lb')[0].strip())
-        self.dict['YawMoment1'] = float(rotor1.split('about +z)')[1].split('ft')[0].strip())
-        
-        self.dict['TotalYaw'] = float(totals.split('about +z)')[1].split('ft')[0].strip())
-
-        # Wind Axis data parse
-        extra_content = content.split('WIND AXES:')[-1].split('Drag to lift')[0]
-        self.dict['PowerCoef'] = float(extra_content.split('balance)')[1].split('Rotor')[0].strip().split(' ')[-1])
-        self.dict['RotorEff'] = float(extra_content.split('efficiency')[1].split('Kapp')[0].strip().split(' ')[-1])
+        self.record = charm_log.read(log_file_name)
+        self.dict = self.record.as_dict()
 
         # Rotor 2 parse
-        if rotor_num == 2:
-            try:
-                rotor2 = content.split('Aircraft 1 loads (inertial frame): ')[1].split('Rotor  2 loads:')[1].split('Total aircraft loads:')[0]
-                self.dict['Thrust2'] = -1*float(rotor2.split('+z-dir)')[1].split('Roll')[0].split('lb')[0].strip())
-                self.dict['YawMoment2'] = float(rotor2.split('about +z)')[1].split('ft')[0].strip())
-            except:
-                raise TypeError('log_file_parse recieved incorrect argument... \n Rotor 2 not found')
+        if rotor_num == 2 and 'Thrust2' not in self.dict:
+            raise TypeError('log_file_parse recieved incorrect argument... \n Rotor 2 not found')
 
 
 
 if __name__ == '__main__':
-    print(log_file_parse('example_onerotor.log').dict)
+    print(charm_log.read('example_temp.log'))
@@ -0,0 +1,245 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# End to end benchmark of the optimization harness, with MockCHARM.py standing in for CHARM
+# Measures the overhead the harness adds to every evaluation (deck writing, CHARM launch,
+# output parsing, results logging, driver) and how throughput scales with concurrent CHARM runs
+# Usage (from the NOISE directory):
+#   python3 HarnessBenchmark.py [--designs N] [--latency S] [--workers 1,2,4,8] [--cores N]
+# --latency is the single threaded mock CHARM run time used for the scaling test
+# --cores overrides the core count given to the scheduler (it never runs more jobs than cores)
+
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import openmdao.api as om
+from GeneticAl import staging, charm_log, oaspl_table
+from CHARMRunner import DESIGN_VARS, OBSERVERS, LOG_FILE, DAT_FILE, evaluate_design, make_workdir
+from CHARMScheduler import CHARMScheduler
+from ParallelCHARM import CandidatePool
+from SingleFileMakerCHARM import FileMaker
+
+
+# Design variable bounds of AlgoRun.py
+DESIGN_BOUNDS = {'Twist': (-10, 45), 'Anhedral': (-1, 15), 'ZDistance': (0, 0)}
+DESIGN_BOUNDS.update({f'Twist{i}': (0, 8) for i in range(1, 11)})
+
+
+def random_designs(count, seed=0):
+    """
+    Random designs inside the AlgoRun.py bounds
+
+    Parameters:
+    -----------
+    count : int
+        Number of designs
+    seed : int
+        Random seed
+
+    Returns:
+    --------
+    list
+        Design dicts
+    """
+    rng = np.random.default_rng(seed)
+    return [{name: float(rng.uniform(*DESIGN_BOUNDS[name])) for name in DESIGN_VARS} for _ in range(count)]
+
+
+def per_call(fun, items):
+    # Mean seconds per call of fun over items
+    start = time.perf_counter()
+    for item in items:
+        fun(item)
+    return (time.perf_counter() - start)/max(len(items), 1)
+
+
+def mock_script(scratch):
+    """
+    Executable copy of GACHARMrun.sh that runs MockCHARM.py
+
+    Parameters:
+    -----------
+    scratch : str
+        Directory for the copy
+
+    Returns:
+    --------
+    str
+        Script path
+    """
+    script = os.path.join(scratch, 'GACHARMrun.sh')
+    shutil.copy('GACHARMrun.sh', script)
+    os.chmod(script, 0o755)
+    os.environ['CHARM_SOLVER'] = f'{sys.executable} {os.path.abspath("MockCHARM.py")}'
+    return script
+
+
+def bench_overhead(designs, scratch, script):
+    """
+    Time each harness stage of a serial evaluation with a zero latency solver
+
+    Parameters:
+    -----------
+    designs : list
+        Design dicts
+    scratch : str
+        Scratch directory
+    script : str
+        Run script from mock_script
+
+    Returns:
+    --------
+    dict
+        Stage name to seconds per evaluation
+    """
+    os.environ['MOCK_CHARM_LATENCY'] = '0'
+    workdir = make_workdir(os.path.join(scratch, 'serial'))
+    scheduler = CHARMScheduler(script, outputs=[LOG_FILE])
+    stages = {}
+
+    def write_deck(design):
+        FileMaker(1, 2, design['Twist'], design['Anhedral'], design['ZDistance'],
+                  *[design[f'Twist{i}'] for i in range(1, 11)], path=workdir)
+    stages['deck writing'] = per_call(write_deck, designs)
+    stages['CHARM launch (mock solver)'] = per_call(lambda design: scheduler.run(workdir), designs)
+
+    log_path, dat_path = os.path.join(workdir, LOG_FILE), os.path.join(workdir, DAT_FILE)
+    stages['output parsing'] = per_call(lambda design: (charm_log.read(log_path).as_dict(),
+                                                        oaspl_table(dat_path).column('Total', OBSERVERS)), designs)
+
+    db = staging(os.path.join(scratch, 'bench'))
+    results = [evaluate_design(design, workdir, scheduler=scheduler) for design in designs[:1]]
+
+    def log_row(item):
+        i, design = item
+        staging.append_iterations(db, i)
+        staging.append_vals(db, i, design)
+        staging.append_vals(db, i, results[0]['log'])
+        staging.append_vals(db, i, results[0]['outputs'])
+        staging.commit_row(db, i)
+    stages['results logging'] = per_call(log_row, list(enumerate(designs)))
+    stages['full evaluate_design'] = per_call(lambda design: evaluate_design(design, workdir, scheduler=scheduler),
+                                              designs)
+    scheduler.close()
+    return stages
+
+
+class NullOptimizer(om.ExplicitComponent):
+    """
+    Component with the Optimizer inputs and outputs that returns constants, isolates the driver cost
+    """
+    def setup(self):
+        for variable in DESIGN_VARS:
+            self.add_input(variable, val=1)
+        for name in [f'Observer{observer}' for observer in OBSERVERS] + ['Thrust_Total', 'Rotor_Eff']:
+            self.add_output(name, val=1.0)
+
+    def compute(self, inputs, outputs):
+        outputs['Thrust_Total'] = inputs['Twist'][0]
+
+
+def bench_driver(scratch, pop_size=20, max_gen=5):
+    """
+    Time the GA driver and recorder per evaluation with a component that does no work
+
+    Parameters:
+    -----------
+    scratch : str
+        Directory for the recorder database
+    pop_size, max_gen : int
+        Driver options
+
+    Returns:
+    --------
+    float
+        Seconds per evaluation
+    """
+    prob = om.Problem(reports=False)
+    prob.model.add_subsystem('GeneticAlgorithm', NullOptimizer(), promotes=['*'])
+    for name, (lower, upper) in DESIGN_BOUNDS.items():
+        prob.model.add_design_var(name, lower=lower, upper=upper)
+    for observer in OBSERVERS:
+        prob.model.add_objective(f'Observer{observer}')
+    prob.model.add_objective('Thrust_Total', scaler=-1)
+    prob.model.add_constraint('Rotor_Eff', lower=0.0, upper=1.0)
+    prob.driver = om.SimpleGADriver(pop_size=pop_size, max_gen=max_gen, compute_pareto=True)
+    prob.driver.options['bits'] = {name: 8 for name in DESIGN_BOUNDS}
+    prob.driver.add_recorder(om.SqliteRecorder(os.path.join(scratch, 'bench.db')))
+    prob.setup()
+    for name, (lower, upper) in DESIGN_BOUNDS.items():
+        prob.set_val(name, 0.5*(lower + upper))
+    start = time.perf_counter()
+    prob.run_driver()
+    return (time.perf_counter() - start)/max(prob.driver.iter_count, 1)
+
+
+def bench_scaling(designs, scratch, script, workers_list, latency, cores):
+    """
+    Throughput of a generation evaluated with an increasing number of concurrent runs
+
+    Parameters:
+    -----------
+    designs : list
+        Design dicts, evaluated as one generation
+    scratch : str
+        Scratch directory
+    script : str
+        Run script from mock_script
+    workers_list : list
+        Concurrent run counts to test
+    latency : float
+        Single threaded mock CHARM run time in seconds
+    cores : int or None
+        Cores shared between runs
+
+    Returns:
+    --------
+    list
+        (workers, threads per run, evaluations per hour) per worker count
+    """
+    os.environ['MOCK_CHARM_LATENCY'] = str(latency)
+    rows = []
+    for workers in workers_list:
+        scheduler = CHARMScheduler(script, outputs=[LOG_FILE], cores=cores, max_jobs=workers)
+        pool = CandidatePool(workers, scratch=os.path.join(scratch, f'pool{workers}'), scheduler=scheduler)
+        start = time.perf_counter()
+        pool.evaluate(designs)
+        elapsed = time.perf_counter() - start
+        rows.append((workers, scheduler.threads, len(designs)/elapsed*3600))
+        scheduler.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimization harness benchmark with the mock CHARM solver')
+    parser.add_argument('--designs', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--cores', type=int, default=None)
+    args = parser.parse_args()
+
+    designs = random_designs(args.designs)
+    with tempfile.TemporaryDirectory() as scratch:
+        script = mock_script(scratch)
+        print(f'Per evaluation overhead ({len(designs)} designs, zero latency solver):')
+        for stage, seconds in bench_overhead(designs, scratch, script).items():
+            print(f'  {stage:28s} {seconds*1000:9.2f} ms')
+        print(f'  {"GA driver and recorder":28s} {bench_driver(scratch)*1000:9.2f} ms')
+
+        print(f'Throughput, one generation of {len(designs)} designs, {args.latency} s single threaded runs:')
+        rows = bench_scaling(designs, scratch, script, [int(val) for val in args.workers.split(',')],
+                             args.latency, args.cores)
+        for workers, threads, rate in rows:
+            print(f'  {workers:3d} workers x {threads:2d} threads  {rate:10.0f} evaluations/h  '
+                  f'speedup {rate/rows[0][2]:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the streaming monitor of CHARM logs
+# While a run is going, the new part of its log is read every few seconds and the run is stopped early
+# when it cannot produce a usable result: error banners, NaN or overflowing values, diverging loads,
+# or converged loads that already miss a hard limit by a margin
+# Read comments in and above each method before using/editing
+
+
+import os
+import re
+import math
+
+
+# Log lines that end a run, case sensitive unless the pattern says otherwise
+# NaN and Inf only match as whole values (not labels such as U-inf)
+ERROR_PATTERNS = [r'\bERROR\b', r'(?i)(?<![\w-])[+-]?nan(?![\w-])', r'(?i)(?<![\w-])[+-]?inf(inity)?(?![\w-])',
+                  r'(?i)floating[- ]point exception', r'(?i)segmentation fault', r'(?i)\bdiverged\b']
+
+# OpenMDAO bound value of an unbounded side
+INF_BOUND = 1.0e30
+
+# Values streamed from the log
+_ROTOR_RE = re.compile(r'(?:blade dynamics of Rotor|THIS REVOLUTION - ROTOR)\s+(\d+)')
+_LIFT_RE = re.compile(r'Lift \(\+up\)\s+(\S+)\s+(\S+)')
+_CT_RE = re.compile(r'^\s*CT =\s+(\S+)')
+_POWER_RE = re.compile(r'Total Power \(energy balance\)\s+\S+\s+(\S+)')
+_EFF_RE = re.compile(r'Rotor efficiency\s+(\S+)')
+_CONVG_RE = re.compile(r'CONVG2 current CONVG2 required:\s+(\S+)\s+(\S+)')
+
+
+class LogMonitor():
+    """
+    Settings of the streaming log check, shared by every run of a scheduler
+    Each run gets its own LogWatch from watch()
+
+    Attributes:
+    -----------
+    log_file : str
+        Log file name inside the run directory
+    limits : dict
+        Output name (Thrust_Total, Coef_Power, Rotor_Eff) to (lower, upper), None for no bound
+    margin : float
+        A converged value is only out of limits beyond bound -/+ margin*|bound|
+    divergence : float
+        Loads or CONVG2 growing by this factor over their start (or smallest) value count as diverged
+    converge_tol : float or None
+        CONVG2 below this counts as converged when the deck enables CONVG2, None for the deck's required value
+    settle_tol : float
+        Without an enabled CONVG2, loads changing less than this (relative) over the last 3 updates count as converged
+    min_revolutions : int
+        Revolutions a run completes before its loads can count as converged
+    interval : float
+        Seconds between log reads
+    """
+    def __init__(self, log_file, limits=None, margin=0.5, divergence=10.0, converge_tol=None, settle_tol=0.02,
+                 min_revolutions=2, interval=2.0, patterns=ERROR_PATTERNS):
+        self.log_file = log_file
+        self.limits = dict(limits or {})
+        self.margin = margin
+        self.divergence = divergence
+        self.converge_tol = converge_tol
+        self.settle_tol = settle_tol
+        self.min_revolutions = min_revolutions
+        self.interval = interval
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+
+    def configure(self, limits):
+        """
+        Set the limits from the problem constraints, called after setup
+        Bounds OpenMDAO stores as +/-1e30 (unbounded) are dropped
+
+        Parameters:
+        -----------
+        limits : dict
+            Output name to (lower, upper)
+        """
+        self.limits = {name: tuple(None if bound is None or abs(float(bound)) >= INF_BOUND else float(bound)
+                                   for bound in bounds)
+                       for name, bounds in limits.items()}
+
+    def watch(self, workdir):
+        # State of one run
+        return LogWatch(self, os.path.join(workdir, self.log_file))
+
+
+class LogWatch():
+    """
+    Incremental reader of one CHARM log
+
+    Attributes:
+    -----------
+    monitor : LogMonitor
+        Settings
+    path : str
+        Log file path
+    thrust : dict
+        Rotor number to latest thrust estimate (lb)
+    history : list
+        Total thrust after every update
+    residuals : list
+        CONVG2 values, one per revolution
+    required : float or None
+        CONVG2 the deck requires, 0 or below when the criterion is disabled
+    revolutions : int
+        Revolutions completed (CONVG2 lines read)
+    values : dict
+        Latest Coef_Power and Rotor_Eff
+    """
+    def __init__(self, monitor, path):
+        self.monitor = monitor
+        self.path = path
+        self.interval = monitor.interval
+        self._offset = 0
+        self._partial = ''
+        self._rotor = 1
+        self._scale = {}
+        self.thrust = {}
+        self.history = []
+        self.residuals = []
+        self.required = None
+        self.revolutions = 0
+        self.values = {}
+
+    def poll(self):
+        """
+        Read the log written since the last poll
+
+        Returns:
+        --------
+        str or None
+            Reason to stop the run, None to let it go on
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return None
+        self._offset += len(chunk)
+        lines = (self._partial + chunk.decode(errors='replace')).split('\n')
+        # Last line may still be written
+        self._partial = lines.pop()
+        for line in lines:
+            reason = self._line(line)
+            if reason:
+                return reason
+        return None
+
+    def _line(self, line):
+        for pattern in self.monitor.patterns:
+            if pattern.search(line):
+                return f'error: {line.strip()[:80]}'
+        try:
+            match = _ROTOR_RE.search(line)
+            if match:
+                self._rotor = int(match.group(1))
+                return None
+            match = _LIFT_RE.search(line)
+            if match:
+                lift, ct = float(match.group(1)), float(match.group(2))
+                if ct:
+                    # Lift over CT converts later CT lines of this rotor to thrust
+                    self._scale[self._rotor] = lift/ct
+                return self._update(lift)
+            match = _CT_RE.search(line)
+            if match and self._rotor in self._scale:
+                return self._update(float(match.group(1))*self._scale[self._rotor])
+            match = _POWER_RE.search(line)
+            if match:
+                self.values['Coef_Power'] = float(match.group(1))
+                return None
+            match = _EFF_RE.search(line)
+            if match:
+                self.values['Rotor_Eff'] = float(match.group(1))
+                return self._limits()
+            match = _CONVG_RE.search(line)
+            if match:
+                return self._residual(float(match.group(1)), float(match.group(2)))
+        except ValueError:
+            # Fortran writes values that do not fit their field as asterisks
+            return f'error: unreadable value in "{line.strip()[:80]}"'
+        return None
+
+    def _update(self, thrust):
+        if not math.isfinite(thrust):
+            return 'error: non-finite thrust'
+        self.thrust[self._rotor] = thrust
+        total = sum(self.thrust.values())
+        self.history.append(total)
+        start = max(abs(self.history[0]), 1.0)
+        if abs(total) > self.monitor.divergence*start:
+            return f'diverged: thrust {total:.1f} from {self.history[0]:.1f}'
+        return self._limits()
+
+    def _residual(self, residual, required):
+        if not math.isfinite(residual):
+            return 'error: non-finite CONVG2'
+        # CONVG2 is printed once per revolution, with the value the deck requires
+        self.revolutions += 1
+        self.required = required
+        # CHARM prints 0 for criteria it does not track
+        if residual > 0:
+            self.residuals.append(residual)
+            if residual > self.monitor.divergence*min(self.residuals):
+                return f'diverged: CONVG2 {residual:.2e} from {min(self.residuals):.2e}'
+        return self._limits()
+
+    def converged(self):
+        """
+        Loads have settled, by CONVG2 when the deck enables it, by the last thrust updates otherwise
+        Loads of the first revolutions (starting wake) never count as settled
+
+        Returns:
+        --------
+        bool
+        """
+        if self.revolutions < self.monitor.min_revolutions:
+            return False
+        # A disabled criterion (required -1) is still printed, and its small early values mean nothing
+        if self.required is not None and self.required > 0 and self.residuals:
+            tolerance = self.monitor.converge_tol if self.monitor.converge_tol is not None else self.required
+            return self.residuals[-1] <= tolerance
+        if len(self.history) < 3:
+            return False
+        last = self.history[-3:]
+        return max(last) - min(last) <= self.monitor.settle_tol*max(abs(last[-1]), 1.0)
+
+    def _limits(self):
+        if not self.monitor.limits or not self.converged():
+            return None
+        values = dict(self.values)
+        if self.history:
+            values['Thrust_Total'] = self.history[-1]
+        margin = self.monitor.margin
+        for name, (lower, upper) in self.monitor.limits.items():
+            if name not in values:
+                continue
+            if lower is not None and values[name] < lower - margin*abs(lower):
+                return f'limit: {name} {values[name]:.4g} below {lower}'
+            if upper is not None and values[name] > upper + margin*abs(upper):
+                return f'limit: {name} {values[name]:.4g} above {upper}'
+        return None
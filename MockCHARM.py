@@ -0,0 +1,422 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses a stand-in for the CHARM executable (runv7) used to test and benchmark the harness
+# It reads the generated GAlgoRuns*.inp decks, computes hover performance with blade element momentum theory,
+# and writes a log and noise file in the layout of example_temp.log and example_temp_oaspldBA.dat
+# Values follow deterministically from the decks, so equal designs always give equal outputs
+# Coarser NPSI and NREV settings run faster and under predict the loads, like a coarse CHARM run
+# A positive CONVG2 ends the run once converged, IRST 1 restarts from {name}.rst (written by every completed run)
+# Usage (same arguments as runv7):
+#   python3 MockCHARM.py . GAlgoRunsname
+# To run the Genetic Algorithm on it, set CHARM_SOLVER before starting AlgoRun.py:
+#   export CHARM_SOLVER="python3 $PWD/MockCHARM.py"  (from the NOISE directory)
+# Environment settings:
+#   MOCK_CHARM_LATENCY    seconds a single threaded run takes at NPSI 24, NREV 3 (default 0)
+#   MOCK_CHARM_LATENCY_SPREAD  runs of some designs take up to 1 + spread times the latency (default 0)
+#   MOCK_CHARM_FAIL_RATE  fraction of designs that crash mid run (default 0)
+#   MOCK_CHARM_SEED       changes which designs crash
+# Read comments in and above each method before using/editing
+
+
+import os
+import sys
+import json
+import time
+import math
+import hashlib
+import numpy as np
+
+
+# Rotor of the example_temp case: 8 ft radius, 720 ft/s tip speed at OMEGA 500, sea level
+RADIUS = 8.0
+REF_OMEGA = 500.0
+RHO = 0.002378
+TIP_SPEED = 720.0
+REF_THRUST = 4474.785
+REF_CHORD = 0.11
+# Solver settings of the example_temp case, run time and discretization error are relative to them
+REF_NPSI = 24
+REF_NREV = 3
+COLD_RESIDUAL = 0.013
+
+# Airfoil model: lift slope, stall angle, profile drag
+LIFT_SLOPE = 5.73
+STALL = math.radians(12.0)
+CD0, CD2 = 0.011, 1.25
+# Induced power factor (tip loss and non uniform inflow), example_temp reports 1.201
+KAPPA = 1.2
+
+# Share of a run that does not speed up with OMP_NUM_THREADS
+SERIAL_FRACTION = 0.05
+
+# Observer grid and OASPL (dBA) of the example_temp case:
+# observer, x, y, z, thickness, loading, total
+REFERENCE_OASPL = [
+    (1, 0.000, -15.24, 0.000, 78.43, 71.87, 79.93),
+    (2, 10.78, -10.78, 0.000, 78.43, 71.91, 80.02),
+    (3, 15.24, 0.000, 0.000, 78.42, 72.10, 79.93),
+    (4, 10.78, 10.78, 0.000, 78.43, 71.83, 79.90),
+    (5, 0.000, -14.72, 3.944, 76.41, 75.98, 79.57),
+    (6, 10.41, -10.41, 3.944, 76.40, 75.71, 79.57),
+    (7, 14.72, 0.000, 3.944, 76.40, 76.03, 79.51),
+    (8, 10.41, 10.41, 3.944, 76.41, 75.80, 79.38),
+    (9, 0.000, -13.20, 7.620, 70.54, 74.48, 75.93),
+    (10, 9.333, -9.333, 7.620, 70.55, 74.01, 75.77),
+    (11, 13.20, 0.000, 7.620, 70.54, 74.43, 75.81),
+    (12, 9.333, 9.333, 7.620, 70.55, 74.19, 75.51),
+    (13, 0.000, -10.78, 10.78, 61.83, 69.42, 69.77),
+    (14, 7.620, -7.620, 10.78, 61.84, 68.70, 69.45),
+    (15, 10.78, 0.000, 10.78, 61.83, 69.28, 69.68),
+    (16, 7.620, 7.620, 10.78, 61.83, 68.96, 69.25),
+    (17, 0.000, -7.620, 13.20, 50.87, 61.36, 61.44),
+    (18, 5.388, -5.388, 13.20, 50.87, 60.12, 60.65),
+    (19, 7.620, 0.000, 13.20, 50.89, 61.34, 61.51),
+    (20, 5.388, 5.388, 13.20, 50.88, 60.48, 60.36),
+    (21, 0.000, -3.944, 14.72, 34.33, 53.41, 53.22),
+    (22, 2.789, -2.789, 14.72, 34.68, 52.80, 53.03),
+    (23, 3.944, 0.000, 14.72, 34.26, 54.16, 54.18),
+    (24, 2.789, 2.789, 14.72, 34.34, 52.73, 52.55),
+    (25, 0.000, 0.000, 15.24, -55.44, 54.88, 54.88),
+]
+
+
+def read_deck(file_name):
+    """
+    Read a CHARM input file as label and value line pairs
+
+    Parameters:
+    -----------
+    file_name : str
+        Input file path
+
+    Returns:
+    --------
+    dict
+        First word of each label line (without its index, e.g. SL(ISEG) -> SL) to the values below it
+        Repeats such as 11*0.0 are expanded, words that are not numbers are kept as strings
+    """
+    with open(file_name, 'r') as f:
+        lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    deck = {}
+    for label, values in zip(lines[::2], lines[1::2]):
+        parsed = []
+        for word in values.split():
+            count, _, value = word.rpartition('*')
+            try:
+                parsed.extend([float(value)]*(int(count) if count else 1))
+            except ValueError:
+                parsed.append(word)
+        deck.setdefault(label.split()[0].split('(')[0], parsed)
+    return deck
+
+
+def read_case(workdir, name):
+    """
+    Read the name file and the rotor files it lists
+
+    Parameters:
+    -----------
+    workdir : str
+        Run directory
+    name : str
+        Name file without extension
+
+    Returns:
+    --------
+    dict
+        nrev, npsi, convg2, irst, velocity (U, V, W in ft/s), rotors: list of (rw deck, bg deck),
+        and files: every input file read
+    """
+    with open(os.path.join(workdir, f'{name}.inp'), 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    case = {'rotors': [], 'files': [f'{name}.inp']}
+    for i, line in enumerate(lines):
+        if line.startswith('INPUT FILENAMES'):
+            case['rotors'].append((read_deck(os.path.join(workdir, lines[i + 1])),
+                                   read_deck(os.path.join(workdir, lines[i + 2]))))
+            case['files'] += lines[i + 1:i + 3]
+        elif line.startswith('U ') and 'W' in line:
+            case['velocity'] = [float(val) for val in lines[i + 1].split()[:3]]
+        elif line.startswith('NPSI'):
+            values = lines[i + 1].split()
+            case['npsi'], case['nrev'] = (int(float(val)) for val in values[:2])
+            case['convg2'] = float(values[3]) if len(values) > 3 else -1.0
+        elif line.startswith('IRST'):
+            case['irst'] = int(float(lines[i + 1].split()[0]))
+    return case
+
+
+def rotor_performance(rw, bg, climb=0.0):
+    """
+    Hover (or axial climb) performance of one rotor by blade element momentum theory
+
+    Parameters:
+    -----------
+    rw : dict
+        Rotor deck from read_deck
+    bg : dict
+        Blade geometry deck from read_deck
+    climb : float
+        Axial velocity in ft/s, positive up
+
+    Returns:
+    --------
+    dict
+        Thrust, power, and efficiency coefficients, blade data used by the noise model
+    """
+    nblade, omega = rw['NBLADE'][0], rw['NBLADE'][1]
+    tip_speed = TIP_SPEED*omega/REF_OMEGA
+
+    # Segment edges normalized so the tip is at r = 1
+    edges = bg['CUTOUT'][0] + np.concatenate([[0.0], np.cumsum(bg['SL'])])
+    edges = edges/edges[-1]
+    r, dr = 0.5*(edges[1:] + edges[:-1]), np.diff(edges)
+    chord = 0.5*(np.array(bg['CHORD'][1:]) + np.array(bg['CHORD'][:-1]))
+    # Pitch at the segment middle: root twist plus the twist built up along the blade
+    twist = np.array(bg['TWSTGD'])
+    pitch = np.radians(bg['TWRD'][0] + np.cumsum(twist) - 0.5*twist)
+    anhedral = np.radians(np.mean(bg['ANHD']))
+    solidity = nblade*chord/np.pi
+    climb_ratio = climb/tip_speed
+
+    def lift(alpha):
+        # Linear lift up to stall, then lift falls off
+        return LIFT_SLOPE*np.where(np.abs(alpha) <= STALL, alpha, np.sign(alpha)*STALL*np.exp(-(np.abs(alpha) - STALL)*3))
+
+    # Inflow of each annulus: momentum thrust equals blade element thrust (bisection, residual rises with inflow)
+    low, high = np.full_like(r, climb_ratio), np.full_like(r, climb_ratio + 1.0)
+    for _ in range(60):
+        inflow = 0.5*(low + high)
+        residual = 4*inflow*(inflow - climb_ratio) - 0.5*solidity*r*lift(pitch - inflow/r)
+        low, high = np.where(residual < 0, inflow, low), np.where(residual < 0, high, inflow)
+    inflow = 0.5*(low + high)
+    alpha = pitch - inflow/r
+    d_thrust = 0.5*solidity*lift(alpha)*r**2*dr
+    d_induced = KAPPA*inflow*d_thrust
+    d_profile = 0.5*solidity*(CD0 + CD2*alpha**2)*r**3*dr
+
+    ct = float(np.sum(d_thrust)*math.cos(anhedral))
+    cp_induced, cp_profile = float(np.sum(d_induced)), float(np.sum(d_profile))
+    cp_ideal = max(ct, 0.0)**1.5/math.sqrt(2)
+    return {'ct': ct, 'cp_induced': cp_induced, 'cp_profile': cp_profile, 'cp': cp_induced + cp_profile,
+            'cp_ideal': cp_ideal, 'efficiency': cp_ideal/cp_induced if cp_induced > 0 else 0.0,
+            'nblade': nblade, 'omega': omega, 'tip_speed': tip_speed,
+            'chord': float(np.sum(chord*dr)), 'solidity': float(np.sum(solidity*dr)),
+            'anhedral': math.degrees(anhedral), 'sweep': float(np.mean(np.abs(bg['SWEEPD']))),
+            'z': float(rw['IROTAT'][3]) if len(rw.get('IROTAT', [])) > 3 else 0.0}
+
+
+def solve(case):
+    """
+    Performance of every rotor, including the wake of the upper rotor on the lower one
+
+    Parameters:
+    -----------
+    case : dict
+        From read_case
+
+    Returns:
+    --------
+    list
+        rotor_performance result of each rotor with dimensional thrust (lb), power (hp), torque (ft-lb)
+    """
+    climb = case.get('velocity', [0.0, 0.0, 0.0])[2]
+    rotors = [rotor_performance(rw, bg, climb) for rw, bg in case['rotors']]
+    if len(rotors) == 2:
+        # Closer rotors interfere more, the lower rotor works in the upper rotor wake
+        gap = abs(rotors[1]['z'] - rotors[0]['z'])
+        lower = rotors[0] if rotors[0]['z'] <= rotors[1]['z'] else rotors[1]
+        loss = 0.2*math.exp(-gap/RADIUS)
+        lower['ct'] *= 1 - loss
+        lower['cp_induced'] *= 1 + loss
+        lower['cp'] = lower['cp_induced'] + lower['cp_profile']
+        lower['efficiency'] = lower['cp_ideal']/lower['cp_induced'] if lower['cp_induced'] > 0 else 0.0
+    for rotor in rotors:
+        area_force = RHO*math.pi*RADIUS**2*rotor['tip_speed']**2
+        rotor['thrust'] = rotor['ct']*area_force
+        rotor['torque'] = rotor['cp']*area_force*RADIUS
+        rotor['power'] = rotor['cp']*area_force*rotor['tip_speed']/550
+    return rotors
+
+
+def oaspl(rotors):
+    """
+    Observer OASPL scaled from the example_temp case
+    Thickness noise follows tip speed, blade count, and blade volume, loading noise follows thrust
+
+    Parameters:
+    -----------
+    rotors : list
+        From solve
+
+    Returns:
+    --------
+    list
+        (observer, x, y, z, thickness, loading, total) per observer
+    """
+    rows = []
+    for observer, x, y, z, thickness0, loading0, total0 in REFERENCE_OASPL:
+        elevation = math.atan2(z, math.hypot(x, y))
+        thickness, loading = 0.0, 0.0
+        for rotor in rotors:
+            th = (thickness0 + 60*math.log10(rotor['omega']/REF_OMEGA) + 10*math.log10(rotor['nblade']/2)
+                  + 20*math.log10(max(rotor['chord'], 1e-3)/REF_CHORD) - 0.05*rotor['sweep']*math.cos(elevation))
+            ld = (loading0 + 20*math.log10(max(abs(rotor['thrust']), 1.0)/REF_THRUST)
+                  + 0.05*rotor['anhedral']*math.sin(elevation))
+            thickness += 10**(th/10)
+            loading += 10**(ld/10)
+        reference = 10**(thickness0/10) + 10**(loading0/10)
+        total = total0 + 10*math.log10((thickness + loading)/reference)
+        rows.append((observer, x, y, z, 10*math.log10(thickness), 10*math.log10(loading), total))
+    return rows
+
+
+def performance_block(num, rotor, revolution=None):
+    # Performance block in the example_temp layout, only the lines the harness reads are filled
+    header = f'\n***** RESULTS AFTER REVOLUTION {revolution:4d} *****\n\n' if revolution else ''
+    return (f'{header}\n        INTEGRATED PERFORMANCE THIS REVOLUTION - ROTOR {num}:\n\n\n'
+            f'WIND AXES:\n\n'
+            f' Lift (+up)                   {rotor["thrust"]:10.2f}   {rotor["ct"]:12.7f}\n\n'
+            f' Total Power (energy balance) {rotor["power"]:10.2f}   {rotor["cp"]:12.7f}\n'
+            f'   Rotor power                {rotor["power"]:10.2f}   {rotor["cp"]:12.7f}\n'
+            f'    Induced                   {rotor["power"]*rotor["cp_induced"]/rotor["cp"]:10.2f}   {rotor["cp_induced"]:12.7f}\n'
+            f'    Profile                   {rotor["power"]*rotor["cp_profile"]/rotor["cp"]:10.2f}   {rotor["cp_profile"]:12.7f}\n'
+            f' Rotor efficiency             {rotor["efficiency"]:10.3f}\n\n'
+            f' Drag to lift ratio (D/L)          0.000\n\n')
+
+
+def loads_block(name, thrust, torque, suffix=''):
+    return (f' {name}\n'
+            f'   Forward force  (+x-dir)    {0.0:10.3f} lb\n'
+            f'   Sideward force (+y-dir)    {0.0:10.3f} lb\n'
+            f'   Downward force (+z-dir)    {-thrust:10.3f} lb{suffix}\n'
+            f'   Roll moment  (about +x)    {0.0:10.3f} ft-lb\n'
+            f'   Pitch moment (about +y)    {0.0:10.3f} ft-lb\n'
+            f'   Yaw moment   (about +z)    {torque:10.3f} ft-lb\n')
+
+
+def design_fraction(workdir, case_files, salt=''):
+    # Deterministic pseudo random number from 0 to 1 of the design in the case files
+    digest = hashlib.sha256((os.environ.get('MOCK_CHARM_SEED', '') + salt).encode())
+    for name in case_files:
+        with open(os.path.join(workdir, name), 'rb') as f:
+            digest.update(f.read())
+    return int(digest.hexdigest()[:8], 16)/16**8
+
+
+def crashes(workdir, case_files):
+    # Deterministic pseudo random crash of a fraction of the designs
+    rate = float(os.environ.get('MOCK_CHARM_FAIL_RATE', 0))
+    if rate <= 0:
+        return False
+    return design_fraction(workdir, case_files) < rate
+
+
+def run(workdir, name):
+    """
+    Run the mock solver: the log is written revolution by revolution over the configured latency
+
+    Parameters:
+    -----------
+    workdir : str
+        Run directory
+    name : str
+        Name file without extension
+
+    Returns:
+    --------
+    int
+        Exit status, 0 on success
+    """
+    start = time.time()
+    requested = int(os.environ.get('OMP_NUM_THREADS', 1))
+    available = os.cpu_count() or 1
+    received = min(requested, available)
+    latency = float(os.environ.get('MOCK_CHARM_LATENCY', 0))*(SERIAL_FRACTION + (1 - SERIAL_FRACTION)/received)
+
+    case = read_case(workdir, name)
+    rotors = solve(case)
+    nrev = max(case.get('nrev', REF_NREV), 1)
+    npsi = max(case.get('npsi', REF_NPSI), 2)
+    # Run time follows azimuth steps times revolutions run, coarse azimuth steps under predict the loads
+    latency *= npsi/REF_NPSI
+    # Some geometries take longer than others
+    spread = float(os.environ.get('MOCK_CHARM_LATENCY_SPREAD', 0))
+    if spread > 0:
+        latency *= 1 + spread*design_fraction(workdir, sorted(set(case['files'])), 'latency')
+    bias = (1 - 1.5/npsi)/(1 - 1.5/REF_NPSI)
+    for rotor in rotors:
+        rotor['thrust'] *= bias
+        rotor['ct'] *= bias
+        for key in ('torque', 'power', 'cp', 'cp_induced', 'cp_profile'):
+            rotor[key] *= bias**1.5
+    # Crashing designs stop after the first revolution, like a diverged wake
+    crash = crashes(workdir, sorted(set(case['files']))) or any(rotor['ct'] <= 0 for rotor in rotors)
+
+    # Loads converge by half each revolution, from the cold residual or from the restart solution
+    # Cold residual follows example_temp.log, CONVG2 is about 1.6E-03 after revolution 3
+    residual = COLD_RESIDUAL
+    restart = os.path.join(workdir, f'{name}.rst')
+    if case.get('irst', 0) and os.path.exists(restart):
+        with open(restart, 'r') as f:
+            previous = json.load(f)['ct']
+        if len(previous) == len(rotors):
+            residual = min(COLD_RESIDUAL, max(abs(rotor['ct'] - ct)/abs(rotor['ct']) for rotor, ct in zip(rotors, previous)))
+    convg2 = case.get('convg2', -1.0)
+
+    with open(os.path.join(workdir, f'{name}.log'), 'w') as log:
+        log.write(' CHARM VERSION 8.0 (mock)\n Comprehensive Hierarchical Aeromechanics Rotorcraft Model\n\n'
+                  f' Date: {time.strftime("%Y%m%d")}   Time: {time.strftime("%H:%M:%S")}\n\n \n'
+                  f' User requested {requested:3d} threads\n User received  {received:3d} threads\n'
+                  f' Available are {available:4d} threads\n\n')
+        for revolution in range(1, nrev + 1):
+            time.sleep(latency*0.8/REF_NREV)
+            # Loads converge over the revolutions
+            residual *= 0.5
+            for num, rotor in enumerate(rotors, 1):
+                log.write(f' *  The blade dynamics of Rotor {num} is being calculated now *\n')
+                log.write(performance_block(num, dict(rotor, thrust=rotor['thrust']*(1 + residual),
+                                                      ct=rotor['ct']*(1 + residual))))
+            log.write(f' CONVG2 current CONVG2 required:   {residual:.7E}  {convg2:f}    \n')
+            log.flush()
+            if crash:
+                log.write('\n *** ERROR: wake solution diverged, run stopped ***\n')
+                return 1
+            if 0 < convg2 and residual < convg2:
+                log.write(' +++ Convergence criteria have been met +++\n\n')
+                break
+        else:
+            log.write(' +++ Maximum blade revolutions have been completed +++\n\n')
+        for num, rotor in enumerate(rotors, 1):
+            log.write(performance_block(num, rotor, revolution))
+        log.write('Aircraft 1 loads (inertial frame): \n Weight =      0.000 lb\n')
+        for num, rotor in enumerate(rotors, 1):
+            log.write(loads_block(f'Rotor {num:2d} loads:', rotor['thrust'], rotor['torque']))
+        log.write(loads_block('Total aircraft loads:', sum(rotor['thrust'] for rotor in rotors),
+                              sum(rotor['torque'] for rotor in rotors), '  Weight minus thrust'))
+        log.write('\n !!!! PSU-WOPWOP namelist generated !!!!\n END-OF-COMPUTATION.\n')
+        log.flush()
+        with open(restart, 'w') as f:
+            json.dump({'ct': [rotor['ct'] for rotor in rotors]}, f)
+
+        # Noise calculation takes the rest of the run
+        time.sleep(latency*0.2)
+        with open(os.path.join(workdir, f'{name}_oaspldBA.dat'), 'w') as dat:
+            dat.write('   observer     x           y            z       Thickness    Loading      Total\n')
+            for row in oaspl(rotors):
+                dat.write(f'{row[0]:9d}   {row[1]:8.3f}    {row[2]:8.3f}    {row[3]:8.3f}    '
+                          f'{row[4]:8.2f}    {row[5]:8.2f}    {row[6]:8.2f}    \n')
+        elapsed = time.time() - start
+        log.write(f' Total Execution Time =    {latency*0.2:.6f}     \n'
+                  f' *** oaspldBA.dat processing complete ***\n'
+                  f'{elapsed:.2f}user 0.00system 0:{elapsed:05.2f}elapsed 99%CPU\n')
+    return 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('Usage: python3 MockCHARM.py [run directory] [name file without extension]')
+    sys.exit(run(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,200 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the multi-fidelity evaluation ladder of the Genetic Algorithm
+# Every candidate of a generation is first run with coarse CHARM settings (fewer azimuth steps,
+# revolutions, free wake points, and spanwise panels), only the best ranked fraction is promoted to a
+# full CHARM run, and the rest receive their coarse outputs corrected by a learned low to high mapping
+# Read comments in and above each method before using/editing
+
+
+import numpy as np
+from Surrogate import OUTPUTS
+from CHARMRunner import LOG_OUTPUTS
+
+
+# Coarse CHARM settings (SingleFileMakerCHARM.DEFAULT_PARAMS entries) of the screening runs
+# Full settings are NPSI 24, NREV 3, NPTFW 48 48 96, NSPAN -72
+# NZONE vortex counts are left alone, the core radius and cutoff lists of the rw file are sized to them
+LOW_FIDELITY = {'npsi': 12, 'nrev': 2, 'nptfw': [24, 24, 48], 'nspan': -36}
+
+
+class fidelity_correction():
+    """
+    Per output linear map from coarse to full CHARM outputs, high = scale*low + shift
+    Fitted by least squares on candidates run at both fidelities
+    With few pairs (or no spread in the coarse values) only the mean shift is used
+
+    Attributes:
+    -----------
+    scale : dict
+        Output name to scale
+    shift : dict
+        Output name to shift
+    """
+    def __init__(self, min_fit=5):
+        self.min_fit = min_fit
+        self.scale = dict.fromkeys(OUTPUTS, 1.0)
+        self.shift = dict.fromkeys(OUTPUTS, 0.0)
+
+    def fit(self, low, high):
+        """
+        Fit from paired outputs
+
+        Parameters:
+        -----------
+        low : list
+            Output dicts of the coarse runs
+        high : list
+            Output dicts of the full runs of the same designs
+        """
+        if not low:
+            return
+        for name in OUTPUTS:
+            x = np.array([out[name] for out in low], dtype=float)
+            y = np.array([out[name] for out in high], dtype=float)
+            if len(x) >= self.min_fit and np.std(x) > 1e-12*max(np.abs(x).max(), 1.0):
+                self.scale[name], self.shift[name] = np.polyfit(x, y, 1)
+            else:
+                self.scale[name], self.shift[name] = 1.0, float(np.mean(y - x))
+
+    def apply(self, outputs):
+        # Corrected copy of an output dict
+        return {name: self.scale[name]*val + self.shift[name] if name in self.scale else val
+                for name, val in outputs.items()}
+
+
+class FidelityLadder():
+    """
+    Decides which coarse results of a generation are promoted to a full CHARM run
+
+    Candidates are ranked by the driver fitness of their corrected coarse outputs,
+    the best promote_fraction of each generation is promoted, plus any candidate predicted
+    to beat the best full fidelity fitness so far, so the reported optimum is always a full run
+    Every candidate is promoted until min_pairs designs have been run at both fidelities
+
+    Attributes:
+    -----------
+    low : dict
+        Deck parameters of the coarse runs
+    promote_fraction : float
+        Fraction of each generation run at full fidelity
+    min_pairs : int
+        Paired runs needed before promotion is selective
+    max_pairs : int
+        Most recent paired runs kept for the correction
+    pairs : dict
+        design_key to (coarse outputs, full outputs)
+    stats : dict
+        Counts of coarse runs, promoted runs, and corrected results
+    """
+    def __init__(self, low=LOW_FIDELITY, promote_fraction=0.25, min_pairs=10, max_pairs=500):
+        self.low = dict(low)
+        self.promote_fraction = promote_fraction
+        self.min_pairs, self.max_pairs = min_pairs, max_pairs
+        self.correction = fidelity_correction()
+        self.pairs = {}
+        self.fitness = None
+        self.best = np.inf
+        self.stats = {'low': 0, 'promoted': 0, 'corrected': 0}
+
+    def configure(self, fitness):
+        """
+        Attach the driver fitness, called by the driver during setup
+
+        Parameters:
+        -----------
+        fitness : function
+            From Surrogate.driver_fitness
+        """
+        self.fitness = fitness
+
+    def _fitness(self, outputs):
+        return self.fitness({name: np.array([out[name] for out in outputs]) for name in OUTPUTS})
+
+    def select(self, results):
+        """
+        Pick the coarse results to promote
+
+        Parameters:
+        -----------
+        results : list
+            Coarse results of one generation (evaluate_design format)
+
+        Returns:
+        --------
+        list
+            True for each result whose design should be run at full fidelity
+        """
+        self.stats['low'] += len(results)
+        if len(self.pairs) < self.min_pairs or self.fitness is None:
+            promote = [result['sim_worked'] for result in results]
+        else:
+            worked = np.array([result['sim_worked'] for result in results])
+            fit = np.full(len(results), np.inf)
+            if worked.any():
+                fit[worked] = self._fitness([self.correction.apply(result['outputs'])
+                                             for result, ok in zip(results, worked) if ok])
+            count = int(np.ceil(self.promote_fraction*len(results)))
+            promote = np.zeros(len(results), dtype=bool)
+            promote[np.argsort(fit)[:count]] = True
+            # A predicted new incumbent is always verified
+            promote |= fit < self.best
+            # Coarse runs that failed are not promoted, their penalty outputs stand
+            promote = list(promote & worked)
+        self.stats['promoted'] += int(sum(promote))
+        return promote
+
+    def update(self, keys, low, high):
+        """
+        Add designs run at both fidelities and refit the correction
+        Pairs where either run failed are left out
+
+        Parameters:
+        -----------
+        keys : list
+            design_key of each design
+        low : list
+            Coarse results
+        high : list
+            Full results of the same designs
+        """
+        for key, lo, hi in zip(keys, low, high):
+            if lo['sim_worked'] and hi['sim_worked'] and not hi.get('surrogate', False):
+                self.pairs.pop(key, None)
+                self.pairs[key] = (lo['outputs'], hi['outputs'])
+        while len(self.pairs) > self.max_pairs:
+            self.pairs.pop(next(iter(self.pairs)))
+        if self.pairs:
+            self.correction.fit(*(list(side) for side in zip(*self.pairs.values())))
+        worked = [hi['outputs'] for hi in high if hi['sim_worked'] and not hi.get('surrogate', False)]
+        if worked and self.fitness is not None:
+            self.best = min(self.best, float(np.min(self._fitness(worked))))
+
+    def corrected(self, result):
+        """
+        Coarse result with corrected outputs, flagged low_fidelity
+        Failed coarse runs keep their penalty outputs
+
+        Parameters:
+        -----------
+        result : dict
+            Coarse result
+
+        Returns:
+        --------
+        dict
+            Result in the evaluate_design format
+        """
+        self.stats['corrected'] += 1
+        if not result['sim_worked']:
+            return dict(result, low_fidelity=True)
+        outputs = self.correction.apply(result['outputs'])
+        log = dict(result['log'], **{key: outputs[name] for name, key in LOG_OUTPUTS.items()})
+        corrected = dict(result, outputs=outputs, log=log, low_fidelity=True)
+        # Outputs of each operating point are corrected the same way
+        if 'points' in result:
+            corrected['points'] = [self.correction.apply(point) for point in result['points']]
+        return corrected
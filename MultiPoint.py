@@ -0,0 +1,318 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the multi-operating-point evaluation of a candidate
+# The geometry deck (bg file) of a candidate is written once and shared, every operating point (OMEGA, U V W)
+# gets its own rw and name files and runs concurrently with the others,
+# and the per point results are combined into weighted objectives and worst case constraints
+# Read comments in and above each method before using/editing
+
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from CHARMRunner import PENALTY_OUTPUTS, make_workdir, write_deck, cached_run
+from SingleFileMakerCHARM import DECK_WRITER, DEFAULT_PARAMS
+from Timing import StageTimer
+
+
+# Directory of the operating point runs inside a candidate's run directory
+POINT_DIR = 'GAPoints'
+
+# Outputs logged per operating point in the CSV file, as {point name}_{output} columns
+POINT_OUTPUTS = ['Thrust_Total', 'Coef_Power', 'Rotor_Eff', 'Observer2', 'Observer25']
+
+
+class OperatingPoints():
+    """
+    Operating envelope every candidate is evaluated over
+    Each point is a set of deck parameters for the rw and name files, e.g. {'omega': 450, 'velocity': [0, 0, 10]}
+    (OMEGA in rad/s, U V W in ft/s, W positive in climb), the geometry is the candidate's own at every point
+
+    Objectives are the weighted mean of the point outputs
+    Constraints hold at every point: each constrained output takes the point value closest to (or furthest beyond)
+    its bounds, so a blade that stalls in climb or is too loud at the top RPM is infeasible
+    A run failing at any point fails the candidate (penalty outputs)
+
+    Attributes:
+    -----------
+    points : list
+        Deck parameters of each point
+    names : list
+        Point names, used for the CSV columns
+    weights : ndarray
+        Objective weight of each point, summing to 1
+    bounds : dict
+        Constrained output name to (lower, upper), set by configure
+    """
+    def __init__(self, points):
+        """
+        Check and store the operating points
+
+        Parameters:
+        -----------
+        points : list
+            One dict per point: deck parameters (rw and name file entries of DEFAULT_PARAMS),
+            plus optional 'weight' (default 1) and 'name' (default P1, P2, ...)
+        """
+        if not points:
+            raise ValueError('OperatingPoints needs at least one operating point...')
+        # Parameters of the shared geometry deck cannot change between points
+        geometry = DECK_WRITER.templates['bg'].names
+        self.points, self.names, weights = [], [], []
+        for number, point in enumerate(points, 1):
+            params = {key: val for key, val in point.items() if key not in ('weight', 'name')}
+            unknown = set(params) - set(DEFAULT_PARAMS)
+            if unknown:
+                raise ValueError(f'Unknown deck parameters {sorted(unknown)} in operating point {number}...')
+            shared = set(params) & geometry
+            if shared:
+                raise ValueError(f'Operating point {number} sets geometry deck parameters {sorted(shared)}, '
+                                 'every point shares the candidate geometry...')
+            self.points.append(params)
+            self.names.append(str(point.get('name', f'P{number}')))
+            weights.append(float(point.get('weight', 1.0)))
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f'Operating point names must differ, got {self.names}...')
+        weights = np.array(weights)
+        if np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError('Operating point weights must be positive...')
+        self.weights = weights/weights.sum()
+        self.bounds = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def spec(self):
+        # Points as given to __init__, e.g. to send them to work queue workers
+        return [dict(params, name=name, weight=float(weight))
+                for params, name, weight in zip(self.points, self.names, self.weights)]
+
+    def configure(self, bounds):
+        """
+        Attach the constraint bounds, the worst point is the one with the least margin to them
+
+        Parameters:
+        -----------
+        bounds : dict
+            Output name to (lower, upper), None or OpenMDAO's +-1e30 for no bound
+        """
+        self.bounds = {name: (lower, upper) for name, (lower, upper) in bounds.items()}
+
+    def evaluate(self, design, workdir, cache, scheduler, timer, warm, artifacts, params):
+        """
+        Run a candidate at every operating point, in the evaluate_design pipeline after the pre-flight check
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        workdir : str
+            Run directory of the candidate, the points run in subdirectories of it
+        cache : EvalCache or None
+            Persistent cache, each point is cached on its own
+        scheduler : CHARMScheduler or None
+            Scheduler that launches CHARM, plan it for a run per point
+        timer : StageTimer
+            Receives the stage times of every point, added up
+        warm : RestartStore or None
+            Restart data of solved designs, points only restart from the same point
+        artifacts : ArtifactStore or None
+            Store of the CHARM run files
+        params : dict
+            Deck parameters of the candidate (e.g. coarse settings), the point parameters are applied on top
+
+        Returns:
+        --------
+        dict
+            Combined result, see combine
+        """
+        with timer.stage('Deck'):
+            # Geometry deck is written once, every point reads it through a link
+            source = os.path.abspath(os.path.join(workdir, f'{DECK_WRITER.prefix}bg.inp'))
+            write_deck(design, workdir, ('bg',), **params)
+            workdirs = [self._workdir(workdir, name, source) for name in self.names]
+
+        def run(number):
+            point_timer = StageTimer()
+            result = cached_run(design, workdirs[number], cache, scheduler, point_timer, warm, artifacts,
+                                dict(params, **self.points[number]), ('rw', 'name'))
+            return result, point_timer.times
+
+        with ThreadPoolExecutor(max_workers=len(self.points), thread_name_prefix='GAPoint') as executor:
+            runs = list(executor.map(run, range(len(self.points))))
+        for _, times in runs:
+            for stage, seconds in times.items():
+                timer.times[stage] = timer.times.get(stage, 0.0) + seconds
+        return self.combine([result for result, _ in runs])
+
+    @staticmethod
+    def _workdir(workdir, name, source):
+        # Point run directory with the static inputs and the candidate geometry deck linked in
+        path = make_workdir(os.path.join(workdir, POINT_DIR, name), static_dir=workdir)
+        target = os.path.join(path, os.path.basename(source))
+        if os.path.islink(target):
+            return path
+        try:
+            os.symlink(source, target)
+        except OSError:
+            # No symlinks (or an old copy in the way), the copy is refreshed for every candidate
+            shutil.copy(source, target)
+        return path
+
+    def combine(self, results):
+        """
+        Combine the point results of a candidate
+
+        Parameters:
+        -----------
+        results : list
+            Result of each point, in the evaluate_design format
+
+        Returns:
+        --------
+        dict
+            Result in the evaluate_design format:
+            outputs and log are the weighted means of the points (penalty outputs if any point failed),
+            status, abort, and rejected are those of the first failed point,
+            revolutions is the most any point needed, charm_timing adds up the run times,
+            warm_start is the farthest restart (None if any point started cold),
+            artifact is the stored run of the first point (the others are found by design in the store),
+            cached is set when every point came from the cache,
+            and points holds the outputs of each point for the worst case constraints and the CSV columns
+        """
+        worked = all(result['sim_worked'] for result in results)
+        failed = [result for result in results if not result['sim_worked']]
+        combined = {'sim_worked': worked, 'status': failed[0].get('status', 'failed') if failed else 'ok',
+                    'points': [dict(result['outputs']) for result in results]}
+        if worked:
+            combined['outputs'] = self._mean([result['outputs'] for result in results])
+            combined['log'] = self._mean([result['log'] for result in results])
+        else:
+            combined['outputs'], combined['log'] = dict(PENALTY_OUTPUTS), {}
+            for key in ('abort', 'rejected'):
+                reasons = [f'{name}: {result[key]}' for name, result in zip(self.names, results) if key in result]
+                if reasons:
+                    combined[key] = reasons[0]
+
+        revolutions = [result['revolutions'] for result in results if result.get('revolutions') is not None]
+        if revolutions:
+            combined['revolutions'] = max(revolutions)
+        timings = [result['charm_timing'] for result in results if result.get('charm_timing')]
+        if timings:
+            # Run times add up, thread counts and the start date are those of the first point
+            combined['charm_timing'] = dict(timings[0], **{key: sum(timing.get(key, 0.0) for timing in timings)
+                                                           for key in timings[0] if key.endswith('_time')})
+        if any('warm_start' in result for result in results):
+            distances = [result.get('warm_start') for result in results]
+            combined['warm_start'] = None if None in distances else max(distances)
+        if results[0].get('artifact') is not None:
+            combined['artifact'] = results[0]['artifact']
+        if all(result.get('cached') for result in results):
+            combined['cached'] = True
+        return combined
+
+    def _mean(self, values):
+        # Weighted mean of each name every point has a number for
+        mean = {}
+        for name in values[0]:
+            column = [value.get(name) for value in values]
+            if all(isinstance(val, (int, float)) and not isinstance(val, bool) for val in column):
+                mean[name] = float(np.dot(self.weights, column))
+        return mean
+
+    def worst(self, result):
+        """
+        Outputs the constraints of a result are checked on
+
+        Parameters:
+        -----------
+        result : dict
+            Result in the evaluate_design format
+
+        Returns:
+        --------
+        dict
+            Output name to value, constrained outputs from the point with the least margin to the bounds,
+            the result outputs when it has no point outputs (single point, surrogate prediction)
+        """
+        if 'points' not in result:
+            return result['outputs']
+        outputs = dict(result['outputs'])
+        for name, (lower, upper) in self.bounds.items():
+            values = [point[name] for point in result['points'] if point.get(name) is not None]
+            if values:
+                outputs[name] = min(values, key=lambda val: self._margin(val, lower, upper))
+        return outputs
+
+    @staticmethod
+    def _margin(value, lower, upper):
+        # Distance inside the bounds, negative beyond them
+        margin = np.inf
+        if lower is not None and lower > -1e30:
+            margin = min(margin, value - lower)
+        if upper is not None and upper < 1e30:
+            margin = min(margin, upper - value)
+        return margin
+
+    def columns(self, result):
+        """
+        Results log columns of the point outputs
+
+        Parameters:
+        -----------
+        result : dict
+            Result in the evaluate_design format
+
+        Returns:
+        --------
+        dict
+            {point name}_{output} column to value, empty without point outputs
+        """
+        columns = {}
+        for name, outputs in zip(self.names, result.get('points', [])):
+            for output in POINT_OUTPUTS:
+                if outputs.get(output) is not None:
+                    columns[f'{name}_{output}'] = outputs[output]
+        return columns
+
+    def layout(self, columns):
+        """
+        Results log layout with the point columns placed after the combined outputs
+
+        Parameters:
+        -----------
+        columns : list
+            Base layout, e.g. staging.COLUMNS
+
+        Returns:
+        --------
+        list
+            Layout including the point columns
+        """
+        point_columns = [f'{name}_{output}' for name in self.names for output in POINT_OUTPUTS]
+        at = columns.index('Surrogate')
+        return columns[:at] + [name for name in point_columns if name not in columns] + columns[at:]
+
+    def restore(self, row, result):
+        """
+        Add the point outputs logged in a results CSV row to a restored result, so its constraints are worst case again
+
+        Parameters:
+        -----------
+        row : dict
+            Results log row
+        result : dict
+            Result restored from the row
+        """
+        points = []
+        for name in self.names:
+            values = {output: row.get(f'{name}_{output}') for output in POINT_OUTPUTS}
+            values = {output: float(val) for output, val in values.items() if val is not None and not np.isnan(val)}
+            if not values:
+                return
+            points.append(values)
+        result['points'] = points
@@ -0,0 +1,415 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the parallel evaluation mode for the Genetic Algorithm
+# Every individual of a generation is run in its own sandbox directory,
+# and a pool of concurrent CHARM processes evaluates the whole generation at once
+# Read comments in and above each method before using/editing
+
+
+import os
+import time
+import queue
+import traceback
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from CHARMRunner import SCHEDULER, PENALTY_OUTPUTS, make_workdir, evaluate_design
+from Checkpoint import CheckpointGeneticAlgorithm, CheckpointGADriver, history_key
+
+
+def design_key(design):
+    """
+    Hashable key of a design vector, used to match driver candidates to component inputs
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value
+
+    Returns:
+    --------
+    tuple
+        Sorted (name, rounded value) pairs
+    """
+    return tuple((name, round(float(val), 10)) for name, val in sorted(design.items()))
+
+
+class CandidatePool():
+    """
+    Evaluates batches of candidates with concurrent CHARM processes
+    Each worker slot owns a sandbox directory, so runs never share input or output files
+    CHARM runs as a subprocess, so threads are enough to keep every slot busy
+    Batches (evaluate) serve generational drivers, single designs (submit and collect) serve steady-state drivers
+
+    Attributes:
+    -----------
+    num_workers : int
+        Number of concurrent CHARM processes
+    scratch : str
+        Root directory holding one sandbox per candidate
+    results : dict
+        Results of the last batch, keyed by design_key
+    cache : EvalCache or None
+        Persistent cache checked before each CHARM run
+    scheduler : CHARMScheduler or None
+        Scheduler that launches CHARM, re-planned for each batch
+    busy : float
+        Total seconds spent evaluating batches
+    history : dict or None
+        Results of a resumed run (Checkpoint.results_history), restored instead of run
+    warm : RestartStore or None
+        Restart data of solved designs, each run starts from the nearest one
+    artifacts : ArtifactStore or None
+        Store the files of every CHARM run are kept in
+    preflight : Preflight or None
+        Checks that reject hopeless candidates before their CHARM run
+    points : OperatingPoints or None
+        Operating points every candidate is run at, each candidate then takes a CHARM run per point
+    """
+    def __init__(self, num_workers, scratch='GAScratch', cache=None, scheduler=None, history=None, warm=None,
+                 artifacts=None, preflight=None, points=None):
+        """
+        Initialize pool
+
+        Parameters:
+        -----------
+        num_workers : int
+            Number of concurrent CHARM processes
+        scratch : str
+            Root directory for candidate sandboxes
+        cache : EvalCache or None
+            Persistent cache checked before each CHARM run
+        scheduler : CHARMScheduler or None
+            Scheduler that launches CHARM, defaults to CHARMRunner.SCHEDULER
+        history : dict or None
+            Results of a resumed run, keyed by history_key
+        warm : RestartStore or None
+            Restart data of solved designs
+        artifacts : ArtifactStore or None
+            Store of the CHARM run files
+        preflight : Preflight or None
+            Checks run before each CHARM run
+        points : OperatingPoints or None
+            Operating points every candidate is run at, None for the deck operating point
+        """
+        if num_workers < 1:
+            raise ValueError('CandidatePool requires at least 1 worker...')
+        self.num_workers = num_workers
+        self.scratch = scratch
+        self.cache = cache
+        self.scheduler = scheduler or SCHEDULER
+        self.results = {}
+        self.busy = 0.0
+        self.history = history
+        self.warm = warm
+        self.artifacts = artifacts
+        self.preflight = preflight
+        self.points = points
+        # Slot threads of submitted designs, started on the first submit
+        self._executor = None
+        self._done = queue.Queue()
+        self._tickets = 0
+
+    def evaluate(self, designs, settings=None):
+        """
+        Run CHARM for every unique design concurrently and store the results
+
+        Parameters:
+        -----------
+        designs : list
+            List of design dicts (design variable name to float value)
+        settings : dict or None
+            Deck parameters replacing the defaults (e.g. MultiFidelity.LOW_FIDELITY), None for full CHARM runs
+        """
+        start = time.perf_counter()
+        # Individuals repeat often (elitism, converged population), run each once
+        unique, restored = {}, {}
+        for design in designs:
+            key = design_key(design)
+            # Designs evaluated before a resume are not run again
+            if self.history and settings is None and history_key(design) in self.history:
+                restored[key] = self.history[history_key(design)]
+            else:
+                unique.setdefault(key, design)
+
+        self.results = dict(zip(unique.keys(), self._run_batch(list(unique.values()), settings)))
+        self.results.update(restored)
+        self.busy += time.perf_counter() - start
+
+    def _run_batch(self, designs, settings):
+        """
+        Run CHARM for a list of unique designs, subclasses replace where the runs happen
+
+        Parameters:
+        -----------
+        designs : list
+            Design dicts, no repeats
+        settings : dict or None
+            Deck parameters replacing the defaults
+
+        Returns:
+        --------
+        list
+            Result of each design, in the evaluate_design format
+        """
+        # Sandbox per candidate in the batch, reused across generations
+        workdirs = [make_workdir(os.path.join(self.scratch, f'cand{i:03d}'))
+                    for i in range(len(designs))]
+
+        # Cores are split between the runs of this batch and CHARM threads per run
+        self._plan(min(len(designs), self.num_workers))
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            return list(executor.map(partial(evaluate_design, cache=self.cache, scheduler=self.scheduler,
+                                             settings=settings, warm=self.warm, artifacts=self.artifacts,
+                                             preflight=self.preflight, points=self.points),
+                                     designs, workdirs))
+
+    def _plan(self, candidates):
+        # Every candidate takes a CHARM run per operating point
+        self.scheduler.plan(candidates*(len(self.points) if self.points is not None else 1))
+
+    def submit(self, design):
+        """
+        Start the CHARM run of one design without waiting for it
+        At most num_workers designs run at once, later designs wait for the first free slot
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+
+        Returns:
+        --------
+        int
+            Ticket of the design, returned with its result by collect
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix='GASlot')
+            self._slots = queue.Queue()
+            for slot in range(self.num_workers):
+                self._slots.put(slot)
+            # Every slot stays busy from here on, cores are split between all of them
+            self._plan(self.num_workers)
+        self._tickets += 1
+        # Designs evaluated before a resume are not run again
+        if self.history and history_key(design) in self.history:
+            self._done.put((self._tickets, design, self.history[history_key(design)]))
+        else:
+            self._executor.submit(self._run_submitted, self._tickets, design)
+        return self._tickets
+
+    def _run_submitted(self, ticket, design):
+        slot = self._slots.get()
+        try:
+            result = self._run_slot(design, slot)
+        except Exception:
+            # collect must always receive a result, or the driver would wait forever
+            traceback.print_exc()
+            result = {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': 'failed'}
+        finally:
+            self._slots.put(slot)
+        self._done.put((ticket, design, result))
+
+    def _run_slot(self, design, slot):
+        """
+        Run CHARM for one submitted design, subclasses replace where the run happens
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        slot : int
+            Slot running the design, no other design uses it meanwhile
+
+        Returns:
+        --------
+        dict
+            Result in the evaluate_design format
+        """
+        workdir = make_workdir(os.path.join(self.scratch, f'slot{slot:02d}'))
+        return evaluate_design(design, workdir, cache=self.cache, scheduler=self.scheduler, warm=self.warm,
+                               artifacts=self.artifacts, preflight=self.preflight, points=self.points)
+
+    def collect(self):
+        """
+        Wait for the next submitted design to finish, in the order they finish
+        Its result replaces the last batch, so fetch returns it to the Optimizer component
+
+        Returns:
+        --------
+        int
+            Ticket from submit
+        dict
+            Design
+        dict
+            Result in the evaluate_design format
+        """
+        start = time.perf_counter()
+        ticket, design, result = self._done.get()
+        self.results = {design_key(design): result}
+        self.busy += time.perf_counter() - start
+        return ticket, design, result
+
+    def store(self, design, result):
+        """
+        Add a result computed outside the pool (e.g. a surrogate prediction) to the last batch
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        result : dict
+            Result in the evaluate_design format
+        """
+        self.results[design_key(design)] = result
+
+    def fetch(self, design):
+        """
+        Look up the result of a design evaluated in the last batch
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+
+        Returns:
+        --------
+        dict or None
+            Result from evaluate_design, None if the design was not in the batch
+        """
+        return self.results.get(design_key(design))
+
+
+class BatchGeneticAlgorithm(CheckpointGeneticAlgorithm):
+    """
+    OpenMDAO GeneticAlgorithm that hands each decoded generation to a batch callback
+    The serial objective loop that follows then only collects the precomputed results
+
+    Attributes:
+    -----------
+    batch_fun : function
+        Called with the array of in-bounds design points of each generation
+    """
+    def __init__(self, objfun, batch_fun, comm=None, model_mpi=None, checkpoint=None):
+        super().__init__(objfun, comm=comm, model_mpi=model_mpi, checkpoint=checkpoint)
+        self.batch_fun = batch_fun
+        self._vob = None
+
+    def execute_ga(self, x0, vlb, vub, vob, bits, pop_size, max_gen, random_state, Pm=None, Pc=0.5):
+        # Outer bounds are needed to skip the points the GA discards without evaluating
+        self._vob = vob
+        return super().execute_ga(x0, vlb, vub, vob, bits, pop_size, max_gen, random_state, Pm, Pc)
+
+    def decode(self, gen, vlb, vub, bits):
+        # Decoding happens once per generation, right before the population is evaluated
+        x_pop = super().decode(gen, vlb, vub, bits)
+        in_bounds = np.all(x_pop - self._vob <= 0, axis=1)
+        self.batch_fun(x_pop[in_bounds])
+        return x_pop
+
+
+class ParallelGADriver(CheckpointGADriver):
+    """
+    CheckpointGADriver that evaluates each generation with a CandidatePool
+    Driver options, penalties, recording, pareto calculation, and checkpoints are unchanged
+
+    Attributes:
+    -----------
+    pool : CandidatePool
+        Pool shared with the Optimizer component
+    surrogate : SurrogateScreen or None
+        Pre-screening of each generation, only the candidates it selects are run with CHARM
+    ladder : FidelityLadder or None
+        Multi-fidelity evaluation, candidates are run coarse first and only the best are run in full
+    shape : BladeShape or None
+        Blade parameterization, designs get their per segment values the way the Optimizer component adds them
+    """
+    def __init__(self, pool, surrogate=None, ladder=None, shape=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.surrogate = surrogate
+        self.ladder = ladder
+        self.shape = shape
+
+    def _setup_driver(self, problem):
+        super()._setup_driver(problem)
+        if self.surrogate is not None or self.ladder is not None:
+            from Surrogate import driver_fitness
+        if self.ladder is not None:
+            self.ladder.configure(driver_fitness(self))
+        if self.surrogate is not None:
+            bounds = {name: (float(np.ravel(meta['lower'])[0]), float(np.ravel(meta['upper'])[0]))
+                      for name, meta in self._designvars.items()}
+            self.surrogate.configure(driver_fitness(self), bounds)
+
+    def _make_ga(self, comm, model_mpi):
+        return BatchGeneticAlgorithm(self.objective_callback, self._evaluate_batch, comm=comm,
+                                     model_mpi=model_mpi, checkpoint=self.checkpoint)
+
+    def _evaluate_batch(self, x_pop):
+        """
+        Convert design points to design dicts and evaluate them in the pool
+
+        Parameters:
+        -----------
+        x_pop : ndarray
+            Design points of one generation
+        """
+        # Every design variable of the Optimizer component is a scalar
+        designs = []
+        for x in x_pop:
+            designs.append({name: float(x[i]) for name, (i, j) in self._desvar_idx.items()})
+        if self.shape is not None:
+            designs = [self.shape.expand(design) for design in designs]
+        if self.surrogate is None:
+            self._evaluate_designs(designs)
+            return
+
+        # Only promising or uncertain candidates are run, the rest get surrogate predictions
+        run, predicted = self.surrogate.screen(designs)
+        chosen = [design for design, selected in zip(designs, run) if selected]
+        self._evaluate_designs(chosen)
+        self.surrogate.update(chosen, [self.pool.fetch(design) for design in chosen])
+        for design, result in zip(designs, predicted):
+            if result is not None:
+                self.pool.store(design, result)
+
+    def _evaluate_designs(self, designs):
+        """
+        Evaluate designs with CHARM in the pool, through the fidelity ladder when there is one
+
+        Parameters:
+        -----------
+        designs : list
+            Design dicts
+        """
+        if self.ladder is None:
+            self.pool.evaluate(designs)
+            return
+
+        # Designs already run in full (e.g. elites) skip the coarse run, the cache or a new run returns the full result
+        known = [design for design in designs if design_key(design) in self.ladder.pairs]
+        designs = [design for design in designs if design_key(design) not in self.ladder.pairs]
+
+        # Coarse runs of every other design rank the generation
+        self.pool.evaluate(designs, settings=self.ladder.low)
+        low = [self.pool.fetch(design) for design in designs]
+        promote = self.ladder.select(low)
+
+        # Best ranked designs are run in full, the rest keep their corrected coarse results
+        chosen = [design for design, selected in zip(designs, promote) if selected]
+        self.pool.evaluate(chosen + known)
+        high = [self.pool.fetch(design) for design in chosen]
+        paired = [result for result, selected in zip(low, promote) if selected]
+        for lo, hi in zip(paired, high):
+            # Coarse run time of a promoted design is counted with its full run
+            timing = hi.setdefault('timing', {})
+            for stage, seconds in lo.pop('timing', {}).items():
+                timing[stage] = timing.get(stage, 0.0) + seconds
+        self.ladder.update([design_key(design) for design in chosen], paired, high)
+        for design, result, selected in zip(designs, low, promote):
+            if not selected:
+                self.pool.store(design, self.ladder.corrected(result))
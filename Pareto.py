@@ -0,0 +1,296 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the incremental Pareto archive of the Genetic Algorithm
+# Every CHARM evaluation is added as it lands, dominated archive members are dropped right away,
+# so the front over all objectives is always current without re-reading the recorder database
+# At the end of each generation the hypervolume and IGD of the front are logged and the front is exported
+# Read comments in and above each method before using/editing
+
+
+import os
+import csv
+import tempfile
+import numpy as np
+from CHARMRunner import DESIGN_VARS, LOG_OUTPUTS
+
+
+def pareto_mask(F):
+    """
+    Non-dominated rows of an objective array, all objectives minimized
+    Each pass drops every row the current row dominates, so the work shrinks with the front
+    Rows equal to a non-dominated row are kept
+
+    Parameters:
+    -----------
+    F : ndarray
+        Objective values, one row per point
+
+    Returns:
+    --------
+    ndarray
+        True for the non-dominated rows
+    """
+    F = np.asarray(F, dtype=float)
+    # Rows with small sums dominate the most, checking them first removes the most rows early
+    order = np.argsort(F.sum(axis=1), kind='stable')
+    index, rest = order, F[order]
+    i = 0
+    while i < len(rest):
+        keep = np.any(rest < rest[i], axis=1) | np.all(rest == rest[i], axis=1)
+        index, rest = index[keep], rest[keep]
+        i = int(np.sum(keep[:i])) + 1
+    mask = np.zeros(len(F), dtype=bool)
+    mask[index] = True
+    return mask
+
+
+class ParetoArchive():
+    """
+    Non-dominated set of every evaluation, updated one evaluation at a time
+
+    Objectives are stored minimized (maximized outputs are negated)
+    Hypervolume is a Monte Carlo estimate in objective space normalized by the first front measured,
+    with the reference point pad past its worst values, so values are comparable across generations
+    IGD of a generation is the mean distance from each archive point to the nearest non-dominated point of that generation
+
+    Attributes:
+    -----------
+    senses : dict
+        Objective output name to 1 (minimize) or -1 (maximize)
+    file : str or None
+        CSV file the front is exported to after every generation
+    history_file : str or None
+        CSV file the per generation indicators are appended to
+    samples : int
+        Monte Carlo samples of each hypervolume estimate
+    pad : float
+        Reference point distance past the worst value of the first front, as a fraction of its range
+    points : list
+        Archive members: dict of iteration, design, and outputs, in the row order of the objective array
+    evaluations : int
+        Evaluations added since creation (not counting seeded rows)
+    history : list
+        Indicator dict of each generation
+    """
+    def __init__(self, objectives=None, file='GAPareto.csv', history_file='GAParetoHistory.csv', samples=10000,
+                 pad=0.1, seed=0):
+        self.file = file
+        self.history_file = history_file
+        self.samples = samples
+        self.pad = pad
+        self.seed = seed
+        self.evaluations = 0
+        self.history = []
+        self.configure(objectives or {})
+
+    def configure(self, objectives):
+        """
+        Set the objectives, clears the archive
+
+        Parameters:
+        -----------
+        objectives : dict
+            Output name to 1 (minimize) or -1 (maximize), e.g. the sign of each objective scaler
+        """
+        self.senses = {name: 1.0 if sense >= 0 else -1.0 for name, sense in objectives.items()}
+        self.names = list(self.senses)
+        self._sign = np.array([self.senses[name] for name in self.names])
+        self._F = np.empty((0, len(self.names)))
+        self.points = []
+        self._generation = []
+        self._added = 0
+        self._lower = self._scale = self._reference = None
+
+    def _vector(self, outputs):
+        return self._sign*np.array([float(outputs[name]) for name in self.names])
+
+    @property
+    def front(self):
+        # Objective values of the archive members, in output units
+        return self._F*self._sign
+
+    def add(self, outputs, design=None, iteration=None):
+        """
+        Add one evaluation
+
+        Parameters:
+        -----------
+        outputs : dict
+            Output name to value, must hold every objective
+        design : dict or None
+            Design variable name to value, exported with the front
+        iteration : int or None
+            Results log row of the evaluation
+
+        Returns:
+        --------
+        bool
+            True if the evaluation joined the front
+        """
+        f = self._vector(outputs)
+        if not np.all(np.isfinite(f)):
+            return False
+        self.evaluations += 1
+        self._generation.append(f)
+        # Dominated by or equal to a member, the archive is unchanged
+        if len(self._F) and np.any(np.all(self._F <= f, axis=1)):
+            return False
+        keep = ~np.all(f <= self._F, axis=1)
+        self._F = np.vstack([self._F[keep], f])
+        if not keep.all():
+            self.points = [point for point, kept in zip(self.points, keep) if kept]
+        self.points.append({'iteration': iteration, 'design': dict(design or {}), 'outputs': dict(outputs)})
+        self._added += 1
+        return True
+
+    def seed_from_log(self, db):
+        """
+        Fill the archive with the front of the CHARM results already logged in a results CSV file
+        Failed runs, surrogate predictions, and corrected coarse runs are left out
+
+        Parameters:
+        -----------
+        db : staging
+            Results logger of the current run
+        """
+        rows, values = [], []
+        for row in db.index.values():
+            if row.get('Surrogate', 0) or row.get('LowFidelity', 0):
+                continue
+            thrust = row.get('TotalThrust')
+            if not thrust or np.isnan(thrust):
+                continue
+            outputs = {name: row[column] for name, column in LOG_OUTPUTS.items() if column in row}
+            outputs.update({name: row[name] for name in self.names if name in row})
+            if any(name not in outputs for name in self.names):
+                continue
+            f = self._vector(outputs)
+            if np.all(np.isfinite(f)):
+                rows.append((row, outputs))
+                values.append(f)
+        if not values:
+            return
+        F = np.vstack([self._F] + values)
+        mask = pareto_mask(F)
+        members = self.points + [{'iteration': row['Iteration'],
+                                  'design': {name: float(row[name]) for name in DESIGN_VARS if name in row},
+                                  'outputs': outputs} for row, outputs in rows]
+        # Equal rows (repeated designs) are kept once
+        _, first = np.unique(F[mask], axis=0, return_index=True)
+        index = np.flatnonzero(mask)[np.sort(first)]
+        self._F = F[index]
+        self.points = [members[i] for i in index]
+        print(f'Pareto archive seeded with {len(self.points)} designs from {len(values)} logged results...')
+
+    def _normalize(self, F):
+        if self._scale is None:
+            # Normalization and reference point are fixed by the first front measured
+            self._lower = self._F.min(axis=0)
+            span = self._F.max(axis=0) - self._lower
+            self._scale = np.where(span > 0, span, 1.0)
+            self._reference = np.full(len(self.names), 1.0 + self.pad)
+        return (F - self._lower)/self._scale
+
+    def hypervolume(self):
+        """
+        Monte Carlo estimate of the normalized volume dominated by the front up to the reference point
+        Samples are drawn in the box from the front's best values to the reference point, with a fixed seed
+
+        Returns:
+        --------
+        float
+            Hypervolume, 0 for an empty archive
+        """
+        if not len(self._F):
+            return 0.0
+        F = self._normalize(self._F)
+        # Points past the reference point in any objective add nothing
+        F = F[np.all(F < self._reference, axis=1)]
+        if not len(F):
+            return 0.0
+        lower = F.min(axis=0)
+        box = self._reference - lower
+        rng = np.random.default_rng(self.seed)
+        samples = lower + rng.random((self.samples, len(self.names)))*box
+        # Chunks keep the sample by point comparison array small
+        chunk = max(1, int(4e6 // (len(F)*len(self.names))))
+        dominated = 0
+        for start in range(0, self.samples, chunk):
+            part = samples[start:start + chunk]
+            dominated += int(np.sum(np.any(np.all(F[None, :, :] <= part[:, None, :], axis=2), axis=1)))
+        return float(np.prod(box)*dominated/self.samples)
+
+    def igd(self, F):
+        """
+        Inverted generational distance of a point set to the archive, in normalized objectives
+
+        Parameters:
+        -----------
+        F : ndarray
+            Minimized objective values of the points
+
+        Returns:
+        --------
+        float
+            Mean distance from each archive member to its nearest point, nan without points
+        """
+        if not len(F) or not len(self._F):
+            return float('nan')
+        front = self._normalize(self._F)
+        points = self._normalize(np.asarray(F))
+        distance = np.full(len(front), np.inf)
+        chunk = max(1, int(4e6 // (len(front)*len(self.names))))
+        for start in range(0, len(points), chunk):
+            part = points[start:start + chunk]
+            distance = np.minimum(distance, np.sqrt(((front[:, None, :] - part[None, :, :])**2).sum(axis=2)).min(axis=1))
+        return float(distance.mean())
+
+    def end_generation(self, generation):
+        """
+        Log the indicators of the generation just evaluated and export the front
+        Called by the driver after every generation
+
+        Parameters:
+        -----------
+        generation : int
+            Generation number
+        """
+        F = np.array(self._generation).reshape(-1, len(self.names))
+        record = {'Generation': generation, 'Evaluations': self.evaluations, 'Front': len(self._F),
+                  'Added': self._added, 'Hypervolume': round(self.hypervolume(), 6),
+                  'IGD': round(self.igd(F[pareto_mask(F)]) if len(F) else float('nan'), 6)}
+        self.history.append(record)
+        self._generation, self._added = [], 0
+        print(f'Generation {generation}: Pareto front of {record["Front"]} designs ({record["Added"]} new), '
+              f'hypervolume {record["Hypervolume"]:.4g}, IGD {record["IGD"]:.4g}')
+        if self.history_file:
+            new = not os.path.exists(self.history_file)
+            with open(self.history_file, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(record))
+                if new:
+                    writer.writeheader()
+                writer.writerow(record)
+        if self.file:
+            self.export(self.file)
+
+    def export(self, file):
+        """
+        Write the current front to a CSV file, replaced atomically
+
+        Parameters:
+        -----------
+        file : str
+            CSV file path
+        """
+        columns = ['Iteration'] + DESIGN_VARS + self.names
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file)), prefix='.pareto')
+        with os.fdopen(fd, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for point in self.points:
+                writer.writerow([point['iteration']] + [point['design'].get(name, '') for name in DESIGN_VARS]
+                                + [point['outputs'][name] for name in self.names])
+        os.replace(temp, file)
@@ -0,0 +1,137 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# Throughput benchmark of the CHARM log parser over a corpus of run logs
+# Compares the single read tail parser (charm_log) against the previous approach,
+# which parsed the full log five times per evaluation
+# Usage:
+#   python3 ParseBenchmark.py [log files or glob patterns] [--pad N] [--repeat N]
+# --pad N inserts N copies of the wake iteration output into each log to mimic production sized logs
+
+
+import os
+import re
+import glob
+import time
+import argparse
+import tempfile
+from GeneticAl import charm_log
+
+
+def legacy_parse(content):
+    """
+    Previous split based parser, kept only as the benchmark reference
+
+    Parameters:
+    -----------
+    content : str
+        Full log text
+
+    Returns:
+    --------
+    dict
+        Thrust1, TotalThrust, YawMoment1, TotalYaw, PowerCoef, RotorEff
+    """
+    data = {}
+    rotor1 = content.split('Aircraft 1 loads (inertial frame): ')[1].split('Rotor  1 loads:')[1].split('Rotor  2 loads:')[0]
+    totals = content.split('Aircraft 1 loads (inertial frame): ')[1].split('Total aircraft loads:')[1].split('!!!!')[0]
+    data['Thrust1'] = -1*float(rotor1.split('+z-dir)')[1].split('Roll')[0].split('lb')[0].strip())
+    data['TotalThrust'] = -1*float(totals.split('z-dir)')[1].split('lb')[0].strip())
+    data['YawMoment1'] = float(rotor1.split('about +z)')[1].split('ft')[0].strip())
+    data['TotalYaw'] = float(totals.split('about +z)')[1].split('ft')[0].strip())
+    extra_content = content.split('WIND AXES:')[-1].split('Drag to lift')[0]
+    data['PowerCoef'] = float(extra_content.split('balance)')[1].split('Rotor')[0].strip().split(' ')[-1])
+    data['RotorEff'] = float(extra_content.split('efficiency')[1].split('Kapp')[0].strip().split(' ')[-1])
+    return data
+
+
+def pad_log(content, copies):
+    """
+    Grow a log by repeating its wake iteration output
+
+    Parameters:
+    -----------
+    content : str
+        Log text
+    copies : int
+        Number of extra copies of the first revolution block
+
+    Returns:
+    --------
+    str
+        Padded log text, final results unchanged
+    """
+    marks = [m.start() for m in re.finditer('The blade dynamics of Rotor', content)]
+    if copies <= 0 or len(marks) < 2:
+        return content
+    return content[:marks[1]] + content[marks[0]:marks[1]]*copies + content[marks[1]:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CHARM log parser throughput benchmark')
+    parser.add_argument('logs', nargs='*', default=['example_temp.log'])
+    parser.add_argument('--pad', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    files = sorted({name for pattern in args.logs for name in glob.glob(pattern)})
+    if not files:
+        raise FileNotFoundError(f'No logs match {args.logs}')
+    with tempfile.TemporaryDirectory() as scratch:
+        run_benchmark(files, scratch, args.pad, args.repeat)
+
+
+def run_benchmark(files, scratch, pad, repeat):
+    """
+    Time both parsers over the corpus and print the throughput
+
+    Parameters:
+    -----------
+    files : list
+        CHARM run logs
+    scratch : str
+        Directory the (padded) corpus is written into
+    pad : int
+        Extra copies of the wake iteration output per log
+    repeat : int
+        Number of passes over the corpus
+    """
+    # Padded logs are written out so both parsers read real files
+    corpus = []
+    for i, name in enumerate(files):
+        with open(name, 'r') as f:
+            content = pad_log(f.read(), pad)
+        path = os.path.join(scratch, f'bench_log_{i:03d}.log')
+        with open(path, 'w') as f:
+            f.write(content)
+        corpus.append(path)
+        if legacy_parse(content) != charm_log.parse(content).as_dict():
+            print(f'Warning: parsers disagree on {name}')
+    megabytes = sum(os.path.getsize(path) for path in corpus) / 1e6
+
+    # Previous approach: five full reads and parses per evaluation
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in corpus:
+            for _ in range(5):
+                with open(path, 'r') as f:
+                    legacy_parse(f.read())
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in corpus:
+            charm_log.read(path)
+    single = time.perf_counter() - start
+
+    evaluations = repeat*len(corpus)
+    print(f'Corpus: {len(corpus)} logs, {megabytes:.2f} MB, {evaluations} evaluations')
+    print(f'Previous (5 parses): {evaluations/legacy:10.1f} evaluations/s  {megabytes*repeat/legacy:8.1f} MB/s')
+    print(f'charm_log.read:      {evaluations/single:10.1f} evaluations/s  {megabytes*repeat/single:8.1f} MB/s')
+    print(f'Speedup: {legacy/single:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the pre-flight check of candidates before CHARM is launched
+# Blades breaking a configurable rule (twist gradient, total twist, chord, anhedral and sweep),
+# or close to designs that kept failing before (nearest neighbour classifier over the evaluation history),
+# get the penalty outputs right away, without writing decks or starting CHARM
+# Read comments in and above each method before using/editing
+
+
+import math
+import threading
+import numpy as np
+from SingleFileMakerCHARM import DEFAULT_PARAMS
+from CHARMRunner import CHORD_VARS
+
+
+# Rule name to limit, None disables a rule
+# Every rule is off until a limit is set, no failure data backs a default and a limit outside the AlgoRun.py design bounds
+# never fires (Twist1..10 up to 8 on the tip segment of SL 0.0104 already reach about 770 deg/R of twist gradient)
+# Set a limit from the designs that failed, e.g. rule_values of the crashed rows in the CSV file against the ones that ran
+PREFLIGHT_RULES = {
+    # Largest twist change of a segment over its length (TWSTGD/SL), degrees per blade radius
+    'twist_gradient': None,
+    # Largest pitch along the blade (TWRD plus the twist built up to each segment), degrees
+    'total_twist': None,
+    # Smallest and largest chord (CHORD)
+    'min_chord': None,
+    'max_chord': None,
+    # Largest over smallest chord
+    'taper': None,
+    # Anhedral plus the largest sweep magnitude (ANHD, SWEEPD), degrees
+    'anhedral_sweep': None,
+}
+
+# Rule name to the blade value it checks and whether the limit is a maximum
+_RULES = {
+    'twist_gradient': (lambda blade: np.max(np.abs(blade['twist'])/blade['sl']), True),
+    'total_twist': (lambda blade: np.max(np.abs(blade['twist_root'] + np.cumsum(blade['twist']))), True),
+    'min_chord': (lambda blade: np.min(blade['chord']), False),
+    'max_chord': (lambda blade: np.max(blade['chord']), True),
+    'taper': (lambda blade: np.max(blade['chord'])/max(np.min(blade['chord']), 1e-9), True),
+    'anhedral_sweep': (lambda blade: abs(blade['anhedral']) + np.max(np.abs(blade['sweep'])), True),
+}
+
+
+def blade_arrays(design, params=None):
+    """
+    Blade geometry a design's decks would hold
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value (Twist, Anhedral, Twist1..10, Chord1..11 if set)
+    params : dict or None
+        Deck parameters replacing the SingleFileMakerCHARM defaults
+
+    Returns:
+    --------
+    dict
+        twist_root, anhedral (float), twist, sl, sweep, chord (ndarray)
+    """
+    values = dict(DEFAULT_PARAMS, **(params or {}))
+    twist = np.array([design[f'Twist{i}'] for i in range(1, len(values['sl']) + 1)], dtype=float)
+    chord = [design[name] for name in CHORD_VARS] if CHORD_VARS[0] in design else values['chord']
+    return {'twist_root': float(design['Twist']), 'anhedral': float(design['Anhedral']), 'twist': twist,
+            'sl': np.array(values['sl'], dtype=float), 'sweep': np.array(values['sweep'], dtype=float),
+            'chord': np.atleast_1d(np.array(chord, dtype=float))}
+
+
+def rule_values(design, params=None):
+    """
+    Value of every rule for a design, to compare failed and working designs when choosing limits
+
+    Parameters:
+    -----------
+    design : dict
+        Design variable name to float value (Twist, Anhedral, Twist1..10, Chord1..11 if set)
+    params : dict or None
+        Deck parameters replacing the SingleFileMakerCHARM defaults
+
+    Returns:
+    --------
+    dict
+        Rule name to float value
+    """
+    blade = blade_arrays(design, params)
+    return {name: float(value(blade)) for name, (value, upper) in _RULES.items()}
+
+
+def failed_run(result):
+    """
+    CHARM could not evaluate the design, as opposed to a design that merely misses a limit
+
+    Parameters:
+    -----------
+    result : dict
+        Result in the evaluate_design format
+
+    Returns:
+    --------
+    bool or None
+        True for a crash, timeout, or error abort, False for a success, None when the result says nothing
+    """
+    status = result.get('status')
+    if status in ('cancelled', 'rejected') or result.get('surrogate') or result.get('low_fidelity'):
+        return None
+    if result['sim_worked']:
+        return False
+    # Log monitor limit aborts are designs beyond a constraint, not solver failures
+    return not str(result.get('abort', '')).startswith('limit')
+
+
+def _reason(value):
+    # Text column value of a results log row, None for an empty cell
+    if not isinstance(value, str) or value in ('', '0', '0.0'):
+        return None
+    return value
+
+
+class Preflight():
+    """
+    Rule checks and failure classifier run on each candidate before CHARM
+    Safe to share between pool threads
+
+    The classifier rejects a design when at least min_failures of its k nearest evaluated designs
+    within radius failed and they make up at least threshold of them
+    Distances are the RMS of the differences of the design variables, as a fraction of each design range
+
+    Attributes:
+    -----------
+    rules : dict
+        Rule name to limit, None disables a rule
+    classifier : bool
+        Use the failure classifier
+    k : int
+        Neighbours considered
+    radius : float
+        Largest normalized distance of a neighbour
+    threshold : float
+        Failed fraction of the neighbours that rejects a design
+    min_failures : int
+        Failed neighbours needed to reject a design
+    stats : dict
+        Candidates checked, rejected by a rule, and rejected by the classifier
+    """
+    def __init__(self, rules=PREFLIGHT_RULES, classifier=True, k=5, radius=0.1, threshold=0.8, min_failures=3):
+        unknown = set(rules) - set(_RULES)
+        if unknown:
+            raise ValueError(f'Unknown pre-flight rules {sorted(unknown)}...')
+        self.rules = dict(rules)
+        self.classifier = classifier
+        self.k = k
+        self.radius = radius
+        self.threshold = threshold
+        self.min_failures = min_failures
+        self.stats = {'checked': 0, 'rules': 0, 'classifier': 0}
+        self.lower, self.span = {}, {}
+        self._lock = threading.Lock()
+        self._points, self._failed = [], []
+
+    def configure(self, bounds):
+        """
+        Attach the design bounds, the classifier works on the design variables in bounds normalized units
+
+        Parameters:
+        -----------
+        bounds : dict
+            Design variable name to (lower, upper)
+        """
+        self.lower = {name: float(lower) for name, (lower, upper) in bounds.items()}
+        self.span = {name: float(upper - lower) if upper > lower else 1.0 for name, (lower, upper) in bounds.items()}
+        self._points, self._failed = [], []
+
+    def _vector(self, design):
+        return [(design[name] - self.lower[name])/self.span[name] for name in self.span]
+
+    def check(self, design, params=None):
+        """
+        Decide whether a candidate is worth a CHARM run
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        params : dict or None
+            Deck parameters of the run
+
+        Returns:
+        --------
+        str or None
+            Reason for rejecting the candidate, None to run it
+        """
+        with self._lock:
+            self.stats['checked'] += 1
+        blade = blade_arrays(design, params)
+        for name, limit in self.rules.items():
+            if limit is None:
+                continue
+            value, upper = _RULES[name][0](blade), _RULES[name][1]
+            if (value > limit) if upper else (value < limit):
+                with self._lock:
+                    self.stats['rules'] += 1
+                return f'rule: {name} {value:.4g} {"above" if upper else "below"} {limit}'
+        reason = self._classify(design) if self.classifier else None
+        if reason is not None:
+            with self._lock:
+                self.stats['classifier'] += 1
+        return reason
+
+    def _classify(self, design):
+        with self._lock:
+            if not self.span or sum(self._failed) < self.min_failures:
+                return None
+            points, failed = np.array(self._points), np.array(self._failed)
+        distance = np.sqrt(np.mean((points - self._vector(design))**2, axis=1))
+        nearest = np.argsort(distance, kind='stable')[:self.k]
+        nearest = nearest[distance[nearest] <= self.radius]
+        failures = int(np.sum(failed[nearest]))
+        if failures < self.min_failures or failures < self.threshold*len(nearest):
+            return None
+        return (f'classifier: {failures} of {len(nearest)} evaluated designs within {self.radius} failed '
+                f'(nearest {distance[nearest[0]]:.3f})')
+
+    def record(self, design, result):
+        """
+        Add an evaluated design to the classifier history
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        result : dict
+            Result in the evaluate_design format
+        """
+        failed = failed_run(result)
+        if failed is None or not self.span:
+            return
+        with self._lock:
+            self._points.append(self._vector(design))
+            self._failed.append(failed)
+
+    def seed_from_log(self, db):
+        """
+        Fill the classifier history from the evaluations already in a results CSV file
+        Rejected candidates, surrogate predictions, corrected coarse runs, and limit aborts are left out
+
+        Parameters:
+        -----------
+        db : staging
+            Results logger of the current run
+        """
+        count = 0
+        for row in db.index.values():
+            if row.get('Surrogate', 0) or row.get('LowFidelity', 0) or _reason(row.get('Preflight')):
+                continue
+            if any(name not in row for name in self.span):
+                continue
+            thrust = row.get('TotalThrust')
+            worked = bool(thrust) and not math.isnan(thrust)
+            abort = _reason(row.get('Abort')) or ''
+            self.record({name: float(row[name]) for name in self.span},
+                        {'sim_worked': worked, 'abort': abort, 'status': 'ok' if worked else 'failed'})
+            count += 1
+        if count:
+            print(f'Pre-flight classifier seeded with {count} logged evaluations ({sum(self._failed)} failed)...')
@@ -0,0 +1,213 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the SQLite case recorder of the Genetic Algorithm and its bulk reader
+# Cases are committed in batches to a database in WAL mode instead of one transaction per case,
+# only the variables asked for are recorded, and the whole history is read back into NumPy arrays with one query
+# Usage (reader):
+#   python3 Recorder.py AlgoRun_out/optimization_results.db --npz GACases.npz
+# Read comments in and above each method before using/editing
+
+
+import os
+import json
+import time
+import zlib
+import atexit
+import sqlite3
+import argparse
+from fnmatch import fnmatchcase
+import numpy as np
+import openmdao.api as om
+
+
+class _BatchConnection():
+    # sqlite3 connection whose context manager, entered by SqliteRecorder for every case, commits every few cases
+    # Every other attribute is the connection's own
+    def __init__(self, connection, batch, interval):
+        self._connection = connection
+        self.batch = batch
+        self.interval = interval
+        self.pending = 0
+        self._last = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self._connection
+
+    def __exit__(self, kind, value, traceback):
+        # A failed case stays in the open transaction instead of rolling back the cases before it
+        if kind is None:
+            self.pending += 1
+            if self.pending >= self.batch or time.time() - self._last >= self.interval:
+                self.commit()
+        return False
+
+    def commit(self):
+        self._connection.commit()
+        self.pending = 0
+        self._last = time.time()
+
+
+class BatchSqliteRecorder(om.SqliteRecorder):
+    """
+    SqliteRecorder that groups cases into transactions, writes in WAL mode, and records a subset of the variables
+    The database layout is the OpenMDAO one, so om.CaseReader and SQLite browsers read it as before
+
+    Cases are committed every batch cases or interval seconds, whichever comes first, and when the run ends
+    (flush, shutdown, or interpreter exit), an interrupted run loses at most the cases of the open batch
+    WAL lets readers (read_cases, a browser) open the file while the run is writing it
+
+    Attributes:
+    -----------
+    batch : int
+        Cases per transaction
+    interval : float
+        Longest time in seconds a recorded case waits for its commit
+    variables : list or None
+        Promoted names (wildcards allowed, e.g. 'Observer*') of the driver variables recorded, None records all
+    """
+    def __init__(self, filepath, batch=50, interval=30.0, variables=None, append=False, record_viewer_data=True):
+        super().__init__(filepath, append=append, record_viewer_data=record_viewer_data)
+        self.batch = max(int(batch), 1)
+        self.interval = interval
+        self.variables = list(variables) if variables is not None else None
+        # Absolute name to whether it is recorded
+        self._wanted = {}
+        atexit.register(self.flush)
+
+    def _initialize_database(self, comm):
+        # Write ahead log of a crashed run would be replayed into the new database
+        for suffix in ('-wal', '-shm'):
+            try:
+                os.remove(f'{self._filepath}{suffix}')
+            except OSError:
+                pass
+        super()._initialize_database(comm)
+        if self.connection is None:
+            return
+        # synchronous NORMAL keeps WAL commits off the disk sync, a power cut can only lose the last batches
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        batched = _BatchConnection(self.connection, self.batch, self.interval)
+        if self.metadata_connection is self.connection:
+            self.metadata_connection = batched
+        self.connection = batched
+
+    def record_iteration_driver(self, driver, data, metadata):
+        if self.variables is not None:
+            data = dict(data, output=self._select(data['output'], 'output', driver),
+                        input=self._select(data['input'], 'input', driver))
+        super().record_iteration_driver(driver, data, metadata)
+
+    def _select(self, values, kind, driver):
+        # Recorded part of the case values, names are matched as promoted names (design variables by their own name)
+        if not values:
+            return values
+        for name in values:
+            if name not in self._wanted:
+                sources = {meta['source']: desvar for desvar, meta in driver._designvars.items()}
+                promoted = sources.get(name, self._abs2prom[kind].get(name, name))
+                self._wanted[name] = any(fnmatchcase(promoted, pattern) for pattern in self.variables)
+        return {name: val for name, val in values.items() if self._wanted[name]}
+
+    def flush(self):
+        """
+        Commit the cases recorded since the last batch
+        """
+        if isinstance(self.connection, _BatchConnection) and self.connection.pending:
+            try:
+                self.connection.commit()
+            except sqlite3.ProgrammingError:
+                # Connection already closed
+                pass
+
+    def shutdown(self):
+        self.flush()
+        super().shutdown()
+
+
+def _promoted_names(connection):
+    # Absolute to promoted name of every recorded variable, design variables by their own name (not the _auto_ivc source)
+    abs2prom, settings = connection.execute('SELECT abs2prom, var_settings FROM metadata').fetchone()
+    abs2prom = json.loads(zlib.decompress(abs2prom)) if abs2prom else {'input': {}, 'output': {}}
+    names = dict(abs2prom['input'], **abs2prom['output'])
+    for name, meta in (json.loads(zlib.decompress(settings)) if settings else {}).items():
+        if isinstance(meta, dict) and meta.get('source'):
+            names[meta['source']] = name
+    return names
+
+
+def read_cases(filepath, variables=None, source='driver'):
+    """
+    Load every recorded driver case at once
+    One query reads the whole table, so this is much faster than om.CaseReader over many cases,
+    and the file can be read while the run is still writing it (WAL)
+
+    Parameters:
+    -----------
+    filepath : str
+        Recorder database
+    variables : list or None
+        Promoted names (wildcards allowed) to load, None loads every recorded variable
+    source : str
+        Recording source, 'driver' for the GA cases
+
+    Returns:
+    --------
+    dict
+        Promoted name to an array with one row per case (1D for scalars), cases in recording order,
+        with 'counter', 'timestamp', and 'success' of each case, values missing from a case are NaN
+    """
+    connection = sqlite3.connect(filepath)
+    try:
+        names = _promoted_names(connection)
+        rows = connection.execute(f'SELECT counter, timestamp, success, inputs, outputs FROM {source}_iterations '
+                                  'ORDER BY id').fetchall()
+    finally:
+        connection.close()
+
+    count = len(rows)
+    cases = {'counter': np.array([row[0] for row in rows], dtype=int),
+             'timestamp': np.array([row[1] for row in rows], dtype=float),
+             'success': np.array([row[2] for row in rows], dtype=bool)}
+    columns = {}
+    for index, row in enumerate(rows):
+        for text in row[3:]:
+            for name, val in (json.loads(text) if text else {}).items():
+                name = names.get(name, name)
+                if variables is not None and not any(fnmatchcase(name, pattern) for pattern in variables):
+                    continue
+                columns.setdefault(name, {})[index] = val
+    for name, values in columns.items():
+        size = np.size(next(iter(values.values())))
+        data = np.full((count, size), np.nan)
+        for index, val in values.items():
+            data[index] = np.ravel(val)
+        cases[name] = data[:, 0] if size == 1 else data
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load every recorded GA case into NumPy arrays')
+    parser.add_argument('database', help='recorder database, e.g. AlgoRun_out/optimization_results.db')
+    parser.add_argument('--variables', nargs='*', default=None, help='promoted names to load, wildcards allowed')
+    parser.add_argument('--npz', default=None, help='write the arrays to this .npz file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cases = read_cases(args.database, args.variables)
+    print(f'{len(cases["counter"])} cases read in {time.perf_counter() - start:.3f} s')
+    for name, data in cases.items():
+        print(f'  {name:24s} {data.shape}')
+    if args.npz:
+        np.savez_compressed(args.npz, **cases)
+        print(f'Arrays written to {args.npz}')
+
+
+if __name__ == '__main__':
+    main()
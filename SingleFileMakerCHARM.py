@@ -9,116 +9,58 @@
 # Read comments in and above each method before using/editing
 # Direct any questions to Nathan Rong (nrong@cpp.edu)
 
-class FileMaker():
-    """
-    Creates CHARM run files: rw, bg, bd, and name
+import os
+import string
+import tempfile
+import threading
+import numpy as np
 
-    Attributes:
-    -----------
-    fp_list : list
-        List of file name extensions
-    num_rotors : int
-        Number of rotors
-    num_blades : int
-        Number of blades
-    """
-    def __init__(self, num_rotors, num_blades, val1, val2, val3, vala, valb, valc, vald, 
-                 vale, valf, valg, valh, vali, valj):
-        """
-        Initialize variables and lists for file making
 
-        Parameters:
-        -----------
-        num_rotors : int
-            Number of rotors
-        num_blades : int
-            Number of blades
-        val1 : float
-            Data point that changes in files
-            Reflected in symbolics
-            Same for all val
-        """
-        self.fp_list = ['GAlgoRuns', 'bg', 'rw', 'name']
-        self.num_rotors, self.num_blades = num_rotors, num_blades
-
-        # Check for correct inputs
-        if self.num_blades % self.num_rotors != 0:
-            raise UserWarning(f'Incompatible blade or rotor count provided...\n Cannot have {self.num_blades} blades with {self.num_rotors} rotors.')
-
-        # File names
-        bgfilename = f'{self.fp_list[0]}{self.fp_list[1]}.inp'
-        rwfilename = f'{self.fp_list[0]}{self.fp_list[2]}.inp'
-        rcfilename = f'{self.fp_list[0]}{self.fp_list[3]}.inp'
-
-        # Generate file content
-        bg_content = self.generate_bg_content(val1, val2, vala, valb, valc, 
-                                              vald, vale, valf, valg, valh, vali, valj)
-        # Capable of creating single rotor or dual rotor simulaton files
-        if self.num_rotors == 1:
-            rc_content = self.generate_name_content_one_rotors(rwfilename, bgfilename)
-            rw_content = self.generate_rw_content(0)
-        elif self.num_rotors == 2:
-            rc_content = self.generate_name_content_two_rotors(rwfilename, bgfilename)
-            rw_content = self.generate_rw_content(val3)
-        else:
-            raise UserWarning('Script not compatible with more than 2 rotors...')
-
-        # Write content to files
-        with open(bgfilename, 'w') as f:
-            f.write(bg_content)
-            f.flush()
-        with open(rwfilename, 'w') as f:
-            f.write(rw_content)
-            f.flush()
-        with open(rcfilename, 'w') as f:
-            f.write(rc_content)
-            # This can probably be eliminated
-        
-    def generate_bg_content(self, val1, val2, vala, valb, valc, 
-                            vald, vale, valf, valg, valh, vali, valj):
-        return f"""# Generated BG File
+# CHARM input file templates
+# Text outside braces is static, {name:format} fields are filled from the deck parameters
+# Sequence parameters (per segment arrays) are written as space separated values with the same format
+BG_TEMPLATE = """# Generated BG File
 KBGEOM
     0
 NSEG
-    10
+    {nseg}
 CUTOUT
-    0.0680    
+    {cutout:.4f}    
 SL(ISEG)
-    .0417  .0417  .0417  .0417  .0417   .0417   .0833 .5000  .0313  .0104
+    {sl:.4f}
 CHORD(ISEG)
-    .1200  .1172  .1145  .1354  .1458   .1563   .1771  .1667 .0833  .0729   .0213
+    {chord:.4f}
 ELOFSG(ISEG) - (elastic axis offset)
-    11*0.0
+    {npts}*0.0
 SWEEPD(ISEG)
-    5.0  -10.0  -10.0  -10.0  -20.0  -10.0  -5.0  2.0  0.0  0.0
+    {sweep:.1f}
 TWRD (Blade root twist at zero collective in degrees)
-    {val1:.2f}
+    {twist_root:.2f}
 TWSTGD(ISEG)
-    {vala:.2f}  {valb:.2f}  {valc:.2f}  {vald:.2f}  {vale:.2f}  {valf:.2f}  {valg:.2f}  {valh:.2f}  {vali:.2f}  {valj:.2f}
+    {twist:.2f}
 ANHD(ISEG)
-    11*{val2:.2f}
+    {anhedral:.2f}
 THIKND(ISEG)
-    11*0.1200
+    {thickness:.4f}
 KFLAP(ISEG)
-    11*0
+    {npts}*0
 FLAPND(ISEG)
-    11*0.0
+    {npts}*0.0
 FLHNGE(ISEG)
-    11*0.0
+    {npts}*0.0
 FLDEFL(ISEG)
-    11*0.0
+    {npts}*0.0
 NCAM
     0
 NCHORD  NSPAN  ICOS
-    1      -72    0
+    {nchord}      {nspan}    0
 """
 
-    def generate_rw_content(self, val3):
-        return f"""# Generated RW File 
+RW_TEMPLATE = """# Generated RW File 
 NBLADE  OMEGA
-    {self.num_blades // self.num_rotors}      500
+    {nblade}      {omega:g}
 IROTAT      XROTOR           X,Y,Z tilt     ITILT
-    1     0.0   0.0  {val3:.1f}    0.0  0.0  30.0      1
+    1     0.0   0.0  {z_offset:.1f}    0.0  0.0  30.0      1
 ICOLL   COLL     CT
     0      0     .004
 ITRIM    A1W    B1W    A1S    B1S
@@ -132,7 +74,7 @@ NCUT   AOVLAP   ISKEW   IUNS
 NZONE   (NVORT(I), I=1,NZONE)
     3       30  30  2 
 (NPTFW(I), I=1,NZONE)
-    48  48  96
+    {nptfw}
 (CORLIM(NV,IZONE,1), NV=1,NVORT(IZONE) IZONE=1 (Min core radii)
     15*0.5  15*0.01
 (CORLIM(NV,IZONE,2), NV=1,NVORT(IZONE) IZONE=1 (Max core radii)
@@ -165,15 +107,16 @@ NHHI (Higher harmonic cyclic pitch input flag)
     0
 """
 
-    def generate_name_content_two_rotors(self, rwfile, bgfile):
-        return f"""# Generated Name File
-KSIM
-    0
-NROTOR
-    2
-PATHNAME
-    ../
-INPUT FILENAMESFront right rotor
+# Rotor input file blocks of the name file, one per rotor
+ROTOR_ONE_FILES = """INPUT FILENAMESFront right rotor
+    {rwfile}
+    {bgfile}
+    GABasebd.inp
+    0012air.inp
+    None
+"""
+
+ROTOR_TWO_FILES = """INPUT FILENAMESFront right rotor
     GABaserw.inp
     {bgfile}
     GABasebd.inp
@@ -185,64 +128,25 @@ INPUT FILENAMESFront right rotor
     GABasebd.inp
     0012air.inp
     None
-SSPD     RHO
-    1116.    0.002378
-SFRAME
-    1
-U   V   W      P   Q   R
-    0.0 0.0 0.0    0.0 0.0 0.0
-NPSI    NREV    CONVG1    CONVG2   CONVG3   MREV
-    24      3     -1.0     -1.0      -1.0      0
-IRST  IFREE  IGPR
-    0      0      0
-IOUT   NRS   (ROUT(I),I=1,NRS)
-    4     10  0.2  0.3  0.4  0.5  0.6  0.7  0.8  0.9  0.95  0.99
-NPRINT   IBLPLT   (IFILPLT(I),I=1,4)
-    0        0        3  3  3  3
-KOPT
-    0
-ISCAN (Scan plane flag)
-    1
-ISTRSS (Stress calculation flag)
-    0
-IFV    IQUIK1
-    0       1
-ISURF
-    0
-ISHIP
-    0
-IRECON   NOISE
-    0        4
-ACOUSTICS_CODE
-    1
-NLS
-    0
 """
-    
-    def generate_name_content_one_rotors(self, rwfile, bgfile):
-            return f"""# Generated Name File
+
+NAME_TEMPLATE = """# Generated Name File
 KSIM
     0
 NROTOR
-    1
+    {num_rotors}
 PATHNAME
     ../
-INPUT FILENAMESFront right rotor
-    {rwfile}
-    {bgfile}
-    GABasebd.inp
-    0012air.inp
-    None
-SSPD     RHO
+{rotor_files}SSPD     RHO
     1116.    0.002378
 SFRAME
     1
 U   V   W      P   Q   R
-    0.0 0.0 0.0    0.0 0.0 0.0
+    {velocity:.1f}    0.0 0.0 0.0
 NPSI    NREV    CONVG1    CONVG2   CONVG3   MREV
-    24      3     -1.0     -1.0      -1.0      0
+    {npsi}      {nrev}     {convg1}     {convg2}      {convg3}      0
 IRST  IFREE  IGPR
-    0      0      0
+    {irst}      0      0
 IOUT   NRS   (ROUT(I),I=1,NRS)
     4     10  0.2  0.3  0.4  0.5  0.6  0.7  0.8  0.9  0.95  0.99
 NPRINT   IBLPLT   (IFILPLT(I),I=1,4)
@@ -266,6 +170,280 @@ ACOUSTICS_CODE
 NLS
     0
 """
+
+# Baseline blade (NSEG = 10) and solver settings
+# Any per segment array may be replaced by one of another length, NSEG follows the twist array
+DEFAULT_PARAMS = {
+    'cutout': 0.0680,
+    'sl': [.0417, .0417, .0417, .0417, .0417, .0417, .0833, .5000, .0313, .0104],
+    'chord': [.1200, .1172, .1145, .1354, .1458, .1563, .1771, .1667, .0833, .0729, .0213],
+    'sweep': [5.0, -10.0, -10.0, -10.0, -20.0, -10.0, -5.0, 2.0, 0.0, 0.0],
+    'twist_root': 0.0,
+    'twist': [0.0]*10,
+    'anhedral': 0.0,
+    'thickness': 0.1200,
+    'nchord': 1,
+    'nspan': -72,
+    'omega': 500,
+    'z_offset': 0.0,
+    'nptfw': [48, 48, 96],
+    'velocity': [0.0, 0.0, 0.0],
+    'npsi': 24,
+    'nrev': 3,
+    # Convergence criteria, -1.0 runs all NREV revolutions
+    'convg1': -1.0,
+    'convg2': -1.0,
+    'convg3': -1.0,
+    'irst': 0,
+}
+
+
+class DeckTemplate():
+    """
+    CHARM input file template, parsed once into static text and parameter fields
+
+    Attributes:
+    -----------
+    parts : list
+        Static strings and (parameter name, format spec) tuples, in file order
+    names : set
+        Parameter names used by the template
+    """
+    def __init__(self, text):
+        """
+        Parse template text
+
+        Parameters:
+        -----------
+        text : str
+            Template text with {name} or {name:format} fields
+        """
+        self.parts = []
+        for literal, name, spec, _ in string.Formatter().parse(text):
+            if literal:
+                self.parts.append(literal)
+            if name is not None:
+                self.parts.append((name, spec or ''))
+        self.names = {part[0] for part in self.parts if isinstance(part, tuple)}
+
+    @classmethod
+    def from_file(cls, file_name):
+        # Template kept as a separate file, e.g. a modified copy of GABaserw.inp
+        with open(file_name, 'r') as f:
+            return cls(f.read())
+
+    def render(self, params):
+        """
+        Fill the parameter fields
+
+        Parameters:
+        -----------
+        params : dict
+            Parameter name to scalar or sequence value
+
+        Returns:
+        --------
+        str
+            File content
+        """
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            value = params[part[0]]
+            if isinstance(value, (list, tuple, np.ndarray)):
+                out.append('  '.join(format(val, part[1]) for val in value))
+            else:
+                out.append(format(value, part[1]))
+        return ''.join(out)
+
+
+class DeckWriter():
+    """
+    Writes CHARM run files from compiled templates
+    Only files whose content changed since the last write are written,
+    and every write is atomic (temporary file, then rename), so concurrent runs never read a partial file
+
+    Attributes:
+    -----------
+    templates : dict
+        'bg', 'rw', and 'name' DeckTemplate objects
+    prefix : str
+        File name prefix, files are {prefix}bg.inp, {prefix}rw.inp, {prefix}name.inp
+    written : dict
+        Absolute file path to last written content
+    """
+    def __init__(self, bg_template=BG_TEMPLATE, rw_template=RW_TEMPLATE, name_template=NAME_TEMPLATE,
+                 prefix='GAlgoRuns'):
+        self.templates = {'bg': DeckTemplate(bg_template), 'rw': DeckTemplate(rw_template),
+                          'name': DeckTemplate(name_template)}
+        self.rotor_files = {1: DeckTemplate(ROTOR_ONE_FILES), 2: DeckTemplate(ROTOR_TWO_FILES)}
+        self.prefix = prefix
+        self.written = {}
+        self._lock = threading.Lock()
+
+    def params(self, num_rotors, num_blades, **params):
+        """
+        Complete a parameter set: defaults, derived counts, and scalar to per segment expansion
+
+        Parameters:
+        -----------
+        num_rotors : int
+            Number of rotors
+        num_blades : int
+            Number of blades
+        params : dict
+            Any DEFAULT_PARAMS entry
+
+        Returns:
+        --------
+        dict
+            Parameters for every template field
+        """
+        # Check for correct inputs
+        if num_blades % num_rotors != 0:
+            raise UserWarning(f'Incompatible blade or rotor count provided...\n Cannot have {num_blades} blades with {num_rotors} rotors.')
+        if num_rotors not in self.rotor_files:
+            raise UserWarning('Script not compatible with more than 2 rotors...')
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise TypeError(f'Unknown deck parameters {sorted(unknown)}...')
+
+        values = dict(DEFAULT_PARAMS, **params)
+        nseg = len(np.atleast_1d(values['twist']))
+        values['nseg'], values['npts'] = nseg, nseg + 1
+        # Values given once apply to every segment edge
+        for name in ('anhedral', 'thickness', 'chord'):
+            if np.ndim(values[name]) == 0:
+                values[name] = [values[name]]*(nseg + 1)
+        for name, size in (('sl', nseg), ('sweep', nseg), ('chord', nseg + 1),
+                           ('anhedral', nseg + 1), ('thickness', nseg + 1)):
+            if len(values[name]) != size:
+                raise ValueError(f'{name} needs {size} values for NSEG = {nseg}, got {len(values[name])}...')
+
+        values['num_rotors'] = num_rotors
+        values['nblade'] = num_blades // num_rotors
+        values['bgfile'] = f'{self.prefix}bg.inp'
+        values['rwfile'] = f'{self.prefix}rw.inp'
+        # Single rotor is always at the origin
+        if num_rotors == 1:
+            values['z_offset'] = 0.0
+        values['rotor_files'] = self.rotor_files[num_rotors].render(values)
+        return values
+
+    def render(self, num_rotors, num_blades, kinds=None, **params):
+        """
+        Content of each run file
+
+        Parameters:
+        -----------
+        kinds : list or None
+            Files to render ('bg', 'rw', 'name'), None for all of them
+
+        Returns:
+        --------
+        dict
+            File name to content
+        """
+        values = self.params(num_rotors, num_blades, **params)
+        return {f'{self.prefix}{kind}.inp': template.render(values) for kind, template in self.templates.items()
+                if kinds is None or kind in kinds}
+
+    def write(self, path='.', num_rotors=1, num_blades=2, kinds=None, **params):
+        """
+        Write the run files into path, skipping files that already hold the same content
+
+        Parameters:
+        -----------
+        path : str
+            Directory to write the files into
+        num_rotors : int
+            Number of rotors
+        num_blades : int
+            Number of blades
+        kinds : list or None
+            Files to write ('bg', 'rw', 'name'), None for all of them
+            e.g. operating points share one bg file and only write their own rw and name files
+        params : dict
+            Any DEFAULT_PARAMS entry
+
+        Returns:
+        --------
+        list
+            Paths of the files that were written
+        """
+        changed = []
+        for name, content in self.render(num_rotors, num_blades, kinds, **params).items():
+            target = os.path.abspath(os.path.join(path, name))
+            with self._lock:
+                if self.written.get(target) == content and os.path.exists(target):
+                    continue
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.deck')
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            os.replace(temp, target)
+            with self._lock:
+                self.written[target] = content
+            changed.append(target)
+        return changed
+
+
+# Writer shared by every FileMaker call, remembers what is already on disk
+DECK_WRITER = DeckWriter()
+
+
+class FileMaker():
+    """
+    Creates CHARM run files: rw, bg, bd, and name
+    Interface for the Genetic Algorithm design variables, DECK_WRITER does the writing
+
+    Attributes:
+    -----------
+    fp_list : list
+        List of file name extensions
+    num_rotors : int
+        Number of rotors
+    num_blades : int
+        Number of blades
+    path : str
+        Directory the files are written into
+    changed : list
+        Files that were (re)written, unchanged files are left alone
+    """
+    def __init__(self, num_rotors, num_blades, val1, val2, val3, vala, valb, valc, vald, 
+                 vale, valf, valg, valh, vali, valj, path='.', kinds=None, **params):
+        """
+        Initialize variables and lists for file making
+
+        Parameters:
+        -----------
+        num_rotors : int
+            Number of rotors
+        num_blades : int
+            Number of blades
+        val1 : float
+            Blade root twist (TWRD)
+        val2 : float
+            Anhedral of every segment (ANHD)
+        val3 : float
+            Z distance of the second rotor (two rotor runs only)
+        vala - valj : float
+            Twist of segments 1 to 10 (TWSTGD)
+        path : str
+            Directory to write the files into, defaults to the current (NOISE) directory
+            Name file references the rw and bg files by name, so the files must stay together
+        kinds : list or None
+            Files to write ('bg', 'rw', 'name'), None for all of them
+        params : dict
+            Further DEFAULT_PARAMS entries, e.g. chord or solver settings
+        """
+        self.fp_list = ['GAlgoRuns', 'bg', 'rw', 'name']
+        self.num_rotors, self.num_blades = num_rotors, num_blades
+        self.path = path
+        self.changed = DECK_WRITER.write(path, num_rotors, num_blades, kinds, twist_root=val1, anhedral=val2,
+                                         z_offset=val3, twist=[vala, valb, valc, vald, vale, valf, valg, valh, vali,
+                                                               valj], **params)
     
 
 if __name__ == '__main__':
@@ -0,0 +1,290 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the steady-state (asynchronous) Genetic Algorithm
+# There are no generations to wait for: whenever a CHARM run returns, its individual joins the population,
+# and a new child is bred from the current population and dispatched to the free slot right away,
+# so slow geometries never hold up the rest of the pool
+# Read comments in and above each method before using/editing
+
+
+import copy
+import numpy as np
+from Checkpoint import CheckpointGeneticAlgorithm, CheckpointGADriver
+from Pareto import pareto_mask
+
+
+# Breeding attempts for a child that differs from the members and running individuals
+BREED_ATTEMPTS = 10
+
+
+class SteadyStateGeneticAlgorithm(CheckpointGeneticAlgorithm):
+    """
+    Steady-state version of the OpenMDAO GeneticAlgorithm
+    Encoding (bits, gray), crossover (Pc, cross_bits), mutation (Pm), and population size rules are the OpenMDAO ones,
+    and every evaluation goes through the driver objective callback, so penalties and objective weights are unchanged
+
+    Parents are picked by binary tournament, on a random objective when the pareto front is computed
+    A returning individual replaces the worst member when it is better (elitism), the loser of a random pair otherwise,
+    with the pareto front computed, it replaces the member of the most dominated Pareto layer with the worst objective ranks
+    The run ends after pop_size*(max_gen + 1) evaluations (initial individuals plus max_gen generations of children),
+    every pop_size evaluations count as a generation for checkpoints, the Pareto front, and on_generation
+    Children beyond the outer bounds (over-allocated integer values) are discarded and bred again without a run,
+    children decoding to the design of a member or a running individual are bred again (up to BREED_ATTEMPTS times)
+
+    Attributes:
+    -----------
+    submit_fun : function
+        Starts the evaluation of a design point, returns its ticket
+    collect_fun : function
+        Waits for the next evaluation to finish, returns its ticket
+    slots : int
+        Evaluations kept running at once
+    initial_population : function or None
+        Returns the encoded individuals dispatched before any child (e.g. DOE samples),
+        None for the OpenMDAO random population
+    """
+    loop = 'steady-state'
+
+    def __init__(self, objfun, submit_fun, collect_fun, slots, comm=None, model_mpi=None, checkpoint=None):
+        super().__init__(objfun, comm=comm, model_mpi=model_mpi, checkpoint=checkpoint)
+        self.submit_fun = submit_fun
+        self.collect_fun = collect_fun
+        self.slots = max(int(slots), 1)
+        self.initial_population = None
+
+    def execute_ga(self, x0, vlb, vub, vob, bits, pop_size, max_gen, random_state, Pm=None, Pc=0.5):
+        if self.comm is not None:
+            # MPI runs keep the OpenMDAO generational loop
+            return super().execute_ga(x0, vlb, vub, vob, bits, pop_size, max_gen, random_state, Pm, Pc)
+
+        nobj = self.nobj
+        self.lchrom = int(np.sum(bits))
+        # Population size rules of the generational loop, so both spend the same number of evaluations
+        if nobj > 1 and np.mod(pop_size, nobj) > 0:
+            pop_size += nobj - np.mod(pop_size, nobj)
+        elif nobj == 1 and np.mod(pop_size, 2) == 1:
+            pop_size += 1
+        self.npop = int(pop_size)
+        if Pm is None:
+            Pm = (self.lchrom + 1.0) / (2.0 * pop_size * np.sum(bits))
+        layout = {'vlb': vlb, 'vub': vub, 'bits': bits, 'npop': self.npop, 'nobj': nobj}
+
+        state = self._matching(self.resume_state, layout)
+        if state is None:
+            if self.initial_population is not None:
+                queued = list(self.initial_population(self, x0, vlb, vub, vob, bits))
+            else:
+                initial = np.round(self._lhs(self.lchrom, self.npop, criterion='center', random_state=random_state))
+                initial[0] = self.encode(x0, vlb, vub, bits)
+                queued = list(initial)
+            run = {'budget': len(queued) + self.npop*max_gen, 'done': 0, 'nfit': 0,
+                   'population': np.zeros((0, self.lchrom)), 'x': np.zeros((0, len(bits))),
+                   'fitness': np.zeros((0, nobj))}
+            xopt, fopt = ([], []) if nobj > 1 else (copy.deepcopy(vlb), np.inf)
+            if self.checkpoint is not None:
+                self._save_run(layout, run, queued, xopt, fopt)
+        else:
+            run = {key: state[key] for key in ('budget', 'done', 'nfit', 'population', 'x', 'fitness')}
+            queued, xopt, fopt = list(state['queued']), state['xopt'], state['fopt']
+            np.random.set_state(state['rng'])
+            print(f'Resuming steady-state Genetic Algorithm at evaluation {run["done"]} of {run["budget"]}...')
+
+        # Ticket to (chromosome, design point) of the evaluations running
+        running = {}
+        block_x, block_f = [], []
+        while run['done'] < run['budget']:
+            # Every free slot gets the next initial individual, or a child of the population as it is now
+            while len(running) < self.slots and run['done'] + len(running) < run['budget']:
+                if queued:
+                    chromosome = queued.pop(0)
+                    x = self._decode_one(chromosome, vlb, vub, bits)
+                elif len(run['population']) >= 2:
+                    chromosome, x = self._child(run, running, vlb, vub, bits, Pc, Pm)
+                else:
+                    break
+                if np.any(x - vob > 0):
+                    continue
+                running[self.submit_fun(x)] = (chromosome, x)
+            if not running:
+                print('Steady-state Genetic Algorithm has no individuals left to evaluate, stopping early...')
+                break
+
+            chromosome, x = running.pop(self.collect_fun())
+            value, success, _ = self.objfun(x, 0)
+            value = np.ravel(value).astype(float) if success else np.full(nobj, np.inf)
+            run['nfit'] += int(bool(success))
+            run['done'] += 1
+            self._insert(run, chromosome, x, value)
+            block_x.append(x)
+            block_f.append(value)
+            if nobj == 1 and value[0] < fopt:
+                fopt, xopt = value[0], x
+
+            if run['done'] % self.npop and run['done'] < run['budget']:
+                continue
+            # Generation worth of evaluations complete
+            generation = (run['done'] - 1) // self.npop
+            if nobj > 1:
+                xopt, fopt = self.eval_pareto(np.array(block_x), np.array(block_f), xopt, fopt)
+            block_x, block_f = [], []
+            if self.on_generation is not None:
+                self.on_generation(generation)
+            if self.checkpoint is not None and (generation + 1) % self.checkpoint.every == 0:
+                # Running individuals are dispatched again on resume, logged ones are restored instead of run
+                self._save_run(layout, run, [item[0] for item in running.values()] + queued, xopt, fopt)
+
+        if self.checkpoint is not None:
+            self._save_run(layout, run, [], xopt, fopt)
+        return xopt, fopt, run['nfit']
+
+    def _save_run(self, layout, run, queued, xopt, fopt):
+        self.checkpoint.save(dict(layout, **run, queued=np.array(queued), xopt=xopt, fopt=fopt, loop=self.loop,
+                                  generation=run['done'] // self.npop, rng=np.random.get_state(),
+                                  extra=self.extra_state()))
+
+    def _decode_one(self, chromosome, vlb, vub, bits):
+        # OpenMDAO decodes npop rows, so it is one row meanwhile
+        npop, self.npop = self.npop, 1
+        try:
+            return self.decode(chromosome[np.newaxis], vlb, vub, bits)[0]
+        finally:
+            self.npop = npop
+
+    def _child(self, run, running, vlb, vub, bits, Pc, Pm):
+        # Copies of known designs only repeat an evaluation (low Pm, bits of fixed variables), so they are bred again
+        known = np.vstack([run['x']] + [item[1] for item in running.values()])
+        for _ in range(BREED_ATTEMPTS):
+            chromosome = self._breed(run['population'], run['fitness'], Pc, Pm)
+            x = self._decode_one(chromosome, vlb, vub, bits)
+            if not np.any(np.all(known == x, axis=1)):
+                break
+        return chromosome, x
+
+    def _breed(self, population, fitness, Pc, Pm):
+        """
+        One child of two tournament winners, with OpenMDAO crossover and mutation
+
+        Parameters:
+        -----------
+        population : ndarray
+            Encoded members
+        fitness : ndarray
+            Fitness of each member, one column per objective
+        Pc : float
+            Crossover probability of each bit site
+        Pm : float
+            Mutation probability of each bit
+
+        Returns:
+        --------
+        ndarray
+            Encoded child
+        """
+        column = np.random.randint(self.nobj)
+        parents = []
+        for _ in range(2):
+            a, b = np.random.randint(len(population), size=2)
+            parents.append(population[a] if fitness[a, column] <= fitness[b, column] else population[b])
+
+        # Every crossed site swaps one bit or the tail from the second parent, as GeneticAlgorithm.crossover does
+        child = parents[0].copy()
+        for jj in np.flatnonzero(np.random.rand(self.lchrom) < Pc):
+            if self.cross_bits:
+                child[jj] = parents[1][jj]
+            else:
+                child[jj:] = parents[1][jj:]
+        flip = np.random.rand(self.lchrom) < Pm
+        child[flip] = 1 - child[flip]
+        return child
+
+    def _insert(self, run, chromosome, x, value):
+        # Returning individual joins the population, replacing a member once it is full
+        if len(run['population']) < self.npop:
+            run['population'] = np.vstack([run['population'], chromosome])
+            run['x'] = np.vstack([run['x'], x])
+            run['fitness'] = np.vstack([run['fitness'], value])
+            return
+        index = self._replaced(run['fitness'], value)
+        if index is not None:
+            run['population'][index], run['x'][index], run['fitness'][index] = chromosome, x, value
+
+    def _replaced(self, fitness, value):
+        """
+        Member a returning individual replaces
+
+        Parameters:
+        -----------
+        fitness : ndarray
+            Fitness of each member, one column per objective
+        value : ndarray
+            Fitness of the returning individual
+
+        Returns:
+        --------
+        int or None
+            Member index, None to discard the returning individual
+        """
+        if self.nobj > 1:
+            # Most dominated Pareto layer of the members and the newcomer, worst summed objective ranks within it
+            F = np.vstack([fitness, value])
+            remaining = np.arange(len(F))
+            while True:
+                layer = remaining[pareto_mask(F[remaining])]
+                if len(layer) == len(remaining):
+                    break
+                remaining = np.setdiff1d(remaining, layer)
+            ranks = np.argsort(np.argsort(F, axis=0, kind='stable'), axis=0).sum(axis=1)
+            loser = remaining[np.argmax(ranks[remaining])]
+            return None if loser == len(fitness) else int(loser)
+        if self.elite:
+            # Best member is never replaced, so elitism holds without generations
+            worst = int(np.argmax(fitness[:, 0]))
+            return worst if value[0] < fitness[worst, 0] else None
+        a, b = np.random.randint(len(fitness), size=2)
+        return int(a if fitness[a, 0] >= fitness[b, 0] else b)
+
+
+class SteadyStateGADriver(CheckpointGADriver):
+    """
+    CheckpointGADriver running the steady-state Genetic Algorithm on a CandidatePool
+    Each child is submitted to the pool alone, and the Optimizer component collects its result like a parallel batch
+    Driver options, penalties, recording, pareto calculation, DOE seeding, and checkpoints work as in the other drivers
+
+    Attributes:
+    -----------
+    pool : CandidatePool
+        Pool shared with the Optimizer component, its num_workers evaluations are kept running
+    shape : BladeShape or None
+        Blade parameterization, designs get their per segment values the way the Optimizer component adds them
+    """
+    def __init__(self, pool, shape=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.shape = shape
+
+    def _make_ga(self, comm, model_mpi):
+        return SteadyStateGeneticAlgorithm(self.objective_callback, self._submit, self._collect, self.pool.num_workers,
+                                           comm=comm, model_mpi=model_mpi, checkpoint=self.checkpoint)
+
+    def run(self):
+        self._ga.initial_population = self._doe_samples if self.doe is not None else None
+        return super().run()
+
+    def _doe_samples(self, ga, x0, vlb, vub, vob, bits):
+        # DOE samples are the first individuals, they are dispatched like children and fill the population
+        population = self._doe_chromosomes(ga, x0, vlb, vub, vob, bits)
+        print(f'Dispatching {len(population)} DOE samples ({self.doe.method}) before the first children...')
+        return population
+
+    def _submit(self, x):
+        # Every design variable of the Optimizer component is a scalar
+        design = {name: float(x[i]) for name, (i, j) in self._desvar_idx.items()}
+        if self.shape is not None:
+            design = self.shape.expand(design)
+        return self.pool.submit(design)
+
+    def _collect(self):
+        return self.pool.collect()[0]
@@ -0,0 +1,284 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the optional surrogate pre-screening of Genetic Algorithm candidates
+# A Gaussian process of every Optimizer output is trained online from real CHARM results
+# Only promising or uncertain candidates of each generation are sent to CHARM,
+# the rest receive surrogate predictions and are flagged in the results log
+# Read comments in and above each method before using/editing
+
+
+import numpy as np
+from CHARMRunner import OBSERVERS, CONSTRAINTS, LOG_OUTPUTS
+from ParallelCHARM import design_key
+
+
+# Outputs modelled by the surrogate
+OUTPUTS = [f'Observer{observer}' for observer in OBSERVERS] + list(LOG_OUTPUTS)
+
+
+class gp_model():
+    """
+    Gaussian process regression with a squared exponential kernel
+    Every output shares the kernel, so one factorization serves all outputs
+
+    Attributes:
+    -----------
+    length_scale : float
+        Kernel length scale in normalized design space, picked by marginal likelihood
+    noise : float
+        Nugget added to the kernel diagonal (CHARM output noise in normalized units)
+    """
+    LENGTH_SCALES = (0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5)
+
+    def __init__(self, noise=1e-4):
+        self.noise = noise
+        self.length_scale = None
+
+    def _kernel(self, a, b, length_scale):
+        dist = np.sum(a**2, 1)[:, None] + np.sum(b**2, 1)[None, :] - 2*a @ b.T
+        return np.exp(-0.5*np.maximum(dist, 0)/length_scale**2)
+
+    def fit(self, X, Y):
+        """
+        Train on normalized design points
+
+        Parameters:
+        -----------
+        X : ndarray
+            Design points (n, d), normalized to [0, 1]
+        Y : ndarray
+            Outputs (n, m)
+        """
+        self.X = X
+        self.y_mean = Y.mean(0)
+        self.y_std = np.where(Y.std(0) > 0, Y.std(0), 1.0)
+        Yn = (Y - self.y_mean)/self.y_std
+
+        # Pick the length scale with the best summed log marginal likelihood
+        best = -np.inf
+        for length_scale in self.LENGTH_SCALES:
+            K = self._kernel(X, X, length_scale) + self.noise*np.eye(len(X))
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, Yn))
+            likelihood = -0.5*np.sum(Yn*alpha) - Yn.shape[1]*np.sum(np.log(np.diag(L)))
+            if likelihood > best:
+                best, self.length_scale, self.L, self.alpha = likelihood, length_scale, L, alpha
+
+    def predict(self, X):
+        """
+        Predict outputs with uncertainty
+
+        Parameters:
+        -----------
+        X : ndarray
+            Design points (k, d), normalized to [0, 1]
+
+        Returns:
+        --------
+        ndarray
+            Predicted mean (k, m)
+        ndarray
+            Predicted standard deviation (k, m)
+        """
+        Ks = self._kernel(X, self.X, self.length_scale)
+        mean = Ks @ self.alpha
+        v = np.linalg.solve(self.L, Ks.T)
+        var = np.maximum(1.0 + self.noise - np.sum(v**2, 0), 0)
+        return mean*self.y_std + self.y_mean, np.sqrt(var)[:, None]*self.y_std
+
+
+def driver_fitness(driver):
+    """
+    Build the SimpleGADriver fitness (weighted objectives plus constraint penalty) as a function
+    Used to rank surrogate predictions the way the driver will rank the real results
+    With compute_pareto, the driver ignores the weights, but they still steer the screening
+
+    Parameters:
+    -----------
+    driver : SimpleGADriver
+        Driver after setup
+
+    Returns:
+    --------
+    function
+        Maps a dict of output name to ndarray onto an ndarray of fitness (lower is better)
+    """
+    options = driver.options
+    weights = options['multi_obj_weights'] or {name: 1. for name in driver._objs}
+    sum_weights = sum(weights.values())
+
+    def scaled(meta, val):
+        adder = meta.get('total_adder', meta.get('adder')) or 0.0
+        scaler = meta.get('total_scaler', meta.get('scaler')) or 1.0
+        return (val + adder)*scaler
+
+    def fitness(values):
+        obj = sum(weights[name]*scaled(meta, values[name]) for name, meta in driver._objs.items())
+        obj = np.power(obj/sum_weights, options['multi_obj_exponent'])
+        violation = 0.0
+        for name, meta in driver._cons.items():
+            val = scaled(meta, values[CONSTRAINTS[name]])
+            gap = np.zeros_like(val)
+            if meta['lower'] is not None and np.all(np.isfinite(meta['lower'])):
+                gap = np.maximum(gap, meta['lower'] - val)
+            if meta['upper'] is not None and np.all(np.isfinite(meta['upper'])):
+                gap = np.maximum(gap, val - meta['upper'])
+            if meta['equals'] is not None and np.all(np.isfinite(meta['equals'])):
+                gap = np.abs(val - meta['equals'])
+            violation = violation + np.power(gap, options['penalty_exponent'])
+        return obj + options['penalty_parameter']*violation
+    return fitness
+
+
+class SurrogateScreen():
+    """
+    Decides which candidates of a generation are worth a real CHARM run
+
+    A candidate is run when the lower confidence bound of its predicted fitness
+    beats the best real fitness so far (promising, or uncertain enough that it might be)
+    At least min_fraction and at most max_fraction of each generation are run,
+    lowest confidence bound first, plus any candidate predicted to beat the best real fitness
+
+    Attributes:
+    -----------
+    min_train : int
+        Real results needed before screening starts, every candidate is run until then
+    max_train : int
+        Most recent real results kept for training
+    kappa : float
+        Confidence bound width in standard deviations
+    min_fraction, max_fraction : float
+        Bounds on the fraction of each generation sent to CHARM
+    history : dict
+        Real results used for training, keyed by design_key
+    """
+    def __init__(self, min_train=20, max_train=500, kappa=2.0, min_fraction=0.2, max_fraction=0.5,
+                 samples=64, seed=None):
+        self.min_train, self.max_train = min_train, max_train
+        self.kappa = kappa
+        self.min_fraction, self.max_fraction = min_fraction, max_fraction
+        self.samples = samples
+        self.rng = np.random.default_rng(seed)
+        self.history = {}
+        self.model = None
+        self.fitness = None
+        self.names, self.lower, self.span = None, None, None
+
+    def configure(self, fitness, bounds):
+        """
+        Attach the driver fitness and design bounds, called by the driver during setup
+
+        Parameters:
+        -----------
+        fitness : function
+            From driver_fitness
+        bounds : dict
+            Design variable name to (lower, upper)
+        """
+        self.fitness = fitness
+        self.names = sorted(bounds)
+        self.lower = np.array([bounds[name][0] for name in self.names], dtype=float)
+        upper = np.array([bounds[name][1] for name in self.names], dtype=float)
+        # Fixed variables (e.g. ZDistance for one rotor) have no span
+        self.span = np.where(upper > self.lower, upper - self.lower, 1.0)
+
+    def _normalize(self, designs):
+        X = np.array([[design[name] for name in self.names] for design in designs], dtype=float)
+        return (X - self.lower)/self.span
+
+    def update(self, designs, results):
+        """
+        Add real CHARM results to the training set and retrain
+        Failed runs are left out, their penalty values are not smooth outputs
+        Corrected coarse runs (MultiFidelity.py) are left out, only full CHARM runs train the model
+
+        Parameters:
+        -----------
+        designs : list
+            Design dicts that were run
+        results : list
+            Matching results from evaluate_design
+        """
+        for design, result in zip(designs, results):
+            if result['sim_worked'] and not result.get('surrogate', False) and not result.get('low_fidelity', False):
+                self.history.pop(design_key(design), None)
+                self.history[design_key(design)] = (design, result['outputs'])
+        while len(self.history) > self.max_train:
+            self.history.pop(next(iter(self.history)))
+        if len(self.history) >= self.min_train:
+            designs, outputs = zip(*self.history.values())
+            self.model = gp_model()
+            self.model.fit(self._normalize(designs),
+                           np.array([[out[name] for name in OUTPUTS] for out in outputs], dtype=float))
+            self.best = np.min(self.fitness({name: np.array([out[name] for out in outputs])
+                                             for name in OUTPUTS}))
+
+    def seed_from_log(self, db):
+        """
+        Train from the real results already in a results log, e.g. of a previous run
+
+        Parameters:
+        -----------
+        db : staging
+            Results logger, rows flagged as surrogate, low fidelity, or failed are skipped
+        """
+        designs, results = [], []
+        for row in db.index.values():
+            if row.get('Surrogate', 0) or row.get('LowFidelity', 0) or not row.get('TotalThrust'):
+                continue
+            designs.append({name: float(row[name]) for name in self.names})
+            outputs = {name: float(row[name]) for name in OUTPUTS if name.startswith('Observer')}
+            outputs.update({name: float(row[key]) for name, key in LOG_OUTPUTS.items()})
+            results.append({'outputs': outputs, 'sim_worked': True})
+        self.update(designs, results)
+
+    def screen(self, designs):
+        """
+        Split a generation into candidates to run and candidates to predict
+
+        Parameters:
+        -----------
+        designs : list
+            Design dicts of one generation
+
+        Returns:
+        --------
+        list
+            True for each design that should be run with CHARM
+        list
+            Surrogate result (evaluate_design format) for each design, None where it is run
+        """
+        if self.model is None or not designs:
+            return [True]*len(designs), [None]*len(designs)
+
+        mean, std = self.model.predict(self._normalize(designs))
+
+        # Propagate output uncertainty through the fitness by sampling
+        draws = mean[:, None, :] + std[:, None, :]*self.rng.standard_normal((len(designs), self.samples, len(OUTPUTS)))
+        fit = self.fitness({name: draws[:, :, i] for i, name in enumerate(OUTPUTS)})
+        bound = fit.mean(1) - self.kappa*fit.std(1)
+
+        order = np.argsort(bound)
+        n_min = int(np.ceil(self.min_fraction*len(designs)))
+        n_max = int(np.ceil(self.max_fraction*len(designs)))
+        run = np.zeros(len(designs), dtype=bool)
+        run[order[:n_min]] = True
+        run[order[:n_max]] |= bound[order[:n_max]] < self.best
+        # A predicted new incumbent is always verified, so the reported best is never only a prediction
+        run |= fit.mean(1) < self.best
+
+        predicted = []
+        for i in range(len(designs)):
+            if run[i]:
+                predicted.append(None)
+                continue
+            outputs = {name: float(mean[i, j]) for j, name in enumerate(OUTPUTS)}
+            log = {key: outputs[name] for name, key in LOG_OUTPUTS.items()}
+            predicted.append({'outputs': outputs, 'log': log, 'sim_worked': True, 'surrogate': True})
+        return list(run), predicted
@@ -0,0 +1,233 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the per evaluation timing instrumentation and the optional profiler
+# Every evaluation is split into stages (deck writing, cache lookup, CHARM, parsing, CSV logging, driver),
+# the stage times are logged with the results and summarized at the end of the run
+# Read comments in and above each method before using/editing
+
+
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+
+# Evaluation stages, in pipeline order, and their CSV column names
+STAGES = ['Deck', 'Cache', 'CHARM', 'Parse', 'Log', 'Driver']
+STAGE_COLUMNS = {stage: f'T_{stage}' for stage in STAGES}
+
+# Timings CHARM reports in its log (charm_log.timing) and their CSV column names
+CHARM_COLUMNS = {'elapsed_time': 'CHARM_Elapsed', 'user_time': 'CHARM_User',
+                 'wopwop_time': 'WOPWOP_Time', 'threads_received': 'CHARM_Threads'}
+
+
+class StageTimer():
+    """
+    Accumulates wall clock time per stage of one evaluation
+
+    Attributes:
+    -----------
+    times : dict
+        Stage name to seconds
+    """
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def stage(self, name):
+        # Time the body of a with block, repeated stages add up
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+
+
+def timing_columns(times, charm_timing=None):
+    """
+    Results log columns of an evaluation's timings
+
+    Parameters:
+    -----------
+    times : dict
+        Stage name to seconds
+    charm_timing : dict or None
+        charm_log.timing of the run
+
+    Returns:
+    --------
+    dict
+        Column name to value, stages in seconds
+    """
+    columns = {STAGE_COLUMNS[stage]: round(seconds, 6) for stage, seconds in times.items() if stage in STAGE_COLUMNS}
+    for key, column in CHARM_COLUMNS.items():
+        if charm_timing and key in charm_timing:
+            columns[column] = charm_timing[key]
+    return columns
+
+
+class TimingReport():
+    """
+    Totals of the stage timings over a run, printed as the end of run summary
+
+    Attributes:
+    -----------
+    totals : dict
+        Stage name to total seconds
+    evaluations : int
+        Number of evaluations added
+    charm : dict
+        CHARM reported timing name to list of values
+    start : float
+        perf_counter at creation, the summary compares stage totals with the run wall time
+    """
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.evaluations = 0
+        self.charm = {key: [] for key in CHARM_COLUMNS}
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, times, charm_timing=None):
+        """
+        Add the timings of one evaluation
+
+        Parameters:
+        -----------
+        times : dict
+            Stage name to seconds
+        charm_timing : dict or None
+            charm_log.timing of the run, None when CHARM was not run (cache hit, surrogate, failure)
+        """
+        with self._lock:
+            self.evaluations += 1
+            for stage, seconds in times.items():
+                self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            for key in self.charm:
+                # Only runs that reported the value count, /usr/bin/time prints 0 for runs under its resolution
+                value = (charm_timing or {}).get(key)
+                if isinstance(value, (int, float)) and value > 0:
+                    self.charm[key].append(value)
+
+    def summary(self):
+        """
+        Where the time went
+
+        Returns:
+        --------
+        str
+            Table of total, mean per evaluation, share of the summed stage time, and busy slots per stage
+            (total over the run wall time, the mean number of evaluations in the stage at once),
+            parallel runs overlap, so only serial runs show the untimed part of the wall time
+        """
+        wall = time.perf_counter() - self.start
+        count = max(self.evaluations, 1)
+        timed = sum(self.totals.values())
+        # Driver start up (final setup, initial population) and anything else outside the stages
+        other = wall - timed
+        spent = max(timed + max(other, 0.0), 1e-12)
+        lines = [f'Timing summary: {self.evaluations} evaluations in {wall:.1f} s',
+                 f'  {"Stage":10s} {"Total (s)":>10s} {"Mean (ms)":>10s} {"Share":>7s} {"Busy":>6s}']
+        for stage, total in self.totals.items():
+            lines.append(f'  {stage:10s} {total:10.2f} {total/count*1000:10.2f} {total/spent*100:6.1f}% '
+                         f'{total/wall:6.2f}')
+        if other > 0:
+            lines.append(f'  {"Untimed":10s} {other:10.2f} {other/count*1000:10.2f} {other/spent*100:6.1f}% '
+                         f'{other/wall:6.2f}')
+        else:
+            lines.append(f'  Stages overlap (concurrent runs), the untimed part of the {wall:.1f} s is not measured')
+        lines.append('  Share is of the summed stage time, Busy is the mean number of evaluations in the stage at once')
+        for key, values in self.charm.items():
+            if values:
+                lines.append(f'  CHARM reported {key}: mean {sum(values)/len(values):.2f} over {len(values)} runs')
+        return '\n'.join(lines)
+
+
+class ProfileHook():
+    """
+    Opt-in profiler around a block of code (e.g. prob.run_driver())
+
+    'cprofile' traces every call of the main thread with cProfile (accurate, slows Python code down)
+    'sample' records the stack of every thread at a fixed interval (low overhead, includes pool threads)
+
+    Attributes:
+    -----------
+    mode : str or None
+        'cprofile', 'sample', or None to do nothing
+    file : str
+        Output file prefix, cProfile stats go to {file}.prof, the text report to {file}.txt
+    interval : float
+        Seconds between samples
+    top : int
+        Number of functions in the text report
+    """
+    def __init__(self, mode=None, file='GAProfile', interval=0.01, top=25):
+        if mode not in (None, 'cprofile', 'sample'):
+            raise ValueError(f'Unknown profile mode {mode}, use cprofile or sample...')
+        self.mode, self.file, self.interval, self.top = mode, file, interval, top
+
+    def __enter__(self):
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == 'sample':
+            self._inclusive, self._own, self._samples = Counter(), Counter(), 0
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample, name='ProfileHook', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == 'cprofile':
+            self._profile.disable()
+            self._profile.dump_stats(f'{self.file}.prof')
+            report = io.StringIO()
+            pstats.Stats(self._profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+            self._write(report.getvalue())
+        elif self.mode == 'sample':
+            self._stop.set()
+            self._thread.join()
+            self._write(self._sample_report())
+        return False
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self._own[self._name(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    name = self._name(frame)
+                    # Recursive functions count once per sample
+                    if name not in seen:
+                        self._inclusive[name] += 1
+                        seen.add(name)
+                    frame = frame.f_back
+
+    @staticmethod
+    def _name(frame):
+        code = frame.f_code
+        return f'{code.co_filename}:{code.co_firstlineno}({code.co_name})'
+
+    def _sample_report(self):
+        count = max(self._samples, 1)
+        lines = [f'{self._samples} samples every {self.interval*1000:.0f} ms (all threads)',
+                 f'{"Inclusive":>10s} {"Own":>8s}  Function']
+        for name, hits in self._inclusive.most_common(self.top):
+            lines.append(f'{hits/count*100:9.1f}% {self._own[name]/count*100:7.1f}%  {name}')
+        return '\n'.join(lines) + '\n'
+
+    def _write(self, report):
+        with open(f'{self.file}.txt', 'w') as f:
+            f.write(report)
+        print(f'Profile written to {self.file}.txt')
@@ -0,0 +1,299 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the warm start of CHARM runs from the nearest previously solved design
+# Restart data of every completed run is kept in a store directory, a new candidate starts
+# from the restart data of the closest solved design (IRST 1) instead of a cold wake,
+# with the same solver settings as a cold run, so warm and cold results stay comparable
+# Read comments in and above each method before using/editing
+
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+
+
+# Restart files a CHARM run writes next to its log, named after the name file
+# Check the IRST description of your CHARM version and list every file it reads on restart
+# Warm start is turned off (with a warning) when a completed run did not write them
+RESTART_FILES = ['GAlgoRunsname.rst']
+
+# Extra deck settings of every run while warm starting (SingleFileMakerCHARM.DEFAULT_PARAMS entries)
+# Empty keeps the production solver settings, so only the restart differs from a cold run
+# Settings placed here (e.g. {'nrev': 10, 'convg2': 0.002} to end converged runs early) change the fidelity
+# of every run, warm or cold, and make the results incomparable with runs made without them
+WARM_SETTINGS = {}
+
+
+class RestartStore():
+    """
+    Restart data of solved designs, stored one directory per design
+    Safe to share between pool threads, kept across runs and restarts
+    Lookups pick up entries other processes (pre-warmed pool workers) saved into the same directory
+
+    Attributes:
+    -----------
+    directory : str
+        Store directory
+    files : list
+        Restart file names copied out of and into run directories
+    settings : dict
+        Deck parameters of every run (convergence criteria, most revolutions)
+    max_distance : float
+        Largest normalized design distance a run is warm started from
+    max_entries : int
+        Most designs kept, oldest are removed first
+    active : bool
+        False once a completed run left no restart files, every run is then cold
+    stats : dict
+        Counts of warm and cold runs and their total revolutions
+    """
+    def __init__(self, directory='GARestart', files=RESTART_FILES, settings=WARM_SETTINGS, max_distance=0.25,
+                 max_entries=1000):
+        self.directory = directory
+        self.files = list(files)
+        self.settings = dict(settings)
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.active = True
+        self.stats = {'warm': 0, 'cold': 0, 'warm_revolutions': 0, 'cold_revolutions': 0}
+        self.lower, self.span = {}, {}
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stamp = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        # Sync the entries with the store directory when it changed, new entries (of earlier runs
+        # or other processes) are added oldest first, entries removed by another process are dropped
+        with self._lock:
+            try:
+                stamp = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                return
+            if stamp == self._stamp:
+                return
+            self._stamp = stamp
+            # Entries being assembled (.entry temporary directories) are skipped
+            names = {name for name in os.listdir(self.directory) if not name.startswith('.')}
+            for name in set(self._entries) - names:
+                self._entries.pop(name)
+            saved = []
+            for name in names - set(self._entries):
+                meta = os.path.join(self.directory, name, 'design.json')
+                try:
+                    with open(meta, 'r') as f:
+                        saved.append((os.path.getmtime(meta), name, json.load(f)))
+                except (OSError, ValueError):
+                    continue
+            for _, name, entry in sorted(saved, key=lambda item: item[0]):
+                self._entries[name] = entry
+
+    def configure(self, bounds):
+        """
+        Attach the design bounds, distances are measured in bounds normalized units
+
+        Parameters:
+        -----------
+        bounds : dict
+            Design variable name to (lower, upper)
+        """
+        self.lower = {name: float(lower) for name, (lower, upper) in bounds.items()}
+        # Fixed variables (e.g. ZDistance for one rotor) have no span
+        self.span = {name: float(upper - lower) if upper > lower else 1.0 for name, (lower, upper) in bounds.items()}
+
+    def _distance(self, a, b):
+        # RMS of the normalized differences, 1 is a whole design range on every variable
+        # Only design variables count, not values derived from them (e.g. BladeShape segment twists)
+        diff = [(a[name] - b.get(name, np.inf))/self.span.get(name, 1.0) for name in (self.span or a)]
+        return float(np.sqrt(np.mean(np.square(diff)))) if diff else 0.0
+
+    @staticmethod
+    def _tag(settings):
+        # Restart data only seeds runs with the same deck settings (e.g. not coarse into full runs)
+        return json.dumps(settings or {}, sort_keys=True)
+
+    def clear(self, workdir):
+        # Remove restart files of an earlier run, so only this run's files are stored after it
+        for name in self.files:
+            if os.path.exists(os.path.join(workdir, name)):
+                os.remove(os.path.join(workdir, name))
+
+    def nearest(self, design, settings=None):
+        """
+        Closest stored design
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        settings : dict or None
+            Deck parameters of the run (e.g. low fidelity settings)
+
+        Returns:
+        --------
+        str or None
+            Entry directory, None if the store holds no design within max_distance
+        float or None
+            Normalized distance
+        """
+        tag = self._tag(settings)
+        self._load()
+        with self._lock:
+            candidates = [(self._distance(design, entry['design']), name)
+                          for name, entry in self._entries.items() if entry['tag'] == tag]
+        if not candidates:
+            return None, None
+        distance, name = min(candidates)
+        if distance > self.max_distance:
+            return None, None
+        return os.path.join(self.directory, name), distance
+
+    def restore(self, design, workdir, settings=None):
+        """
+        Copy the restart files of the nearest stored design into workdir
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        workdir : str
+            Run directory
+        settings : dict or None
+            Deck parameters of the run
+
+        Returns:
+        --------
+        float or None
+            Distance to the design restarted from, None for a cold start
+        """
+        if not self.active:
+            return None
+        source, distance = self.nearest(design, settings)
+        if source is None:
+            return None
+        try:
+            for name in self.files:
+                shutil.copy(os.path.join(source, name), os.path.join(workdir, name))
+        except OSError:
+            # Entry removed by another run in the meantime
+            self.clear(workdir)
+            return None
+        return distance
+
+    def save(self, design, workdir, settings=None):
+        """
+        Store the restart files a completed run left in workdir
+
+        Parameters:
+        -----------
+        design : dict
+            Design variable name to float value
+        workdir : str
+            Run directory
+        settings : dict or None
+            Deck parameters of the run
+        """
+        if not self.active:
+            return
+        missing = [name for name in self.files if not os.path.exists(os.path.join(workdir, name))]
+        if missing:
+            self._disable(workdir, missing)
+            return
+        tag = self._tag(settings)
+        entry = {'design': design, 'tag': tag}
+        name = hashlib.sha256(json.dumps(entry, sort_keys=True).encode()).hexdigest()[:20]
+        target = os.path.join(self.directory, name)
+
+        # Entry is assembled aside and renamed into place, readers never see a partial entry
+        temp = tempfile.mkdtemp(dir=self.directory, prefix='.entry')
+        for file_name in self.files:
+            shutil.copy(os.path.join(workdir, file_name), os.path.join(temp, file_name))
+        with open(os.path.join(temp, 'design.json'), 'w') as f:
+            json.dump(entry, f)
+        with self._lock:
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(temp, target)
+            self._entries.pop(name, None)
+            self._entries[name] = entry
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._entries.pop(oldest)
+                shutil.rmtree(os.path.join(self.directory, oldest), ignore_errors=True)
+
+    def _disable(self, workdir, missing):
+        # Completed run without the restart files, RESTART_FILES does not match this CHARM version
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+        print(f'Warm start turned off: the CHARM run in {workdir} completed without writing {missing}, '
+              'set RESTART_FILES in WarmStart.py to the restart files your CHARM version writes...')
+
+    def counts(self):
+        """
+        Copy of the run counts and the on/off state, e.g. to report what a worker process added
+
+        Returns:
+        --------
+        dict
+            stats entries plus 'active'
+        """
+        with self._lock:
+            return dict(self.stats, active=self.active)
+
+    def merge(self, counts):
+        """
+        Add run counts made in another process (pool worker) and take over its on/off state
+
+        Parameters:
+        -----------
+        counts : dict
+            Count increments (stats keys), plus 'active' False when warm start was turned off there
+        """
+        with self._lock:
+            for key in self.stats:
+                self.stats[key] += counts.get(key, 0)
+            self.active = self.active and counts.get('active', True)
+
+    def record(self, warm, revolutions):
+        """
+        Count a completed run
+
+        Parameters:
+        -----------
+        warm : bool
+            Run was warm started
+        revolutions : int or None
+            Revolutions CHARM needed (charm_log.revolutions)
+        """
+        if revolutions is None:
+            return
+        kind = 'warm' if warm else 'cold'
+        with self._lock:
+            self.stats[kind] += 1
+            self.stats[f'{kind}_revolutions'] += revolutions
+
+    def summary(self):
+        """
+        Mean revolutions to convergence of warm and cold started runs
+
+        Returns:
+        --------
+        str
+            One line summary
+        """
+        means = {}
+        for kind in ('warm', 'cold'):
+            count = self.stats[kind]
+            means[kind] = f'{self.stats[f"{kind}_revolutions"]/count:.2f}' if count else '-'
+        off = '' if self.active else ' (turned off, no restart files written)'
+        return (f'Warm start{off}: {self.stats["warm"]} warm runs (mean {means["warm"]} revolutions), '
+                f'{self.stats["cold"]} cold runs (mean {means["cold"]} revolutions)')
@@ -0,0 +1,455 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the multi-host evaluation mode of the Genetic Algorithm
+# The optimization process is the coordinator: each generation is put on a work queue served over XML-RPC,
+# worker daemons on any host with CHARM pull candidates, run the CHARM pipeline in their own scratch
+# directory, and send back the parsed outputs
+# Workers send heartbeats, candidates of a worker that goes silent are handed to another worker,
+# and a candidate completed twice (by a worker presumed lost and its replacement) is only counted once
+# Worker usage (from the NOISE directory of each host):
+#   python3 WorkQueue.py --coordinator <host>:<port> --token <token> --slots 2
+# The token is printed by the coordinator when it starts, it can also be passed in GA_QUEUE_TOKEN
+# Read comments in and above each method before using/editing
+
+
+import os
+import hmac
+import json
+import time
+import socket
+import secrets
+import argparse
+import threading
+import traceback
+import xmlrpc.client
+from collections import deque
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCServer
+from CHARMRunner import PENALTY_OUTPUTS, RUN_SCRIPT, LOG_FILE, make_workdir, evaluate_design
+from CHARMScheduler import CHARMScheduler
+from ParallelCHARM import CandidatePool
+from MultiPoint import OperatingPoints
+
+
+# Environment variable workers read the token from when --token is not given (keeps it off the process list)
+TOKEN_ENV = 'GA_QUEUE_TOKEN'
+
+
+def _dumps(value):
+    # Results go over XML-RPC as JSON text, numpy scalars become plain numbers
+    return json.dumps(value, default=lambda val: val.item() if hasattr(val, 'item') else str(val))
+
+
+class WorkQueue():
+    """
+    Candidates waiting for, running on, and returned by workers, held by the coordinator
+    Safe to use from the coordinator thread and the XML-RPC server threads
+
+    Attributes:
+    -----------
+    lease : float
+        Seconds a worker may stay silent before it is presumed lost
+    max_attempts : int
+        Dispatches of a candidate before it receives the penalty outputs (status 'lost')
+    job_timeout : float or None
+        Seconds a candidate may stay on one worker, even one still sending heartbeats, before it is
+        handed to another worker (a hung slot), None to wait as long as the worker is alive
+    stats : dict
+        Counts of submitted, completed, redispatched, overdue, lost, and duplicate (ignored) results
+    workers : dict
+        Worker id to the time it was last heard from
+    """
+    def __init__(self, lease=60.0, max_attempts=3, job_timeout=None):
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.job_timeout = job_timeout
+        self.stats = {'submitted': 0, 'completed': 0, 'redispatched': 0, 'overdue': 0, 'lost': 0, 'duplicates': 0}
+        self.workers = {}
+        self._jobs = {}
+        self._pending = deque()
+        self._next_id = 0
+        self._cond = threading.Condition()
+
+    def run(self, designs, settings=None, points=None):
+        """
+        Put designs on the queue and wait until every one has a result
+
+        Parameters:
+        -----------
+        designs : list
+            Design dicts, no repeats
+        settings : dict or None
+            Deck parameters replacing the defaults
+        points : list or None
+            Operating points every design is run at (OperatingPoints.spec), None for the deck operating point
+
+        Returns:
+        --------
+        list
+            Result of each design, in the evaluate_design format
+        """
+        with self._cond:
+            if designs and not self.workers:
+                print(f'Waiting for work queue workers to run {len(designs)} candidates...')
+            ids = []
+            for design in designs:
+                self._next_id += 1
+                self._jobs[self._next_id] = {'design': design, 'settings': settings, 'points': points,
+                                             'worker': None, 'started': None, 'attempts': 0, 'result': None}
+                self._pending.append(self._next_id)
+                ids.append(self._next_id)
+            self.stats['submitted'] += len(ids)
+            while any(self._jobs[job]['result'] is None for job in ids):
+                self._cond.wait(timeout=1.0)
+                self._reap()
+            # Late results of these jobs are counted as duplicates
+            return [self._jobs.pop(job)['result'] for job in ids]
+
+    def _reap(self):
+        # Called with the lock held, hands the jobs of silent workers, and jobs held past job_timeout, back to the queue
+        now = time.time()
+        for worker, seen in list(self.workers.items()):
+            if now - seen <= self.lease:
+                continue
+            print(f'Worker {worker} silent for {now - seen:.0f} s, handing its candidates to other workers...')
+            del self.workers[worker]
+            for job_id, job in self._jobs.items():
+                if job['worker'] == worker and job['result'] is None:
+                    self._release(job_id, job)
+        if self.job_timeout is None:
+            return
+        for job_id, job in self._jobs.items():
+            if job['worker'] is None or job['result'] is not None or now - job['started'] <= self.job_timeout:
+                continue
+            print(f'Candidate {job_id} held by worker {job["worker"]} for {now - job["started"]:.0f} s, '
+                  'handing it to another worker...')
+            self.stats['overdue'] += 1
+            self._release(job_id, job)
+
+    def _release(self, job_id, job):
+        # Called with the lock held, queues a job again, or gives it the penalty outputs after max_attempts
+        # A late result of the worker that held it is still used if it arrives first
+        job['worker'] = None
+        if job['attempts'] >= self.max_attempts:
+            job['result'] = {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': 'lost'}
+            self.stats['lost'] += 1
+            self._cond.notify_all()
+        else:
+            self._pending.appendleft(job_id)
+            self.stats['redispatched'] += 1
+
+    def fetch(self, worker):
+        """
+        Next candidate for a worker, a worker joins the queue on its first fetch
+
+        Parameters:
+        -----------
+        worker : str
+            Worker id
+
+        Returns:
+        --------
+        str
+            JSON of id, design, settings, and operating points, empty when nothing is waiting
+        """
+        with self._cond:
+            self.workers[worker] = time.time()
+            self._reap()
+            while self._pending:
+                job_id = self._pending.popleft()
+                job = self._jobs.get(job_id)
+                # Jobs already returned (e.g. by a worker presumed lost) are skipped
+                if job is None or job['result'] is not None:
+                    continue
+                job['worker'] = worker
+                job['started'] = time.time()
+                job['attempts'] += 1
+                return _dumps({'id': job_id, 'design': job['design'], 'settings': job['settings'],
+                               'points': job['points']})
+        return ''
+
+    def heartbeat(self, worker):
+        """
+        Keep a worker's candidates assigned to it
+
+        Parameters:
+        -----------
+        worker : str
+            Worker id
+
+        Returns:
+        --------
+        bool
+            True
+        """
+        with self._cond:
+            self.workers[worker] = time.time()
+        return True
+
+    def complete(self, worker, job_id, result):
+        """
+        Result of a candidate, the first result of a candidate is kept
+
+        Parameters:
+        -----------
+        worker : str
+            Worker id
+        job_id : int
+            Candidate id from fetch
+        result : str
+            JSON of the evaluate_design result
+
+        Returns:
+        --------
+        bool
+            True if the result was used, False for a duplicate
+        """
+        with self._cond:
+            self.workers[worker] = time.time()
+            job = self._jobs.get(job_id)
+            if job is None or job['result'] is not None:
+                self.stats['duplicates'] += 1
+                return False
+            job['result'] = json.loads(result)
+            self.stats['completed'] += 1
+            self._cond.notify_all()
+        return True
+
+
+class _QueueService():
+    # Methods workers call over XML-RPC, each checks the shared token first
+    def __init__(self, queue, token):
+        self._queue = queue
+        self._token = token
+
+    def _check(self, token):
+        if not hmac.compare_digest(str(token), self._token):
+            raise PermissionError('Wrong work queue token...')
+
+    def fetch(self, token, worker):
+        self._check(token)
+        return self._queue.fetch(worker)
+
+    def heartbeat(self, token, worker):
+        self._check(token)
+        return self._queue.heartbeat(worker)
+
+    def complete(self, token, worker, job_id, result):
+        self._check(token)
+        return self._queue.complete(worker, job_id, result)
+
+
+class _ThreadingServer(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+class QueueServer():
+    """
+    XML-RPC server of a WorkQueue, running in a daemon thread of the coordinator
+
+    Attributes:
+    -----------
+    address : tuple
+        (host, port) the server listens on
+    token : str
+        Token every worker call must carry
+    """
+    def __init__(self, queue, host='127.0.0.1', port=8765, token=None):
+        """
+        Start serving the queue
+
+        Parameters:
+        -----------
+        queue : WorkQueue
+            Queue to serve
+        host : str
+            Interface to listen on, '127.0.0.1' for workers on this host only, '0.0.0.0' for every interface
+        port : int
+            Port to listen on
+        token : str or None
+            Shared token of the workers, None generates a random one (printed with the worker command)
+        """
+        if token is None:
+            token = secrets.token_urlsafe(16)
+        elif len(str(token)) < 8:
+            raise ValueError('Work queue token must be at least 8 characters, or None for a random one...')
+        self.token = str(token)
+        self._server = _ThreadingServer((host, port), allow_none=True, logRequests=False)
+        self._server.register_instance(_QueueService(queue, self.token))
+        self.address = self._server.server_address
+        threading.Thread(target=self._server.serve_forever, name='QueueServer', daemon=True).start()
+        print(f'Work queue served on {host}:{self.address[1]} ({socket.gethostname()}), start workers with:\n'
+              f'  {TOKEN_ENV}={self.token} python3 WorkQueue.py --coordinator {socket.gethostname()}:{self.address[1]}')
+
+    def close(self):
+        # Stop serving, workers keep retrying until their idle limit
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class QueuePool(CandidatePool):
+    """
+    CandidatePool whose batches run on the workers of a WorkQueue instead of local processes
+    The GA driver, surrogate, multi-fidelity ladder, and resume history use it like a local pool
+    Caches and CHARM settings are the workers' own, warm start and the artifact store are local features
+    Operating points go out with every candidate, a worker slot runs the points of its candidate
+
+    Attributes:
+    -----------
+    queue : WorkQueue
+        Queue served to the workers
+    num_workers : int
+        Candidates a steady-state driver keeps on the queue at once (the slots of all workers)
+    """
+    def __init__(self, queue, history=None, slots=1, points=None):
+        super().__init__(slots, history=history, points=points)
+        self.queue = queue
+
+    def _run_batch(self, designs, settings):
+        return self.queue.run(designs, settings, self._spec())
+
+    def _run_slot(self, design, slot):
+        return self.queue.run([design], points=self._spec())[0]
+
+    def _spec(self):
+        return self.points.spec() if self.points is not None else None
+
+
+class QueueWorker():
+    """
+    Worker daemon: pulls candidates from a coordinator and runs them with CHARM
+    Each slot runs one candidate at a time in its own sandbox, heartbeats go out from a separate thread
+
+    Attributes:
+    -----------
+    url : str
+        Coordinator XML-RPC address
+    worker : str
+        Worker id, host name and process id
+    slots : int
+        Concurrent CHARM runs
+    idle_exit : float or None
+        Stop after this many seconds without a reachable coordinator, None to run until killed
+    """
+    def __init__(self, coordinator, token, slots=1, scratch='GAWorker', cache=None, scheduler=None,
+                 poll=1.0, heartbeat=10.0, idle_exit=None):
+        self.url = f'http://{coordinator}'
+        self.token = token
+        self.worker = f'{socket.gethostname()}-{os.getpid()}'
+        self.slots = slots
+        self.scratch = scratch
+        self.cache = cache
+        self.scheduler = scheduler or CHARMScheduler(RUN_SCRIPT, outputs=[LOG_FILE], max_jobs=slots)
+        self.scheduler.plan(slots)
+        self.poll = poll
+        self.heartbeat = heartbeat
+        self.idle_exit = idle_exit
+        self.completed = 0
+        self._stop = threading.Event()
+        self._reached = time.time()
+
+    def _call(self, method, *args):
+        # New proxy per call, proxies are not thread safe
+        proxy = xmlrpc.client.ServerProxy(self.url, allow_none=True)
+        try:
+            result = getattr(proxy, method)(self.token, self.worker, *args)
+        finally:
+            proxy('close')()
+        self._reached = time.time()
+        return result
+
+    def _unreachable(self):
+        # Coordinator not started yet, between runs, or finished
+        if self.idle_exit is not None and time.time() - self._reached > self.idle_exit:
+            print(f'Coordinator {self.url} unreachable for {self.idle_exit:.0f} s, worker stopping...')
+            self._stop.set()
+        self._stop.wait(self.poll*5)
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self._call('heartbeat')
+            except (OSError, xmlrpc.client.Error):
+                pass
+
+    def _slot(self, number):
+        workdir = make_workdir(os.path.join(self.scratch, f'slot{number:02d}'))
+        while not self._stop.is_set():
+            try:
+                job = self._call('fetch')
+            except xmlrpc.client.Fault as fault:
+                print(f'Coordinator refused worker {self.worker}: {fault.faultString}')
+                self._stop.set()
+                continue
+            except (OSError, xmlrpc.client.Error):
+                self._unreachable()
+                continue
+            if not job:
+                self._stop.wait(self.poll)
+                continue
+            job = json.loads(job)
+            try:
+                points = OperatingPoints(job['points']) if job.get('points') else None
+                result = evaluate_design(job['design'], workdir, cache=self.cache, scheduler=self.scheduler,
+                                         settings=job['settings'], points=points)
+            except Exception:
+                # The coordinator must always receive a result, the heartbeats would keep the candidate here forever
+                traceback.print_exc()
+                result = {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': 'failed'}
+            # Coordinator gone while running, the result is dropped and the candidate redispatched later
+            for _ in range(3):
+                try:
+                    self._call('complete', job['id'], _dumps(result))
+                    self.completed += 1
+                    break
+                except (OSError, xmlrpc.client.Error):
+                    self._stop.wait(self.poll*5)
+
+    def serve(self):
+        """
+        Run until idle_exit passes without a coordinator, or until interrupted
+        """
+        print(f'Worker {self.worker} serving {self.url} with {self.slots} slots...')
+        threading.Thread(target=self._beat, name='Heartbeat', daemon=True).start()
+        threads = [threading.Thread(target=self._slot, args=(number,), name=f'Slot{number}', daemon=True)
+                   for number in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self._stop.set()
+            self.scheduler.cancel()
+        print(f'Worker {self.worker} completed {self.completed} candidates')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Work queue worker, runs CHARM candidates of a coordinator')
+    parser.add_argument('--coordinator', required=True, help='host:port of the optimization process')
+    parser.add_argument('--token', default=os.environ.get(TOKEN_ENV),
+                        help=f'token printed by the coordinator, defaults to ${TOKEN_ENV}')
+    parser.add_argument('--slots', type=int, default=1, help='concurrent CHARM runs on this host')
+    parser.add_argument('--scratch', default='GAWorker')
+    parser.add_argument('--cache', default=None, help='EvalCache file of this host, none by default')
+    parser.add_argument('--timeout', type=float, default=None, help='wall clock limit per CHARM run in seconds')
+    parser.add_argument('--heartbeat', type=float, default=10.0, help='seconds between heartbeats, keep below the lease')
+    parser.add_argument('--idle-exit', type=float, default=None, help='seconds without a coordinator before stopping')
+    args = parser.parse_args()
+    if not args.token:
+        parser.error(f'the coordinator token is needed, pass --token or set {TOKEN_ENV}')
+
+    cache = None
+    if args.cache:
+        from EvalCache import EvalCache
+        cache = EvalCache(args.cache)
+    scheduler = CHARMScheduler(RUN_SCRIPT, outputs=[LOG_FILE], timeout=args.timeout, max_jobs=args.slots)
+    QueueWorker(args.coordinator, args.token, args.slots, args.scratch, cache, scheduler,
+                heartbeat=args.heartbeat, idle_exit=args.idle_exit).serve()
+
+
+if __name__ == '__main__':
+    main()
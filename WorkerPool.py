@@ -0,0 +1,255 @@
+# Version: 2.1
+# Python Version 3.13.0 or greater recommended
+# For use of OpenMDAO Simple Genetic Algorithm
+# with CHARM software for optimization
+
+# This script houses the pre-warmed worker processes of the parallel evaluation mode
+# Each worker is started once, copies the static CHARM inputs into its own scratch directory in RAM (tmpfs),
+# and keeps the deck writer, scheduler, and parsers loaded, candidates arrive over a pipe and parsed results go back,
+# so each evaluation only pays for the deck write into memory, the CHARM run, and the parse
+# Read comments in and above each method before using/editing
+
+
+import os
+import time
+import atexit
+import shutil
+import signal
+import threading
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+from CHARMRunner import PENALTY_OUTPUTS, STATIC_FILES, evaluate_design, preflight_check
+from CHARMScheduler import CHARMScheduler
+from ParallelCHARM import CandidatePool
+from Timing import StageTimer
+
+
+# RAM backed directories tried for worker scratch, in order
+TMPFS_DIRS = ['/dev/shm']
+
+
+def scratch_root(fallback='GAScratch'):
+    """
+    Directory worker scratch directories are made in: a writable tmpfs, else fallback on disk
+
+    Parameters:
+    -----------
+    fallback : str
+        Directory used without a writable tmpfs (e.g. Windows, some containers)
+
+    Returns:
+    --------
+    str
+        Directory path
+    """
+    for directory in TMPFS_DIRS:
+        if os.path.isdir(directory) and os.access(directory, os.W_OK):
+            return directory
+    return fallback
+
+
+def stage_static(workdir, static_dir='.'):
+    """
+    Copy the static CHARM inputs into a worker directory, copies (not links) so CHARM reads them from RAM
+
+    Parameters:
+    -----------
+    workdir : str
+        Worker directory, created if it does not exist
+    static_dir : str
+        Directory holding the static input files (CHARM NOISE directory)
+    """
+    os.makedirs(workdir, exist_ok=True)
+    for name in STATIC_FILES:
+        source = os.path.join(static_dir, name)
+        # Missing static files are left for CHARM to report, same as a serial run
+        if os.path.exists(source):
+            shutil.copy(source, os.path.join(workdir, name))
+
+
+def _worker(conn, workdir, static_dir, template, cache, warm, artifacts, points):
+    # Worker process: stage the inputs once, then evaluate candidates until told to stop
+    # A candidate runs once per operating point, all at once
+    runs = len(points) if points is not None else 1
+    scheduler = CHARMScheduler(template.script, template.outputs, timeout=template.timeout, retries=template.retries,
+                               retry_delay=template.retry_delay, grace=template.grace, max_jobs=runs,
+                               monitor=template.monitor)
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+    # Terminated workers stop their CHARM run too, CHARM runs in its own process group
+    signal.signal(signal.SIGTERM, stop)
+    stage_static(workdir, static_dir)
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            design, settings, threads, warm_active = job
+            scheduler.cores = threads*runs
+            scheduler.plan(runs)
+            before = dict(scheduler.stats)
+            # The forked store keeps its own counts, the increments and the on/off state go back with the result
+            if warm is not None:
+                warm.active = warm.active and warm_active
+                warm_before = warm.counts()
+            try:
+                result = evaluate_design(design, workdir, cache=cache, scheduler=scheduler, settings=settings,
+                                         warm=warm, artifacts=artifacts, points=points)
+            except Exception:
+                traceback.print_exc()
+                result = {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': 'failed'}
+            warm_counts = None
+            if warm is not None:
+                warm_after = warm.counts()
+                warm_counts = {key: warm_after[key] - warm_before[key] for key in warm.stats}
+                warm_counts['active'] = warm_after['active']
+            conn.send((result, {key: scheduler.stats[key] - before[key] for key in before}, warm_counts))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        scheduler.close()
+
+
+class WorkerPool(CandidatePool):
+    """
+    CandidatePool whose candidates run in long-lived worker processes instead of threads
+    Workers are forked when the pool is made, so they start with every module already imported,
+    and each owns one scratch directory (in RAM where possible) with the static inputs staged once
+
+    The pool scheduler only plans the batch (CHARM threads per run) and receives the run counts of the workers,
+    the warm start store receives their warm and cold counts, and workers find each other's restart data on disk
+    Pre-flight checks stay in this process, so the classifier learns from every worker's runs
+    A worker that dies is replaced, its candidate receives the penalty outputs
+
+    Attributes:
+    -----------
+    scratch : str
+        Directory holding the worker directories
+    workers : list
+        Worker processes
+    replaced : int
+        Workers replaced after dying
+    """
+    def __init__(self, num_workers, scratch=None, cache=None, scheduler=None, history=None, warm=None,
+                 artifacts=None, preflight=None, points=None, static_dir='.'):
+        super().__init__(num_workers, scratch=None, cache=cache, scheduler=scheduler, history=history, warm=warm,
+                         artifacts=artifacts, preflight=preflight, points=points)
+        self.scratch = os.path.join(scratch or scratch_root(), f'GAWorkers-{os.getpid()}')
+        self.static_dir = os.path.abspath(static_dir)
+        self.replaced = 0
+        # Slot threads of submitted designs share the scheduler counts and the worker list
+        self._lock = threading.Lock()
+        # Fork keeps the imported modules, spawn would run AlgoRun.py again in every worker
+        self._context = multiprocessing.get_context('fork')
+        self.workers, self._conns = [], []
+        for number in range(num_workers):
+            self._start(number)
+        atexit.register(self.close)
+
+    def _start(self, number):
+        conn, child = self._context.Pipe()
+        process = self._context.Process(target=_worker, name=f'GAWorker{number}', daemon=True,
+                                        args=(child, os.path.join(self.scratch, f'worker{number:02d}'), self.static_dir,
+                                              self.scheduler, self.cache, self.warm, self.artifacts, self.points))
+        process.start()
+        child.close()
+        if number < len(self.workers):
+            self.workers[number], self._conns[number] = process, conn
+        else:
+            self.workers.append(process)
+            self._conns.append(conn)
+
+    def _run_batch(self, designs, settings):
+        """
+        Send the designs to idle workers and collect their results
+
+        Parameters:
+        -----------
+        designs : list
+            Design dicts, no repeats
+        settings : dict or None
+            Deck parameters replacing the defaults
+
+        Returns:
+        --------
+        list
+            Result of each design, in the evaluate_design format
+        """
+        results = [None]*len(designs)
+        pending = []
+        for index, design in enumerate(designs):
+            results[index] = self._preflight(design, settings)
+            if results[index] is None:
+                pending.append(index)
+        pending.reverse()
+
+        # Cores are split between the runs of this batch and CHARM threads per run
+        self._plan(min(max(len(pending), 1), self.num_workers))
+        idle, busy = list(range(self.num_workers)), {}
+        while pending or busy:
+            while pending and idle:
+                number, index = idle.pop(), pending.pop()
+                self._conns[number].send((designs[index], settings, self.scheduler.threads, self._warm_active()))
+                busy[self._conns[number]] = (number, index)
+            for conn in wait(list(busy)):
+                number, index = busy.pop(conn)
+                results[index] = self._receive(number, designs[index], settings)
+                idle.append(number)
+        return results
+
+    def _run_slot(self, design, slot):
+        # Submitted designs, each slot thread talks to the worker of the same number only
+        result = self._preflight(design, None)
+        if result is not None:
+            return result
+        self._conns[slot].send((design, None, self.scheduler.threads, self._warm_active()))
+        return self._receive(slot, design, None)
+
+    def _warm_active(self):
+        # Warm start turned off by one worker is off for every worker
+        return self.warm is None or self.warm.active
+
+    def _preflight(self, design, settings):
+        # Pre-flight checks run here, so the classifier learns from every worker's runs
+        params = dict(self.warm.settings if self.warm is not None else {}, **(settings or {}))
+        return preflight_check(design, params, self.preflight, StageTimer())
+
+    def _receive(self, number, design, settings):
+        # Result of the candidate sent to a worker, a worker that died is replaced
+        try:
+            result, counts, warm_counts = self._conns[number].recv()
+            with self._lock:
+                for key, count in counts.items():
+                    self.scheduler.stats[key] += count
+            if warm_counts is not None:
+                self.warm.merge(warm_counts)
+        except (EOFError, OSError):
+            print(f'Worker {number} stopped while running a candidate, starting a new worker...')
+            result = {'outputs': dict(PENALTY_OUTPUTS), 'log': {}, 'sim_worked': False, 'status': 'failed'}
+            self.workers[number].join(1.0)
+            with self._lock:
+                self._start(number)
+                self.replaced += 1
+        if self.preflight is not None and not settings:
+            self.preflight.record(design, result)
+        return result
+
+    def close(self):
+        """
+        Stop the workers and remove their scratch directories
+        """
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        deadline = time.time() + 10.0
+        for process in self.workers:
+            process.join(max(deadline - time.time(), 0.1))
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+        self.workers, self._conns = [], []
+        shutil.rmtree(self.scratch, ignore_errors=True)